@@ -0,0 +1,227 @@
+import argparse
+import json
+import os
+from typing import Dict, List, Optional
+
+from corpus_index import log_check
+from data_handling import OUTPUT_FILE, rebuild_stale_corpus_index
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BY_COUNTRY = 'country'
+BY_CPV_DIVISION = 'cpv'
+BY_MONTH = 'month'
+
+# The CPV division is the first two of the eight digits.
+CPV_DIVISION_DIVISOR = 1000000
+
+
+def require_numpy() -> None:
+    if numpy is None:
+        raise ImportError('analytics needs the numpy package: pip install numpy')
+
+
+def analytics_filename(filename: str) -> str:
+    return filename + '.analytics.npz'
+
+
+class CorpusArrays:
+    """
+        Columnar view of a data file for vectorized aggregation, one row per indexed record:
+
+        - keys, and active, which is False for rows replaced by a later version of the same notice
+        - dates: datetime64[D] publication dates, NaT if missing
+        - country: int16 codes into countries, -1 if missing
+        - cpv_codes / cpv_offsets: the integer CPV codes of row i are cpv_codes[cpv_offsets[i]:cpv_offsets[i + 1]]
+        - nuts_codes / nuts_offsets: the same for NUTS codes, as int32 codes into nuts
+
+        The arrays are built from the query index of the data file (see corpus_index), which already holds these
+        fields split, and remember how far into the index they got (index_offset), so an update only reads the
+        entries appended since.
+    """
+
+    def __init__(self, arrays: Optional[Dict[str, 'numpy.ndarray']] = None):
+        require_numpy()
+
+        arrays = arrays or {}
+        self.keys = arrays.get('keys', numpy.array([], dtype=str))
+        self.active = arrays.get('active', numpy.zeros(0, dtype=bool))
+        self.dates = arrays.get('dates', numpy.array([], dtype='datetime64[D]'))
+        self.country = arrays.get('country', numpy.zeros(0, dtype=numpy.int16))
+        self.countries: List[str] = arrays.get('countries', numpy.array([], dtype=str)).tolist()
+        self.cpv_codes = arrays.get('cpv_codes', numpy.zeros(0, dtype=numpy.int32))
+        self.cpv_offsets = arrays.get('cpv_offsets', numpy.zeros(1, dtype=numpy.int64))
+        self.nuts_codes = arrays.get('nuts_codes', numpy.zeros(0, dtype=numpy.int32))
+        self.nuts_offsets = arrays.get('nuts_offsets', numpy.zeros(1, dtype=numpy.int64))
+        self.nuts: List[str] = arrays.get('nuts', numpy.array([], dtype=str)).tolist()
+        self.index_offset = int(arrays.get('index_offset', 0))
+        self.index_check = bytes(arrays.get('index_check', numpy.zeros(0, dtype=numpy.uint8)))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def load(cls, filename: str) -> 'CorpusArrays':
+        require_numpy()
+
+        try:
+            with numpy.load(filename) as cache:
+                return cls({name: cache[name] for name in cache.files})
+        except FileNotFoundError:
+            return cls()
+
+    def save(self, filename: str) -> None:
+        temporary_filename = filename + '.tmp.npz'
+
+        numpy.savez(temporary_filename,
+                    keys=self.keys, active=self.active, dates=self.dates, country=self.country,
+                    countries=numpy.array(self.countries, dtype=str), cpv_codes=self.cpv_codes,
+                    cpv_offsets=self.cpv_offsets, nuts_codes=self.nuts_codes, nuts_offsets=self.nuts_offsets,
+                    nuts=numpy.array(self.nuts, dtype=str), index_offset=numpy.int64(self.index_offset),
+                    index_check=numpy.frombuffer(self.index_check, dtype=numpy.uint8))
+
+        os.replace(temporary_filename, filename)
+
+    def append(self, entries: List[dict]) -> None:
+        """
+            Add index entries as new rows. Rows of notices that appear again are deactivated, so only the latest
+            version of each notice is counted.
+        """
+        latest = {}
+
+        for entry in entries:
+            latest[entry['key']] = entry
+
+        if not latest:
+            return
+
+        entries = list(latest.values())
+        new_keys = numpy.array([entry['key'] for entry in entries], dtype=str)
+
+        self.active[numpy.isin(self.keys, new_keys)] = False
+
+        country_codes = {country: code for code, country in enumerate(self.countries)}
+        nuts_codes = {nuts: code for code, nuts in enumerate(self.nuts)}
+
+        def country_code(country: Optional[str]) -> int:
+            if not country:
+                return -1
+
+            return country_codes.setdefault(country, len(country_codes))
+
+        def nuts_code(nuts: str) -> int:
+            return nuts_codes.setdefault(nuts, len(nuts_codes))
+
+        dates = numpy.array([entry.get('date') or 'NaT' for entry in entries], dtype='datetime64[D]')
+        country = numpy.array([country_code(entry.get('country')) for entry in entries], dtype=numpy.int16)
+        cpv_lists = [[int(code) for code in entry.get('cpv') or []] for entry in entries]
+        nuts_lists = [[nuts_code(code) for code in entry.get('nuts') or []] for entry in entries]
+
+        self.keys = numpy.concatenate([self.keys, new_keys])
+        self.active = numpy.concatenate([self.active, numpy.ones(len(entries), dtype=bool)])
+        self.dates = numpy.concatenate([self.dates, dates])
+        self.country = numpy.concatenate([self.country, country])
+        self.countries = list(country_codes)
+        self.cpv_codes, self.cpv_offsets = append_lists(self.cpv_codes, self.cpv_offsets, cpv_lists)
+        self.nuts_codes, self.nuts_offsets = append_lists(self.nuts_codes, self.nuts_offsets, nuts_lists)
+        self.nuts = list(nuts_codes)
+
+    def counts_by_country(self) -> Dict[str, int]:
+        counted = self.country[self.active & (self.country >= 0)]
+        counts = numpy.bincount(counted, minlength=len(self.countries))
+
+        return {country: int(count) for country, count in zip(self.countries, counts) if count}
+
+    def counts_by_cpv_division(self) -> Dict[str, int]:
+        """
+            Number of notices per CPV division; a notice with several codes in one division is counted once.
+        """
+        rows = numpy.repeat(numpy.arange(len(self.keys)), numpy.diff(self.cpv_offsets))
+        divisions = self.cpv_codes // CPV_DIVISION_DIVISOR
+        pairs = numpy.unique((rows * 100 + divisions)[self.active[rows]])
+        counts = numpy.bincount(pairs % 100, minlength=100)
+
+        return {f'{division:02d}': int(count) for division, count in enumerate(counts) if count}
+
+    def counts_by_month(self) -> Dict[str, int]:
+        dates = self.dates[self.active & ~numpy.isnat(self.dates)]
+        months, counts = numpy.unique(dates.astype('datetime64[M]'), return_counts=True)
+
+        return {str(month): int(count) for month, count in zip(months, counts)}
+
+
+def append_lists(values: 'numpy.ndarray', offsets: 'numpy.ndarray', lists: List[List[int]]):
+    """
+        Append variable-length lists to a CSR-style pair of flat values and row offsets.
+    """
+    lengths = numpy.array([len(codes) for codes in lists], dtype=numpy.int64)
+    flat = numpy.array([code for codes in lists for code in codes], dtype=values.dtype)
+
+    return numpy.concatenate([values, flat]), numpy.concatenate([offsets, offsets[-1] + numpy.cumsum(lengths)])
+
+
+def update_corpus_arrays(filename: str) -> CorpusArrays:
+    """
+        Return the analytics arrays of a data file, updated with the index entries written since they were cached.
+        If the index was rebuilt in the meantime (its content at the cached position changed) the arrays are built
+        from scratch.
+    """
+    require_numpy()
+
+    index_file = rebuild_stale_corpus_index(filename)
+    cache_file = analytics_filename(filename)
+    arrays = CorpusArrays.load(cache_file)
+
+    if not os.path.exists(index_file):
+        return arrays
+
+    if arrays.index_offset > os.path.getsize(index_file) or \
+            log_check(index_file, arrays.index_offset) != arrays.index_check:
+        arrays = CorpusArrays()
+
+    entries = []
+    index_offset = arrays.index_offset
+
+    with open(index_file, 'rb') as index:
+        index.seek(index_offset)
+
+        for line in index:
+            if not line.endswith(b'\n'):
+                break  # an entry still being written
+
+            if line.strip():
+                entries.append(json.loads(line))
+
+            index_offset += len(line)
+
+    if entries or not os.path.exists(cache_file):
+        arrays.append(entries)
+        arrays.index_offset = index_offset
+        arrays.index_check = log_check(index_file, index_offset)
+        arrays.save(cache_file)
+
+    return arrays
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Count the scraped notices by country, CPV division or month.')
+    parser.add_argument('by', choices=(BY_COUNTRY, BY_CPV_DIVISION, BY_MONTH), help='what to count by')
+    parser.add_argument('--data', default=OUTPUT_FILE, help='data file (default: %(default)s)')
+    args = parser.parse_args()
+
+    arrays = update_corpus_arrays(args.data)
+    counts = {
+        BY_COUNTRY: arrays.counts_by_country,
+        BY_CPV_DIVISION: arrays.counts_by_cpv_division,
+        BY_MONTH: arrays.counts_by_month
+    }[args.by]()
+
+    for value, count in sorted(counts.items()):
+        print(f'{value}\t{count}')
+
+
+if __name__ == '__main__':
+    main()
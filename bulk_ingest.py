@@ -0,0 +1,303 @@
+import argparse
+import logging
+import os
+import tarfile
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ElementTree
+from typing import Iterator, IO, List, Optional, Tuple
+
+import requests
+
+from data_handling import open_store, record_key, OUTPUT_FILE
+from records import Record
+
+NOTICE_TAG = 'TED_EXPORT'
+
+NOTICE_URL = 'https://ted.europa.eu/udl?uri=TED:NOTICE:{}:TEXT:EN:HTML'
+
+PACKAGE_EXTENSIONS = ('.xml', '.zip', '.tar', '.tar.gz', '.tgz')
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Coded fields of CODIF_DATA and the record key they map to, stored as "CODE - label" like on the DATA tab.
+CODED_FIELDS = {
+    'AA_AUTHORITY_TYPE': 'Type of buyer',
+    'NC_CONTRACT_NATURE': 'Type of contract',
+    'PR_PROC': 'Type of procedure',
+    'TD_DOCUMENT_TYPE': 'Notice type',
+    'RP_REGULATION': 'Regulation',
+    'TY_TYPE_BID': 'Type of bid',
+    'AC_AWARD_CRIT': 'Award criteria'
+}
+
+logger = logging.getLogger(__name__)
+
+
+def local_name(tag: str) -> str:
+    """
+        Strip the XML namespace from a tag, e.g. '{http://...}NO_OJ' -> 'NO_OJ'.
+    """
+    return tag.rsplit('}', 1)[-1]
+
+
+def format_xml_date(value: str) -> str:
+    """
+        Convert a TED XML date (YYYYMMDD) to the DD/MM/YYYY format used on the DATA tab.
+    """
+    value = value.strip()[:8]
+
+    if len(value) != 8 or not value.isdigit():
+        return value
+
+    return f'{value[6:8]}/{value[4:6]}/{value[0:4]}'
+
+
+def element_text(element: Optional[ElementTree.Element]) -> str:
+    if element is None:
+        return ''
+
+    return ' '.join(' '.join(element.itertext()).split())
+
+
+def coded_value(element: ElementTree.Element) -> str:
+    code = element.get('CODE', '')
+    text = element_text(element)
+
+    return f'{code} - {text}' if code and text else code or text
+
+
+def title_document(titles: Optional[ElementTree.Element]) -> Optional[ElementTree.Element]:
+    """
+        Return the English ML_TI_DOC of ML_TITLES, or the first one if there is no English translation.
+    """
+    if titles is None:
+        return None
+
+    documents = titles.findall('ML_TI_DOC')
+    english = [document for document in documents if document.get('LG') == 'EN']
+
+    return (english or documents or [None])[0]
+
+
+def build_title(document: Optional[ElementTree.Element]) -> str:
+    """
+        Build the "Country-Town: Title" string of a ML_TI_DOC.
+    """
+    if document is None:
+        return ''
+
+    country = element_text(document.find('TI_CY'))
+    town = element_text(document.find('TI_TOWN'))
+    text = element_text(document.find('TI_TEXT'))
+    place = '-'.join(part for part in (country, town) if part)
+
+    return f'{place}: {text}' if place else text
+
+
+def extract_data_from_notice(notice: ElementTree.Element) -> Record:
+    """
+        Map a TED_EXPORT element (namespaces already stripped) to the record schema of extract_data_from_table.
+    """
+    data_dict = {}
+
+    notice_number = notice.get('DOC_ID', '')
+    notice_data = notice.find('CODED_DATA_SECTION/NOTICE_DATA')
+    codif_data = notice.find('CODED_DATA_SECTION/CODIF_DATA')
+    ref_ojs = notice.find('CODED_DATA_SECTION/REF_OJS')
+
+    url = ''
+    if notice_data is not None:
+        english_uri = [uri for uri in notice_data.findall('URI_LIST/URI_DOC') if uri.get('LG') == 'EN']
+        url = element_text(english_uri[0]) if english_uri else ''
+
+    title = title_document(notice.find('TRANSLATION_SECTION/ML_TITLES'))
+
+    data_dict['URL'] = url or NOTICE_URL.format(notice_number)
+    data_dict['Title'] = build_title(title)
+    data_dict['Notice publication number'] = notice_number
+
+    if ref_ojs is not None:
+        data_dict['Publication date'] = format_xml_date(element_text(ref_ojs.find('DATE_PUB')))
+        data_dict['OJ S issue number'] = element_text(ref_ojs.find('NO_OJ'))
+
+    if title is not None:
+        data_dict['Town/city of the buyer'] = element_text(title.find('TI_TOWN'))
+
+    data_dict['Official name of the buyer'] = element_text(notice.find('TRANSLATION_SECTION/ML_AA_NAMES/AA_NAME'))
+
+    if notice_data is not None:
+        data_dict['Original language'] = element_text(notice_data.find('LG_ORIG'))
+
+        country = notice_data.find('ISO_COUNTRY')
+        data_dict['Country of the buyer'] = country.get('VALUE', '') if country is not None else ''
+
+    if codif_data is not None:
+        data_dict['Document sent'] = format_xml_date(element_text(codif_data.find('DS_DATE_DISPATCH')))
+
+        for tag, key in CODED_FIELDS.items():
+            element = codif_data.find(tag)
+            if element is not None:
+                data_dict[key] = coded_value(element)
+
+    if notice_data is not None:
+        cpv_codes = [coded_value(cpv) for cpv in notice_data.findall('ORIGINAL_CPV')]
+        nuts_codes = [coded_value(nuts) for nuts in notice_data.iter() if nuts.tag == 'PERFORMANCE_NUTS']
+
+        data_dict['Common procurement vocabulary (CPV)'] = ', '.join(cpv_codes)
+        data_dict['Place of performance (NUTS)'] = ', '.join(nuts_codes)
+        data_dict['Internet address (URL)'] = element_text(notice_data.find('IA_URL_GENERAL'))
+
+    legal_basis = next((element for element in notice.iter() if element.tag == 'LEGAL_BASIS'), None)
+    if legal_basis is not None:
+        data_dict['Legal basis'] = legal_basis.get('VALUE', '') or element_text(legal_basis)
+
+    return Record.from_pairs((key, value) for key, value in data_dict.items() if value)
+
+
+def iter_notices(xml_file: IO[bytes]) -> Iterator[Record]:
+    """
+        Incrementally parse an XML stream and yield a record for every TED_EXPORT element in it.
+        Finished notices are cleared so memory use does not grow with the size of the file.
+    """
+    parser = ElementTree.iterparse(xml_file, events=('start', 'end'))
+
+    for event, element in parser:
+        if event == 'start':
+            element.tag = local_name(element.tag)
+        elif element.tag == NOTICE_TAG:
+            yield extract_data_from_notice(element)
+            element.clear()
+
+
+def is_package(filename: str) -> bool:
+    return filename.lower().endswith(PACKAGE_EXTENSIONS)
+
+
+def iter_package_files(path: str) -> Iterator[Tuple[str, IO[bytes]]]:
+    """
+        Yield (name, file object) for every XML file inside a package (.zip, .tar, .tar.gz or a plain .xml).
+    """
+    lower_path = path.lower()
+
+    if lower_path.endswith('.zip'):
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                if name.lower().endswith('.xml'):
+                    with archive.open(name) as xml_file:
+                        yield name, xml_file
+
+    elif lower_path.endswith(('.tar', '.tar.gz', '.tgz')):
+        with tarfile.open(path, 'r|*') as archive:
+            for member in archive:
+                if member.isfile() and member.name.lower().endswith('.xml'):
+                    yield member.name, archive.extractfile(member)
+
+    else:
+        with open(path, 'rb') as xml_file:
+            yield path, xml_file
+
+
+def iter_package_records(path: str) -> Iterator[Record]:
+    for name, xml_file in iter_package_files(path):
+        try:
+            yield from iter_notices(xml_file)
+        except ElementTree.ParseError as e:
+            logger.warning(f'Skipping malformed XML file {name} in {path}: {e}')
+
+
+def list_packages(source: str) -> List[str]:
+    """
+        Return the package files of a directory (sorted, so daily packages are processed in order) or the source
+        itself if it is a single package.
+    """
+    if os.path.isdir(source):
+        return [os.path.join(source, filename) for filename in sorted(os.listdir(source)) if is_package(filename)]
+
+    return [source]
+
+
+def download_package(session: requests.Session, url: str, directory: str) -> str:
+    """
+        Stream a package from a URL to a file in directory and return the file path.
+    """
+    filename = os.path.join(directory, os.path.basename(url.split('?', 1)[0]) or 'package.xml')
+
+    with session.get(url, stream=True) as response:
+        response.raise_for_status()
+
+        with open(filename, 'wb') as package_file:
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                package_file.write(chunk)
+
+    return filename
+
+
+def ingest_package(path: str, store, existing_notices: set, revalidate: bool = False) -> int:
+    """
+        Write the unseen notices of a package to the store and return how many were written. With revalidate, known
+        notices are passed to the store too, which only writes them if their content hash changed.
+    """
+    new_records = []
+
+    for record in iter_package_records(path):
+        key = record_key(record)
+
+        if key in existing_notices and not revalidate:
+            continue
+
+        new_records.append(record)
+        existing_notices.add(key)
+
+    if not new_records:
+        return 0
+
+    return store.write_many(new_records)
+
+
+def ingest(sources: List[str],
+           output_file: str = OUTPUT_FILE,
+           session: Optional[requests.Session] = None,
+           revalidate: bool = False) -> int:
+    """
+        Ingest bulk packages from local files, directories or HTTP(S) URLs into output_file. Data is written once per
+        package instead of once per notice. Returns the number of new (or, with revalidate, amended) records.
+    """
+    store = open_store(output_file, index=True, journal=True)
+    existing_notices = store.keys()
+    total = 0
+
+    with tempfile.TemporaryDirectory() as download_directory:
+        for source in sources:
+            if source.startswith(('http://', 'https://')):
+                session = session or requests.Session()
+                packages = [download_package(session, source, download_directory)]
+            else:
+                packages = list_packages(source)
+
+            for package in packages:
+                added = ingest_package(package, store, existing_notices, revalidate)
+                total += added
+
+                logger.info(f'Ingested {added} new notices from {package}')
+
+    store.close()
+
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Ingest TED bulk XML notice packages.')
+    parser.add_argument('sources', nargs='+', help='package files, directories of packages or package URLs')
+    parser.add_argument('--output', default=OUTPUT_FILE, help='output file (default: %(default)s)')
+    parser.add_argument('--revalidate', action='store_true',
+                        help='also compare known notices and update the ones that were amended')
+    args = parser.parse_args()
+
+    added = ingest(args.sources, args.output, revalidate=args.revalidate)
+
+    print(f'Ingested {added} new notices into {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+import json
+import os
+import re
+import sqlite3
+from typing import IO, Iterable, List, Mapping, Optional, Tuple
+
+FIELD_COUNTRY = 'country'
+FIELD_NOTICE_TYPE = 'notice_type'
+FIELD_CPV = 'cpv'
+FIELD_NUTS = 'nuts'
+
+# Fields holding lists of codes, which match by prefix, so "45" finds 45000000 and 45210000.
+CODE_FIELDS = (FIELD_CPV, FIELD_NUTS)
+
+LOG_CHECK_SIZE = 256
+
+CPV_PATTERN = re.compile(r'\b(\d{8})(?:-\d)?\b')
+NUTS_PATTERN = re.compile(r'(?:^|[,;\n])\s*([A-Z]{2}[0-9A-Z]{0,3})\b')
+CODED_VALUE_PATTERN = re.compile(r'^\s*[0-9A-Z]+\s+-\s+')
+DATE_PATTERN = re.compile(r'^\s*(\d{1,2})/(\d{1,2})/(\d{4})\s*$')
+ISO_DATE_PATTERN = re.compile(r'^\s*(\d{4})-(\d{2})-(\d{2})\s*$')
+
+
+def iso_date(value: str) -> Optional[str]:
+    """
+        YYYY-MM-DD of a DD/MM/YYYY (or already YYYY-MM-DD) date, or None if it can't be parsed.
+    """
+    match = DATE_PATTERN.match(value or '')
+
+    if match:
+        day, month, year = match.groups()
+        return f'{year}-{int(month):02d}-{int(day):02d}'
+
+    match = ISO_DATE_PATTERN.match(value or '')
+
+    return '-'.join(match.groups()) if match else None
+
+
+def normalize_notice_type(value: str) -> Optional[str]:
+    """
+        Lower-case label of a notice type, without the code bulk packages prefix it with ("3 - Contract notice").
+    """
+    label = CODED_VALUE_PATTERN.sub('', value or '').strip().lower()
+
+    return label or None
+
+
+def normalize_country(value: str) -> Optional[str]:
+    return (value or '').strip().upper() or None
+
+
+def index_terms(record: Mapping[str, str]) -> dict:
+    """
+        The indexed terms of a record: country, notice type, CPV and NUTS codes and the ISO publication date.
+    """
+    return {
+        FIELD_COUNTRY: normalize_country(record.get('Country of the buyer', '')),
+        FIELD_NOTICE_TYPE: normalize_notice_type(record.get('Notice type', '')),
+        FIELD_CPV: sorted(set(CPV_PATTERN.findall(record.get('Common procurement vocabulary (CPV)', '') or ''))),
+        FIELD_NUTS: sorted(set(NUTS_PATTERN.findall(record.get('Place of performance (NUTS)', '') or ''))),
+        'date': iso_date(record.get('Publication date', ''))
+    }
+
+
+def log_check(filename: str, offset: int) -> bytes:
+    """
+        The bytes of a log just before offset. If they changed, the log was rewritten since it was read up to offset.
+    """
+    with open(filename, 'rb') as log_file:
+        log_file.seek(max(0, offset - LOG_CHECK_SIZE))
+        return log_file.read(min(offset, LOG_CHECK_SIZE))
+
+
+def database_filename(filename: str) -> str:
+    return os.path.splitext(filename)[0] + '.sqlite'
+
+
+class CorpusIndexLog:
+    """
+        The index file of a data file: every persisted record appends one line of terms (and the record's byte
+        offset, for line-delimited JSON), so the index grows with the data file instead of being rebuilt. A later
+        line for the same key replaces the earlier one. Writing only appends; nothing is kept in memory.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.index_file: Optional[IO[str]] = None
+
+    def open(self) -> IO[str]:
+        if self.index_file is None:
+            self.index_file = open(self.filename, 'a', encoding='utf-8')
+
+        return self.index_file
+
+    def add(self, key: str, record: Mapping[str, str], offset: Optional[int] = None) -> None:
+        """
+            Index a persisted record, replacing the entry of an earlier version.
+        """
+        entry = {'key': key, 'offset': offset, **index_terms(record)}
+
+        self.open().write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def add_many(self, records: Iterable[Tuple[str, Mapping[str, str], Optional[int]]]) -> None:
+        for key, record, offset in records:
+            self.add(key, record, offset)
+
+        self.flush()
+
+    def reset(self) -> None:
+        """
+            Truncate the index file, before rebuilding it from the data file.
+        """
+        self.close()
+
+        open(self.filename, 'w', encoding='utf-8').close()
+
+    def flush(self) -> None:
+        if self.index_file is not None:
+            self.index_file.flush()
+
+    def close(self) -> None:
+        if self.index_file is not None:
+            self.index_file.close()
+            self.index_file = None
+
+            os.utime(self.filename)  # the index covers everything written to the data file so far
+
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, offset INTEGER, country TEXT, notice_type TEXT,
+                                        date TEXT);
+    CREATE TABLE IF NOT EXISTS codes (field TEXT, code TEXT, key TEXT);
+    CREATE TABLE IF NOT EXISTS log (offset INTEGER, "check" BLOB);
+    CREATE INDEX IF NOT EXISTS entries_country ON entries (country);
+    CREATE INDEX IF NOT EXISTS entries_notice_type ON entries (notice_type);
+    CREATE INDEX IF NOT EXISTS entries_date ON entries (date);
+    CREATE INDEX IF NOT EXISTS codes_code ON codes (field, code);
+    CREATE INDEX IF NOT EXISTS codes_key ON codes (key);
+"""
+
+
+class CorpusIndex:
+    """
+        Queries a data file by country, notice type, CPV prefix, NUTS prefix and publication date. The entries of
+        the index file (see CorpusIndexLog) are loaded into an SQLite database next to it (<index>.sqlite), which
+        remembers how far into the index file it got, so opening the index only reads the lines appended since and
+        a query only reads the matching rows. If the index file was rebuilt, the database is rebuilt too.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.log = CorpusIndexLog(filename)
+        self.connection = sqlite3.connect(database_filename(filename))
+        self.connection.executescript(SCHEMA)
+
+        self.update()
+
+    def __len__(self) -> int:
+        self.update()
+
+        return self.connection.execute('SELECT count(*) FROM entries').fetchone()[0]
+
+    def __contains__(self, key: str) -> bool:
+        return self.offset_row(key) is not None
+
+    def add(self, key: str, record: Mapping[str, str], offset: Optional[int] = None) -> None:
+        self.log.add(key, record, offset)
+
+    def add_many(self, records: Iterable[Tuple[str, Mapping[str, str], Optional[int]]]) -> None:
+        self.log.add_many(records)
+
+    def update(self) -> None:
+        """
+            Apply the index entries appended since the last update.
+        """
+        self.log.flush()
+
+        row = self.connection.execute('SELECT offset, "check" FROM log').fetchone()
+        offset, check = row if row else (0, b'')
+
+        if not os.path.exists(self.filename):
+            return
+
+        if offset > os.path.getsize(self.filename) or log_check(self.filename, offset) != check:
+            offset = 0
+            self.connection.execute('DELETE FROM entries')
+            self.connection.execute('DELETE FROM codes')
+
+        with self.connection, open(self.filename, 'rb') as log_file:
+            log_file.seek(offset)
+
+            for line in log_file:
+                if not line.endswith(b'\n'):
+                    break  # an entry still being written
+
+                if line.strip():
+                    self.add_entry(json.loads(line))
+
+                offset += len(line)
+
+            self.connection.execute('DELETE FROM log')
+            self.connection.execute('INSERT INTO log VALUES (?, ?)', (offset, log_check(self.filename, offset)))
+
+    def add_entry(self, entry: dict) -> None:
+        key = entry['key']
+
+        self.connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                                (key, entry.get('offset'), entry.get(FIELD_COUNTRY), entry.get(FIELD_NOTICE_TYPE),
+                                 entry.get('date')))
+        self.connection.execute('DELETE FROM codes WHERE key = ?', (key,))
+        self.connection.executemany('INSERT INTO codes VALUES (?, ?, ?)',
+                                    [(field, code, key) for field in CODE_FIELDS for code in entry.get(field) or []])
+
+    def close(self) -> None:
+        self.log.close()
+        self.connection.close()
+
+    def offset_row(self, key: str) -> Optional[tuple]:
+        return self.connection.execute('SELECT offset FROM entries WHERE key = ?', (key,)).fetchone()
+
+    def offset(self, key: str) -> Optional[int]:
+        row = self.offset_row(key)
+
+        return row[0] if row is not None else None
+
+    def query(self,
+              country: Optional[str] = None,
+              notice_type: Optional[str] = None,
+              cpv: Optional[str] = None,
+              nuts: Optional[str] = None,
+              date_from: Optional[str] = None,
+              date_to: Optional[str] = None) -> List[str]:
+        """
+            Keys of the records matching every given criterion, newest publication first. CPV and NUTS match by code
+            prefix, dates (DD/MM/YYYY or YYYY-MM-DD) are inclusive.
+        """
+        self.update()
+
+        conditions = []
+        parameters = []
+
+        for column, value in ((FIELD_COUNTRY, normalize_country(country) if country else None),
+                              (FIELD_NOTICE_TYPE, normalize_notice_type(notice_type) if notice_type else None)):
+            if value:
+                conditions.append(f'{column} = ?')
+                parameters.append(value)
+
+        for field, prefix in ((FIELD_CPV, cpv.strip() if cpv else None),
+                              (FIELD_NUTS, nuts.strip().upper() if nuts else None)):
+            if prefix:
+                conditions.append('key IN (SELECT key FROM codes WHERE field = ? AND code >= ? AND code < ?)')
+                parameters.extend((field, prefix, prefix + '\uffff'))
+
+        for operator, value in (('>=', date_from), ('<=', date_to)):
+            if value:
+                conditions.append(f'date {operator} ?')
+                parameters.append(iso_date(value))
+
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        rows = self.connection.execute(f"SELECT key FROM entries {where} ORDER BY coalesce(date, '') DESC, key DESC",
+                                       parameters)
+
+        return [key for key, in rows]
@@ -1,29 +1,60 @@
+import gzip
+import hashlib
+import io
 import json
-from typing import List, Dict
+import logging
+import os
+import time
+import zlib
+from typing import List, Dict, Set, Mapping, Iterator, Iterable, IO, Optional, Tuple
+
+from corpus_index import CorpusIndex, CorpusIndexLog
+from records import Record, encode_record, CONTENT_HASH_FIELD
+from utils import notice_number_from_href
 
 OUTPUT_FILE = 'output.json'
 
+STREAM_OUTPUT_FILE = 'output.jsonl'
+
 STATE_FILE = 'state.json'
 
+READ_CHUNK_SIZE = 64 * 1024
+
+GZIP_EXTENSION = '.gz'
+ZSTD_EXTENSION = '.zst'
+COMPRESSED_EXTENSIONS = (GZIP_EXTENSION, ZSTD_EXTENSION)
+
+BLOCK_SIZE = 1000
+
+# A journaled store fsyncs its journal every GROUP_SIZE records or GROUP_INTERVAL seconds, whichever comes first, and
+# applies the journal to the data file every CHECKPOINT_SIZE records (one compressed block).
+GROUP_SIZE = 16
+GROUP_INTERVAL = 2.0
+CHECKPOINT_SIZE = BLOCK_SIZE
+
+logger = logging.getLogger(__name__)
 
-def load_data(filename: str) -> List[Dict[str, str]]:
+LISTING_FILE = 'listing.json'
+
+
+def load_data(filename: str) -> List[Record]:
     """
         Load existing data from a JSON file.
     """
     try:
         with open(filename, 'r', encoding='utf-8') as json_file:
-            existing_data = json.load(json_file)
+            existing_data = json.load(json_file, object_pairs_hook=Record.from_pairs)
         return existing_data
     except FileNotFoundError:
         return []
 
 
-def save_data(data: List[Dict[str, str]], filename: str) -> None:
+def save_data(data: List[Mapping[str, str]], filename: str) -> None:
     """
     Save scraped data to a JSON file.
     """
     with open(filename, 'w', encoding='utf-8') as json_file:
-        json.dump(data, json_file, ensure_ascii=False, indent=4)
+        json.dump(data, json_file, ensure_ascii=False, indent=4, default=encode_record)
 
 
 def load_state(filename: str) -> Dict:
@@ -44,3 +75,917 @@ def save_state(state: Dict, filename: str) -> None:
     """
     with open(filename, 'w', encoding='utf-8') as state_file:
         json.dump(state, state_file, ensure_ascii=False, indent=4)
+
+
+def record_key(record: Mapping[str, str]) -> str:
+    """
+        Return the key used to deduplicate a record: its notice publication number, or the URL if it has none.
+    """
+    notice_number = record.get('Notice publication number')
+
+    if notice_number:
+        return notice_number
+
+    url = record.get('URL', '')
+
+    return notice_number_from_href(url) or url
+
+
+def build_index(data: List[Mapping[str, str]]) -> Set[str]:
+    """
+        Build the set of record keys for already scraped data.
+    """
+    return {record_key(record) for record in data}
+
+
+def iter_json_array(json_file: IO[str]) -> Iterator[Record]:
+    """
+        Yield the objects of a JSON array one at a time, reading the file in chunks instead of loading it whole.
+    """
+    decoder = json.JSONDecoder(object_pairs_hook=Record.from_pairs)
+    buffer = json_file.read(READ_CHUNK_SIZE).lstrip()[1:]
+    position = 0
+
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+
+        if position < len(buffer) and buffer[position] == ']':
+            return
+
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = json_file.read(READ_CHUNK_SIZE)
+
+            if not chunk:
+                if buffer[position:].strip():
+                    raise
+
+                return
+
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+
+        yield record
+
+        position = end
+
+
+def is_compressed(filename: str) -> bool:
+    return filename.endswith(COMPRESSED_EXTENSIONS)
+
+
+def require_zstandard():
+    """
+        Import zstandard, which is only needed (and only loaded) once a .zst file is used.
+    """
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError('zstd compressed stores need the zstandard package: pip install zstandard') from None
+
+    return zstandard
+
+
+def compress_block(data: bytes, filename: str) -> bytes:
+    """
+        Compress a block as a self-contained gzip member or zstd frame, chosen by the file extension. Concatenated
+        blocks are still one valid .gz/.zst stream.
+    """
+    if filename.endswith(ZSTD_EXTENSION):
+        return require_zstandard().ZstdCompressor().compress(data)
+
+    return gzip.compress(data, mtime=0)
+
+
+def decompress_block(data: bytes, filename: str) -> bytes:
+    if filename.endswith(ZSTD_EXTENSION):
+        return require_zstandard().ZstdDecompressor().decompress(data)
+
+    return gzip.decompress(data)
+
+
+def block_decompressor(filename: str):
+    """
+        Incremental decompressor that stops at the end of one gzip member or zstd frame (eof, unused_data).
+    """
+    if filename.endswith(ZSTD_EXTENSION):
+        return require_zstandard().ZstdDecompressor().decompressobj()
+
+    return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+
+def open_compressed_text(filename: str) -> IO[str]:
+    if filename.endswith(ZSTD_EXTENSION):
+        reader = require_zstandard().ZstdDecompressor().stream_reader(open(filename, 'rb'), read_across_frames=True,
+                                                            closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8')
+
+    return gzip.open(filename, 'rt', encoding='utf-8')
+
+
+def iter_records(filename: str) -> Iterator[Record]:
+    """
+        Stream the records of a data file: a JSON array (output.json), line-delimited JSON (output.jsonl) or
+        compressed line-delimited JSON (output.jsonl.gz, output.jsonl.zst).
+    """
+    if is_compressed(filename):
+        if not os.path.exists(filename):
+            return
+
+        with open_compressed_text(filename) as json_file:
+            for line in json_file:
+                if line.strip():
+                    yield json.loads(line, object_pairs_hook=Record.from_pairs)
+
+        return
+
+    try:
+        json_file = open(filename, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return
+
+    with json_file:
+        first_character = json_file.read(1)
+
+        while first_character and first_character.isspace():
+            first_character = json_file.read(1)
+
+        if first_character == '[':
+            json_file.seek(0)
+            yield from iter_json_array(json_file)
+            return
+
+        json_file.seek(0)
+
+        for line in json_file:
+            if line.endswith('\n') and line.strip():  # a last line cut short by a crash is ignored
+                yield json.loads(line, object_pairs_hook=Record.from_pairs)
+
+
+def write_records(records: Iterable[Mapping[str, str]], filename: str) -> int:
+    """
+        Write records to a new data file without holding them in memory: line-delimited JSON for .jsonl files, a
+        JSON array in the format of save_data otherwise. The file is replaced only once it is complete. Returns the
+        number of records written.
+    """
+    temporary_filename = filename + '.tmp'
+    count = 0
+
+    if is_compressed(filename):
+        extension = os.path.splitext(filename)[1]
+        temporary_filename += extension
+
+        for leftover in (temporary_filename, block_index_filename(temporary_filename)):
+            if os.path.exists(leftover):
+                os.remove(leftover)  # from an interrupted write; the store would append to it
+
+        store = CompressedJsonLinesStore(temporary_filename)
+
+        for record in records:
+            store.write(record)
+            count += 1
+
+        store.close()
+
+        if not count:
+            for empty in (temporary_filename, block_index_filename(temporary_filename)):
+                open(empty, 'wb').close()  # no block was written, but the old data must still be replaced
+
+        os.replace(block_index_filename(temporary_filename), block_index_filename(filename))
+        os.replace(temporary_filename, filename)
+
+        return count
+
+    with open(temporary_filename, 'w', encoding='utf-8') as json_file:
+        if filename.endswith('.jsonl'):
+            for record in records:
+                json_file.write(json.dumps(record, ensure_ascii=False, default=encode_record) + '\n')
+                count += 1
+        else:
+            json_file.write('[')
+
+            for record in records:
+                json_file.write(',\n    ' if count else '\n    ')
+                record_json = json.dumps(record, ensure_ascii=False, indent=4, default=encode_record)
+                json_file.write(record_json.replace('\n', '\n    '))
+                count += 1
+
+            json_file.write('\n]' if count else ']')
+
+    os.replace(temporary_filename, filename)
+
+    return count
+
+
+def build_index_from_file(filename: str) -> Set[str]:
+    """
+        Build the set of record keys of a data file without keeping its records in memory.
+    """
+    return build_index(iter_records(filename))
+
+
+class JsonArrayStore:
+    """
+        Store backed by a pretty-printed JSON array. Keeps every record in memory and rewrites the whole file on
+        each write, replacing it only once the new version is complete. Writing a record whose key already exists
+        replaces it in place.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.data = load_data(filename)
+        self.positions = {record_key(record): position for position, record in enumerate(self.data)}
+
+    def keys(self) -> Set[str]:
+        return set(self.positions)
+
+    def iter_records(self) -> Iterator[Mapping[str, str]]:
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def add(self, record: Mapping[str, str]) -> None:
+        key = record_key(record)
+        position = self.positions.get(key)
+
+        if position is None:
+            self.positions[key] = len(self.data)
+            self.data.append(record)
+        else:
+            self.data[position] = record
+
+    def write(self, record: Mapping[str, str]) -> None:
+        self.write_many([record])
+
+    def write_many(self, records: Iterable[Mapping[str, str]]) -> None:
+        for record in records:
+            self.add(record)
+
+        write_records(self.data, self.filename)
+
+    def close(self) -> None:
+        """
+            Every write is already saved, so there is nothing left to flush.
+        """
+
+
+def truncate_torn_line(filename: str) -> None:
+    """
+        Cut off a last line left without its newline by a crash, so the next line appended starts on a line of its own.
+    """
+    try:
+        data_file = open(filename, 'rb+')
+    except FileNotFoundError:
+        return
+
+    with data_file:
+        end = data_file.seek(0, os.SEEK_END)
+        position = end
+
+        if end == 0:
+            return
+
+        while position > 0:
+            start = max(0, position - READ_CHUNK_SIZE)
+            data_file.seek(start)
+            chunk = data_file.read(position - start)
+
+            if position == end and chunk.endswith(b'\n'):
+                return
+
+            newline = chunk.rfind(b'\n')
+
+            if newline != -1:
+                position = start + newline + 1
+                break
+
+            position = start
+
+        logger.warning(f'Truncating a torn last line of {end - position} bytes from {filename}')
+        data_file.truncate(position)
+
+
+class JsonLinesStore:
+    """
+        Store backed by line-delimited JSON. Records are appended to the file as they are written and are not kept
+        in memory, so a run only holds the index of record keys. A new version of a record is appended too; the
+        last line of a key is the current one (merge_data compacts the file).
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.count = 0
+        self.json_file = None
+
+    def keys(self) -> Set[str]:
+        keys = set()
+        self.count = 0
+
+        for record in iter_records(self.filename):
+            keys.add(record_key(record))
+            self.count += 1
+
+        return keys
+
+    def iter_records(self) -> Iterator[Mapping[str, str]]:
+        return iter_records(self.filename)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def open(self) -> IO[str]:
+        if self.json_file is None:
+            truncate_torn_line(self.filename)
+            self.json_file = open(self.filename, 'a', encoding='utf-8')
+
+        return self.json_file
+
+    def write(self, record: Mapping[str, str]) -> None:
+        self.write_many([record])
+
+    def write_many(self, records: Iterable[Mapping[str, str]]) -> List[int]:
+        """
+            Append the records and return the byte offset of each line.
+        """
+        json_file = self.open()
+        offset = json_file.tell()
+        offsets = []
+
+        for record in records:
+            line = json.dumps(record, ensure_ascii=False, default=encode_record) + '\n'
+            json_file.write(line)
+            offsets.append(offset)
+            offset += len(line.encode('utf-8'))
+            self.count += 1
+
+        json_file.flush()
+
+        return offsets
+
+    def close(self) -> None:
+        if self.json_file is not None:
+            self.json_file.close()
+            self.json_file = None
+
+
+def block_index_filename(filename: str) -> str:
+    return filename + '.idx'
+
+
+def load_block_index(filename: str) -> List[dict]:
+    """
+        Load the block offset index of a compressed store: one {"offset", "length", "keys"} entry per block.
+    """
+    try:
+        with open(block_index_filename(filename), 'r', encoding='utf-8') as index_file:
+            # a last entry cut short by a crash is ignored; its block is indexed again from the data file
+            return [json.loads(line) for line in index_file if line.endswith('\n') and line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def read_block(filename: str, offset: int, length: int) -> List[Record]:
+    with open(filename, 'rb') as data_file:
+        data_file.seek(offset)
+        block = decompress_block(data_file.read(length), filename)
+
+    return [json.loads(line, object_pairs_hook=Record.from_pairs) for line in block.decode('utf-8').splitlines()]
+
+
+def scan_blocks(filename: str, offset: int = 0) -> Tuple[List[dict], int]:
+    """
+        Find the complete gzip members / zstd frames of a compressed file from offset on, with the keys of their
+        records, for files whose block index is missing or behind. Returns the block index entries and the offset
+        where the complete blocks end. A block cut short at the end of the file is left out; data that can't be
+        decompressed at all raises ValueError.
+    """
+    blocks = []
+    start = position = offset
+    decompressor = block_decompressor(filename)
+    keys = []
+    line_buffer = b''
+    pending = b''
+
+    def add_lines(lines: List[bytes]) -> None:
+        keys.extend(record_key(json.loads(line)) for line in lines if line.strip())
+
+    with open(filename, 'rb') as data_file:
+        data_file.seek(offset)
+
+        while True:
+            data = pending or data_file.read(READ_CHUNK_SIZE)
+            pending = b''
+
+            if not data:
+                break
+
+            try:
+                line_buffer += decompressor.decompress(data)
+            except Exception as error:  # zlib.error or zstandard.ZstdError
+                raise ValueError(f'{filename} is damaged at byte {start}: {error}') from error
+
+            *lines, line_buffer = line_buffer.split(b'\n')
+            add_lines(lines)
+
+            if not decompressor.eof:
+                position += len(data)
+                continue
+
+            pending = decompressor.unused_data
+            position += len(data) - len(pending)
+            add_lines([line_buffer])
+
+            blocks.append({'offset': start, 'length': position - start, 'keys': keys})
+
+            start = position
+            decompressor = block_decompressor(filename)
+            keys = []
+            line_buffer = b''
+
+    return blocks, start
+
+
+class CompressedJsonLinesStore:
+    """
+        Line-delimited JSON compressed in independent blocks of block_size records (gzip members for .gz files,
+        zstd frames for .zst files). The file can be decompressed as a whole, and a block offset index
+        (<filename>.idx) lets a single notice be read by decompressing only its block. Records are buffered until a
+        block is full; close() writes the last partial block.
+    """
+
+    def __init__(self, filename: str, block_size: int = BLOCK_SIZE):
+        if filename.endswith(ZSTD_EXTENSION):
+            require_zstandard()
+
+        self.filename = filename
+        self.block_size = block_size
+        self.blocks = load_block_index(filename)
+        self.buffer: List[Tuple[str, str]] = []
+
+        self.recover_unindexed_blocks()
+
+        self.locations: Dict[str, dict] = {}
+
+        for block in self.blocks:
+            self.locate(block)
+
+    def recover_unindexed_blocks(self) -> None:
+        """
+            A block is indexed only after it is fully written, so data past the last indexed block is either a
+            complete block whose index entry was not (fully) written yet, which is indexed now, or a partial write
+            from an interrupted run, which is truncated. A file without any index (e.g. compressed with gzip) is
+            scanned and indexed as a whole; if nothing in it can be read it is left alone and the store refuses to
+            open.
+        """
+        end = self.blocks[-1]['offset'] + self.blocks[-1]['length'] if self.blocks else 0
+
+        truncate_torn_line(block_index_filename(self.filename))
+
+        if not os.path.exists(self.filename) or os.path.getsize(self.filename) <= end:
+            return
+
+        indexed = os.path.exists(block_index_filename(self.filename))
+
+        try:
+            blocks, end = scan_blocks(self.filename, end)
+        except ValueError:
+            if not indexed:
+                raise
+
+            blocks = []  # garbage after the indexed blocks
+
+        if not indexed and not blocks:
+            raise ValueError(f'{self.filename} holds no complete compressed block')
+
+        with open(block_index_filename(self.filename), 'a', encoding='utf-8') as index_file:
+            for block in blocks:
+                index_file.write(json.dumps(block, ensure_ascii=False) + '\n')
+
+        self.blocks.extend(blocks)
+
+        if os.path.getsize(self.filename) > end:
+            logger.warning(f'Dropping {os.path.getsize(self.filename) - end} bytes of a partial block from '
+                           f'{self.filename}')
+
+            with open(self.filename, 'r+b') as data_file:
+                data_file.truncate(end)
+
+    def locate(self, block: dict) -> None:
+        for key in block['keys']:
+            self.locations[key] = block
+
+    def keys(self) -> Set[str]:
+        return set(self.locations) | {key for key, _ in self.buffer}
+
+    def __len__(self) -> int:
+        return sum(len(block['keys']) for block in self.blocks) + len(self.buffer)
+
+    def iter_records(self) -> Iterator[Record]:
+        yield from iter_records(self.filename)
+
+        for _, line in self.buffer:
+            yield json.loads(line, object_pairs_hook=Record.from_pairs)
+
+    def read(self, key: str) -> Optional[Record]:
+        """
+            Read the current version of a record by decompressing only the block that holds it.
+        """
+        for buffered_key, line in reversed(self.buffer):
+            if buffered_key == key:
+                return json.loads(line, object_pairs_hook=Record.from_pairs)
+
+        block = self.locations.get(key)
+
+        if block is None:
+            return None
+
+        records = [record for record in read_block(self.filename, block['offset'], block['length'])
+                   if record_key(record) == key]
+
+        return records[-1] if records else None
+
+    def write(self, record: Mapping[str, str]) -> None:
+        self.write_many([record])
+
+    def write_many(self, records: Iterable[Mapping[str, str]]) -> None:
+        for record in records:
+            self.buffer.append((record_key(record), json.dumps(record, ensure_ascii=False, default=encode_record)))
+
+            if len(self.buffer) >= self.block_size:
+                self.flush()
+
+    def flush(self) -> None:
+        """
+            Compress the buffered records into a block, append it and then its index entry.
+        """
+        if not self.buffer:
+            return
+
+        data = compress_block(''.join(line + '\n' for _, line in self.buffer).encode('utf-8'), self.filename)
+
+        with open(self.filename, 'ab') as data_file:
+            offset = data_file.tell()
+            data_file.write(data)
+
+        block = {'offset': offset, 'length': len(data), 'keys': [key for key, _ in self.buffer]}
+
+        with open(block_index_filename(self.filename), 'a', encoding='utf-8') as index_file:
+            index_file.write(json.dumps(block, ensure_ascii=False) + '\n')
+
+        self.blocks.append(block)
+        self.locate(block)
+        self.buffer = []
+
+    def close(self) -> None:
+        self.flush()
+
+
+def content_hash(record: Mapping[str, str]) -> str:
+    """
+        Hash of a record's content: every field except the hash itself, with whitespace normalized and keys sorted,
+        so the same notice scraped twice gets the same hash.
+    """
+    normalized = sorted((key, ' '.join(str(value).split())) for key, value in record.items()
+                        if key != CONTENT_HASH_FIELD)
+
+    return hashlib.blake2b(json.dumps(normalized, ensure_ascii=False).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def with_content_hash(record: Mapping[str, str]) -> Record:
+    return Record.from_mapping(record).updated([(CONTENT_HASH_FIELD, content_hash(record))])
+
+
+def changes_filename(filename: str) -> str:
+    for extension in COMPRESSED_EXTENSIONS:
+        if filename.endswith(extension):
+            filename = filename[:-len(extension)]
+
+    return os.path.splitext(filename)[0] + '.changes.jsonl'
+
+
+class ChangeTrackingStore:
+    """
+        Wraps a store and stamps every record with its content hash. Writing a record that is identical to the
+        stored version is skipped; a record that differs (an amended notice) is written and logged to a compact
+        change log of (key, old hash, new hash, time) lines, which downstream consumers can use to sync
+        incrementally.
+    """
+
+    def __init__(self, store, change_log_file: Optional[str] = None):
+        self.store = store
+        self.filename = store.filename
+        self.change_log_file = change_log_file or changes_filename(store.filename)
+        self.hashes: Dict[str, str] = {}
+
+        for record in store.iter_records():
+            self.hashes[record_key(record)] = record.get(CONTENT_HASH_FIELD) or content_hash(record)
+
+    def keys(self) -> Set[str]:
+        return set(self.hashes)
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def iter_records(self) -> Iterator[Mapping[str, str]]:
+        return self.store.iter_records()
+
+    def log_change(self, key: str, old_hash: str, new_hash: str) -> None:
+        with open(self.change_log_file, 'a', encoding='utf-8') as change_log:
+            change_log.write(json.dumps({'key': key, 'old': old_hash, 'new': new_hash, 'time': int(time.time())}) +
+                             '\n')
+
+    def changed(self, records: Iterable[Mapping[str, str]]) -> List[Record]:
+        """
+            Return the records (with their hash) that are new or differ from the stored version, logging amendments.
+        """
+        changed = []
+
+        for record in records:
+            record = with_content_hash(record)
+            key = record_key(record)
+            old_hash = self.hashes.get(key)
+            new_hash = record[CONTENT_HASH_FIELD]
+
+            if old_hash == new_hash:
+                continue
+
+            if old_hash is not None:
+                self.log_change(key, old_hash, new_hash)
+
+            self.hashes[key] = new_hash
+            changed.append(record)
+
+        return changed
+
+    def write(self, record: Mapping[str, str]) -> bool:
+        """
+            Write the record unless it is unchanged. Returns whether it was written.
+        """
+        return bool(self.write_many([record]))
+
+    def write_many(self, records: Iterable[Mapping[str, str]]) -> int:
+        changed = self.changed(records)
+
+        if changed:
+            self.store.write_many(changed)
+
+        return len(changed)
+
+    def close(self) -> None:
+        self.store.close()
+
+
+def journal_filename(filename: str) -> str:
+    return filename + '.journal.jsonl'
+
+
+def fsync_file(filename: str) -> None:
+    with open(filename, 'rb') as synced_file:
+        os.fsync(synced_file.fileno())
+
+
+def read_journal(filename: str) -> List[Record]:
+    """
+        The complete records of a journal. A last line cut short by a crash is ignored.
+    """
+    try:
+        with open(filename, 'rb') as journal:
+            return [json.loads(line, object_pairs_hook=Record.from_pairs) for line in journal
+                    if line.endswith(b'\n') and line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+class JournaledStore:
+    """
+        Wraps a store with a write-ahead journal (<filename>.journal.jsonl). Written records are appended to the
+        journal and fsynced in groups; they reach the data file in checkpoints of CHECKPOINT_SIZE records and on
+        close, after which the journal is emptied. A JSON array is thus rewritten once per checkpoint instead of
+        after every record, and a compressed store gets full blocks. Records left in the journal by a crash are
+        replayed into the data file when the store is opened again (recovered is their number).
+    """
+
+    def __init__(self,
+                 store,
+                 journal_file: Optional[str] = None,
+                 group_size: int = GROUP_SIZE,
+                 group_interval: float = GROUP_INTERVAL,
+                 checkpoint_size: int = CHECKPOINT_SIZE,
+                 clock=time.monotonic):
+        self.store = store
+        self.filename = store.filename
+        self.journal_file = journal_file or journal_filename(store.filename)
+        self.group_size = group_size
+        self.group_interval = group_interval
+        self.checkpoint_size = checkpoint_size
+        self.clock = clock
+
+        self.pending: List[Mapping[str, str]] = []
+        self.unsynced = 0
+        self.last_sync = clock()
+        self.journal = None
+
+        recovered = read_journal(self.journal_file)
+        self.recovered = len(recovered)
+
+        if recovered:
+            logger.warning(f'Replaying {len(recovered)} records from {self.journal_file} into {self.filename}')
+
+            self.pending = recovered
+            self.checkpoint()
+
+    def keys(self) -> Set[str]:
+        return self.store.keys() | {record_key(record) for record in self.pending}
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def iter_records(self) -> Iterator[Mapping[str, str]]:
+        yield from self.store.iter_records()
+        yield from self.pending
+
+    def open(self) -> IO[str]:
+        if self.journal is None:
+            self.journal = open(self.journal_file, 'a', encoding='utf-8')
+
+        return self.journal
+
+    def write(self, record: Mapping[str, str]) -> None:
+        self.write_many([record])
+
+    def write_many(self, records: Iterable[Mapping[str, str]]) -> None:
+        journal = self.open()
+
+        for record in records:
+            journal.write(json.dumps(record, ensure_ascii=False, default=encode_record) + '\n')
+            self.pending.append(record)
+            self.unsynced += 1
+
+        journal.flush()
+
+        if self.unsynced >= self.group_size or self.clock() - self.last_sync >= self.group_interval:
+            self.sync()
+
+        if len(self.pending) >= self.checkpoint_size:
+            self.checkpoint()
+
+    def sync(self) -> None:
+        if self.journal is not None and self.unsynced:
+            os.fsync(self.journal.fileno())
+
+        self.unsynced = 0
+        self.last_sync = self.clock()
+
+    def checkpoint(self) -> None:
+        """
+            Apply the journaled records to the data file, make them durable there and empty the journal.
+        """
+        self.sync()
+
+        if self.pending:
+            self.store.write_many(self.pending)
+
+            if hasattr(self.store, 'flush'):
+                self.store.flush()
+
+            fsync_file(self.filename)
+
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+
+        self.pending = []
+
+    def close(self) -> None:
+        self.checkpoint()
+        self.store.close()
+
+
+def corpus_index_filename(filename: str) -> str:
+    return filename + '.index.jsonl'
+
+
+def iter_records_with_offsets(filename: str) -> Iterator[Tuple[Optional[int], Record]]:
+    """
+        Stream the records of a data file with the byte offset of their line, for line-delimited JSON. Records of
+        other formats have no offset.
+    """
+    if not filename.endswith('.jsonl'):
+        for record in iter_records(filename):
+            yield None, record
+
+        return
+
+    try:
+        json_file = open(filename, 'rb')
+    except FileNotFoundError:
+        return
+
+    with json_file:
+        offset = 0
+
+        for line in json_file:
+            if line.endswith(b'\n') and line.strip():
+                yield offset, json.loads(line, object_pairs_hook=Record.from_pairs)
+
+            offset += len(line)
+
+
+def corpus_index_is_stale(filename: str, index_file: str) -> bool:
+    """
+        The index is appended to after every write to the data file, so a data file that changed after its index
+        (e.g. rewritten by merge_data, or written by a run without indexing) needs a rebuild.
+    """
+    if not os.path.exists(filename):
+        return False
+
+    return not os.path.exists(index_file) or os.path.getmtime(index_file) < os.path.getmtime(filename)
+
+
+def rebuild_stale_corpus_index(filename: str, index_file: Optional[str] = None) -> str:
+    """
+        Rebuild the index file of a data file from the data file if it is missing or stale, streaming the records.
+        Returns the index filename.
+    """
+    index_file = index_file or corpus_index_filename(filename)
+
+    if corpus_index_is_stale(filename, index_file):
+        log = CorpusIndexLog(index_file)
+        log.reset()
+        log.add_many((record_key(record), record, offset) for offset, record in iter_records_with_offsets(filename))
+        log.close()
+
+    return index_file
+
+
+def build_corpus_index(filename: str, index_file: Optional[str] = None) -> CorpusIndex:
+    """
+        Return the query index of a data file, rebuilding it from the data file if it is missing or stale.
+    """
+    return CorpusIndex(rebuild_stale_corpus_index(filename, index_file))
+
+
+class IndexingStore:
+    """
+        Wraps a store and appends every written record to the index file of its data file (see corpus_index), so
+        the index is kept up to date incrementally instead of being rebuilt from the whole corpus. Only the
+        appending is done here; the index is loaded for querying by CorpusIndex.
+    """
+
+    def __init__(self, store, index_file: Optional[str] = None):
+        self.store = store
+        self.filename = store.filename
+        self.index = CorpusIndexLog(rebuild_stale_corpus_index(store.filename, index_file))
+
+    def keys(self) -> Set[str]:
+        return self.store.keys()
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def iter_records(self) -> Iterator[Mapping[str, str]]:
+        return self.store.iter_records()
+
+    def write(self, record: Mapping[str, str]) -> None:
+        self.write_many([record])
+
+    def write_many(self, records: Iterable[Mapping[str, str]]) -> None:
+        records = list(records)
+        offsets = self.store.write_many(records) or [None] * len(records)
+
+        self.index.add_many((record_key(record), record, offset) for record, offset in zip(records, offsets))
+
+    def close(self) -> None:
+        self.store.close()
+        self.index.close()
+
+
+def open_store(filename: str, track_changes: bool = True, index: bool = False, journal: bool = False):
+    """
+        Return the store for a data file: compressed line-delimited JSON for .jsonl.gz/.jsonl.zst files,
+        line-delimited JSON for .jsonl files, a JSON array otherwise. By default it is wrapped in a
+        ChangeTrackingStore; with index=True the records are also added to the query index of the file. With
+        journal=True JSON arrays and compressed files are written through a JournaledStore (line-delimited JSON is
+        appended to directly: a line torn by a crash is skipped when reading and cut off before appending).
+    """
+    if is_compressed(filename):
+        store = CompressedJsonLinesStore(filename)
+    elif filename.endswith('.jsonl'):
+        store = JsonLinesStore(filename)
+    else:
+        store = JsonArrayStore(filename)
+
+    if journal and not isinstance(store, JsonLinesStore):
+        store = JournaledStore(store)
+
+    if index:
+        store = IndexingStore(store)
+
+    return ChangeTrackingStore(store) if track_changes else store
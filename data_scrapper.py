@@ -1,11 +1,9 @@
 import logging
 import re
-from typing import Dict, Union, Optional, List
+from typing import Dict, Union, Optional, List, NamedTuple, TYPE_CHECKING
 
-import requests
-from requests.sessions import Session
-from bs4 import BeautifulSoup
-from utils import fetch_response
+from records import Record
+from utils import fetch_response, notice_number_from_href
 
 BASE_WEBSITE = 'https://ted.europa.eu'
 
@@ -13,19 +11,76 @@ SEARCH_URL = "https://ted.europa.eu/TED/search/searchResult.do"
 
 logger = logging.getLogger(__name__)
 
+if TYPE_CHECKING:
+    import requests
+    from bs4 import BeautifulSoup
 
-def extract_hrefs(response: requests.Response) -> List[str]:
+
+class ListingRow(NamedTuple):
+    """
+        A single document row from the search result table.
+    """
+    href: str
+    notice_number: str
+    title: str = ''
+    country: str = ''
+    publication_date: str = ''
+    deadline: str = ''
+
+    def to_dict(self) -> Dict[str, str]:
+        return {
+            'URL': BASE_WEBSITE + self.href,
+            'Notice publication number': self.notice_number,
+            'Title': self.title,
+            'Country': self.country,
+            'Publication date': self.publication_date,
+            'Deadline': self.deadline
+        }
+
+
+def parse_html(text: str) -> 'BeautifulSoup':
+    """
+        Parse a page with BeautifulSoup, imported on first use so that starting the program doesn't pay for it.
+    """
+    from bs4 import BeautifulSoup
+
+    return BeautifulSoup(text, 'html.parser')
+
+
+def extract_hrefs(response: 'requests.Response') -> List[str]:
     """
         Extract all document hrefs from current page.
     """
 
-    soup = BeautifulSoup(response.text, 'html.parser')
+    soup = parse_html(response.text)
     td_elements = soup.find_all('td', class_='nowrap')
     hrefs = [td.find('a')['href'] for td in td_elements if td.find('a')]
     return hrefs
 
 
-def get_last_page(element: BeautifulSoup) -> int:
+def listing_rows_from_soup(soup: 'BeautifulSoup') -> List[ListingRow]:
+    """
+        Build a ListingRow for every document link in the search result table. The cells following the
+        document number are, in order: title, country, publication date and deadline.
+    """
+    rows = []
+
+    for td in soup.find_all('td', class_='nowrap'):
+        link = td.find('a')
+
+        if not link:
+            continue
+
+        href = link['href']
+        notice_number = notice_number_from_href(href) or link.text.strip()
+        cells = [re.sub(r'\s+', ' ', sibling.text.strip()) for sibling in td.find_next_siblings('td')]
+
+        rows.append(ListingRow(href, notice_number, *cells[:4]))
+
+    return rows
+
+
+def get_last_page(element: 'BeautifulSoup') -> int:
     """
         Get the last page number from the search result.
     """
@@ -45,7 +100,7 @@ def modify_url(href: str) -> str:
     return href.replace("TEXT", "DATA").replace("src=0", "tabId=3")
 
 
-def data_page_exist_in_document(soup: BeautifulSoup) -> bool:
+def data_page_exist_in_document(soup: 'BeautifulSoup') -> bool:
     """
        Check if a data page exists in the document.
     """
@@ -54,12 +109,12 @@ def data_page_exist_in_document(soup: BeautifulSoup) -> bool:
     return bool(data)
 
 
-def extract_data_from_table(soup: BeautifulSoup) -> Dict[str, str]:
+def extract_data_from_table(soup: 'BeautifulSoup') -> Record:
     """
         Extracts data from the HTML table on the document's page.
     """
 
-    data_dict = {}
+    data_pairs = []
     table = soup.find('table', {'class': 'data'})
 
     if table:
@@ -70,26 +125,25 @@ def extract_data_from_table(soup: BeautifulSoup) -> Dict[str, str]:
                 key = tds[0].text.strip()
                 value = re.sub(r'\s+', ' ', tds[1].text.strip())
                 matches = re.split(r'(\d+ - [^\d]+)', value)
-                data_dict[key] = ', '.join(match.strip() for match in matches if match.strip())
+                data_pairs.append((key, ', '.join(match.strip() for match in matches if match.strip())))
 
-    return data_dict
+    return Record.from_pairs(data_pairs)
 
 
 def scrape_ted_data(response_text: str,
-                    document_main_page_url) -> Union[Dict[str, str], None]:
+                    document_main_page_url) -> Union[Record, None]:
     """
         Scrapes data from a TED document page.
     """
 
-    data_dict = {}
-
-    soup = BeautifulSoup(response_text, 'html.parser')
+    soup = parse_html(response_text)
 
     if not data_page_exist_in_document(soup):
+        soup.decompose()
         return None
 
-    data_dict['URL'] = document_main_page_url
+    data = extract_data_from_table(soup).updated([('URL', document_main_page_url)])
 
-    data_dict.update(extract_data_from_table(soup))
+    soup.decompose()
 
-    return data_dict
+    return data
@@ -0,0 +1,202 @@
+import logging
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from data_handling import load_state, save_state
+from data_scrapper import scrape_ted_data
+from records import Record
+from utils import fetch_response
+
+if TYPE_CHECKING:
+    import requests
+
+FAILED_FILE = 'failed.json'
+
+MAX_ATTEMPTS = 5
+
+RETRY_INTERVAL = 10
+
+STATUS_REQUEST_FAILED = 'request failed'
+STATUS_NO_DATA_PAGE = 'no data page'
+STATUS_ERROR = 'error'
+
+logger = logging.getLogger(__name__)
+
+
+class FailureQueue:
+    """
+        Persistent queue of documents that could not be scraped, keyed by DATA page URL. Each entry records the page
+        it was listed on, why it failed and how many attempts were made. Safe to use from several threads.
+    """
+
+    def __init__(self, filename: str = FAILED_FILE, max_attempts: int = MAX_ATTEMPTS):
+        self.filename = filename
+        self.max_attempts = max_attempts
+        self.entries: Dict[str, dict] = load_state(filename)
+        self.in_progress = set()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, data_url: str) -> bool:
+        return data_url in self.entries
+
+    def save(self) -> None:
+        save_state(self.entries, self.filename)
+
+    def add(self, data_url: str, document_url: str, page: int, status: str) -> dict:
+        """
+            Record a failed attempt, adding the document to the queue or increasing its attempt count.
+        """
+        with self.lock:
+            entry = self.entries.setdefault(data_url, {
+                'url': data_url,
+                'document_url': document_url,
+                'page': page,
+                'attempts': 0
+            })
+            entry['status'] = status
+            entry['attempts'] += 1
+            entry['last_attempt'] = time.time()
+
+            self.in_progress.discard(data_url)
+            self.save()
+
+            return entry
+
+    def remove(self, data_url: str) -> None:
+        with self.lock:
+            self.in_progress.discard(data_url)
+
+            if self.entries.pop(data_url, None) is not None:
+                self.save()
+
+    def pending(self) -> List[dict]:
+        """
+            Entries that can still be retried, least recently attempted first.
+        """
+        with self.lock:
+            entries = [entry for entry in self.entries.values() if entry['attempts'] < self.max_attempts]
+
+        return sorted(entries, key=lambda entry: entry['last_attempt'])
+
+    def claim(self, min_age: float = 0) -> Optional[dict]:
+        """
+            Take the least recently attempted entry that is not being retried already and was last attempted at
+            least min_age seconds ago.
+        """
+        now = time.time()
+
+        for entry in self.pending():
+            with self.lock:
+                if entry['url'] not in self.in_progress and now - entry['last_attempt'] >= min_age:
+                    self.in_progress.add(entry['url'])
+                    return entry
+
+        return None
+
+
+def retry_entry(failure_queue: FailureQueue,
+                entry: dict,
+                session: 'requests.Session',
+                cookies: dict) -> Optional[Record]:
+    """
+        Fetch and scrape a queued document once. On success the entry is removed from the queue and the record is
+        returned, otherwise the failure is recorded again.
+    """
+    import requests
+
+    try:
+        response = fetch_response(session, entry['url'], cookies)
+    except requests.RequestException:
+        response = None
+
+    if response is None:
+        failure_queue.add(entry['url'], entry['document_url'], entry['page'], STATUS_REQUEST_FAILED)
+        return None
+
+    data = scrape_ted_data(response.text, entry['document_url'])
+
+    if not data:
+        failure_queue.add(entry['url'], entry['document_url'], entry['page'], STATUS_NO_DATA_PAGE)
+        return None
+
+    failure_queue.remove(entry['url'])
+
+    return data
+
+
+def retry_failed(failure_queue: FailureQueue,
+                 session: 'requests.Session',
+                 cookies: dict,
+                 store,
+                 request_delay: float = 1) -> Tuple[int, int]:
+    """
+        Retry every pending entry once and write the recovered documents to the store. Returns the number of
+        recovered documents and the number of entries that can still be retried.
+    """
+    recovered = 0
+
+    for entry in failure_queue.pending():
+        data = retry_entry(failure_queue, entry, session, cookies)
+
+        if data:
+            store.write(data)
+            recovered += 1
+
+        time.sleep(request_delay)
+
+    return recovered, len(failure_queue.pending())
+
+
+class RetryWorker(threading.Thread):
+    """
+        Low-priority background thread that retries one queued document every `interval` seconds during a run.
+        Recovered records are handed back through drain(), so only the main thread writes to the store.
+    """
+
+    def __init__(self,
+                 failure_queue: FailureQueue,
+                 session: 'requests.Session',
+                 cookies: dict,
+                 interval: float = RETRY_INTERVAL):
+        super().__init__(daemon=True)
+        self.failure_queue = failure_queue
+        self.session = session
+        self.cookies = cookies
+        self.interval = interval
+        self.results = queue.Queue()
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            entry = self.failure_queue.claim(min_age=self.interval)
+
+            if entry is None:
+                continue
+
+            try:
+                data = retry_entry(self.failure_queue, entry, self.session, self.cookies)
+            except Exception:
+                # keep the worker alive and release the entry; it counts as a failed attempt
+                logger.exception(f'Retrying {entry["url"]} failed')
+                self.failure_queue.add(entry['url'], entry['document_url'], entry['page'], STATUS_ERROR)
+                continue
+
+            if data:
+                self.results.put(data)
+
+    def drain(self) -> List[Record]:
+        records = []
+
+        while True:
+            try:
+                records.append(self.results.get_nowait())
+            except queue.Empty:
+                return records
+
+    def stop(self) -> None:
+        self.stopped.set()
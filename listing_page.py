@@ -0,0 +1,52 @@
+from typing import List, NamedTuple, Optional, TYPE_CHECKING
+
+from data_scrapper import ListingRow, listing_rows_from_soup, get_last_page, parse_html, SEARCH_URL
+from utils import fetch_response
+
+if TYPE_CHECKING:
+    import requests
+
+
+class ListingPage(NamedTuple):
+    """
+        Everything the crawl needs from one search result page, taken from a single parse.
+    """
+    page: int
+    rows: List[ListingRow]
+    last_page_number: int
+    status_code: int = 200
+
+    @property
+    def hrefs(self) -> List[str]:
+        return [row.href for row in self.rows]
+
+
+def parse_listing_page(page: int, text: str, status_code: int = 200) -> ListingPage:
+    """
+        Parse a search result page once and return its document rows together with the last page number
+        (0 if the page has no pager).
+    """
+    soup = parse_html(text)
+
+    rows = listing_rows_from_soup(soup)
+    last_page_number = get_last_page(soup.find('div', class_='page-icon pagelast'))
+
+    soup.decompose()
+
+    return ListingPage(page, rows, last_page_number, status_code)
+
+
+def fetch_listing_page(session: 'requests.Session',
+                       cookies: dict,
+                       page: int,
+                       search_url: str = SEARCH_URL,
+                       search_params: Optional[dict] = None) -> Optional[ListingPage]:
+    """
+        Fetch and parse a search result page, by default of the main search. Returns None if the request fails.
+    """
+    response = fetch_response(session, search_url, cookies, {**(search_params or {}), 'page': page})
+
+    if not response:
+        return None
+
+    return parse_listing_page(page, response.text, response.status_code)
@@ -1,142 +1,443 @@
+import argparse
+import os
 import time
-
-from bs4 import BeautifulSoup
-from data_handling import load_data, OUTPUT_FILE, load_state, save_state, save_data, STATE_FILE
-from data_scrapper import scrape_ted_data, extract_hrefs, modify_url, get_last_page, SEARCH_URL, BASE_WEBSITE
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Set, Tuple, TYPE_CHECKING
+
+from data_handling import load_state, save_state, STATE_FILE, LISTING_FILE, OUTPUT_FILE, STREAM_OUTPUT_FILE, \
+    open_store, record_key
+from failure_queue import FailureQueue, RetryWorker, retry_failed, STATUS_REQUEST_FAILED, STATUS_NO_DATA_PAGE
+from data_scrapper import scrape_ted_data, modify_url, SEARCH_URL, BASE_WEBSITE, ListingRow
+from listing_page import ListingPage, fetch_listing_page
+from page_cursor import checkpoint, resume_page
+from session_pool import SessionPool, SESSIONS_FILE, create_session_pool
 from utils import fetch_response, create_session, get_cookies, TextFormatter, url_is_scrapped, Logger, \
-    update_has_reach_last_scrapped_url, action_is_update
+    update_has_reach_last_scrapped_url, action_is_update, action_is_listing_only
 from user_interface import get_user_choice_for_action, MessageProvider
 
+if TYPE_CHECKING:
+    import requests
+
 REQUEST_DELAY = 1
 MAXIMUM_DOCUMENTS_PER_PAGE = 25
 
+COMMAND_SCRAPE = 'scrape'
+COMMAND_RETRY_FAILED = 'retry-failed'
+
+ACTIONS = {
+    'continue': '1',
+    'update': '2',
+    'listing': '3'
+}
+
+
+class ScrapeRun:
+    """
+        Walks the search result pages and writes every new document to the store. Only the set of already scraped
+        notice numbers is kept in memory; the records themselves are handed to the store and released.
+    """
+
+    def __init__(self,
+                 session: 'requests.Session',
+                 cookies: dict,
+                 store,
+                 existing_notices: Set[str],
+                 state: dict,
+                 action: Optional[str],
+                 logger: Logger,
+                 message_provider: MessageProvider,
+                 text_formatter: TextFormatter,
+                 listing_store=None,
+                 state_file: str = STATE_FILE,
+                 request_delay: float = REQUEST_DELAY,
+                 failure_queue: Optional[FailureQueue] = None,
+                 retry_worker: Optional[RetryWorker] = None):
+        self.session = session
+        self.cookies = cookies
+        self.store = store
+        self.state = state
+        self.action = action
+        self.logger = logger
+        self.message_provider = message_provider
+        self.text_formatter = text_formatter
+        self.listing_store = listing_store
+        self.state_file = state_file
+        self.request_delay = request_delay
+        self.failure_queue = failure_queue
+        self.retry_worker = retry_worker
+
+        self.existing_notices = existing_notices
+        self.existing_listing_notices = listing_store.keys() if listing_store is not None else set()
+        self.last_page_number = 0
+
+    def report_success(self, message: str) -> None:
+        print(self.text_formatter.format_message_success(self.message_provider.construct_message_with_time_stamp(
+            message)))
+        self.logger.log_info(message)
+
+    def report_fail(self, message: str) -> None:
+        print(self.text_formatter.format_message_fail(message))
+        self.logger.log_error(message)
+
+    def fetch_page(self, page: int) -> Optional[ListingPage]:
+        return fetch_listing_page(self.session, self.cookies, page)
+
+    def save_progress(self) -> None:
+        save_state(self.state, self.state_file)
+
+    def run(self, first_page: int, last_page_number: int, first_listing_page: Optional[ListingPage] = None) -> None:
+        """
+            Process the pages from first_page up to and including the last page. Each listing page is fetched and
+            parsed once; first_listing_page, if it was already fetched by the caller, is reused. The last page
+            number is refreshed from every listing page, since new notices keep growing the result list.
+        """
+        self.last_page_number = last_page_number
+        listing_page = first_listing_page
+        page = first_page
+
+        while page <= self.last_page_number:
+            if listing_page is None or listing_page.page != page:
+                listing_page = self.fetch_page(page)
+
+            if listing_page is None:
+                self.report_fail(self.message_provider.message_failed_to_retrieve_url(SEARCH_URL))
 
-def main() -> None:
-    logger = Logger()
-    message_provider = MessageProvider()
-    text_formatter = TextFormatter()
+                return
 
-    session = create_session()
-    cookies = get_cookies()
+            if not listing_page.rows and self.session_pool() is not None:
+                listing_page = self.refetch_with_another_session(listing_page)
 
-    all_data = load_data(OUTPUT_FILE)
-    state = load_state(STATE_FILE)
+            self.last_page_number = listing_page.last_page_number or self.last_page_number
 
-    last_processed_page = state.get('last_processed_page', 1)
-    existing_links = {entry['URL'] for entry in all_data}
+            if not self.process_page(listing_page):
+                return
 
-    message_provider.default_app_message(text_formatter,
-                                         len(existing_links),
-                                         last_processed_page,
-                                         bool(all_data),
-                                         bool(state))
+            # ETA but bad way of doing it
+            if not action_is_update(self.action) and not action_is_listing_only(self.action):
+                # an empty page is not checkpointed, so a first run may have no last processed page yet
+                pages_remaining = self.last_page_number - self.state.get('last_processed_page', page)
+                documents_left = pages_remaining * (MAXIMUM_DOCUMENTS_PER_PAGE * self.request_delay)
+                print(self.text_formatter.format_message_work_in_progress(
+                    self.message_provider.message_eta(documents_left)))
 
-    action = None
+            listing_page = None
+            page += 1
 
-    if state:
-        action = get_user_choice_for_action()
+    def session_pool(self) -> Optional[SessionPool]:
+        """
+            The session pool the requests go through, also when it is wrapped (e.g. rate limited by the scheduler),
+            or None for a single session.
+        """
+        session = getattr(self.session, 'session', self.session)
 
-        if action_is_update(action):
-            last_processed_page = 1
+        return session if isinstance(session, SessionPool) else None
 
-    try:
-        response = fetch_response(session, SEARCH_URL, cookies)
+    def refetch_with_another_session(self, listing_page: ListingPage) -> ListingPage:
+        """
+            An empty listing page is what an expired session gets. Fetch it again with another session of the pool;
+            the first session is quarantined only if the other one does get documents.
+        """
+        session_pool = self.session_pool()
+        suspect = session_pool.acquire()
 
-        if not response:
-            print(text_formatter.format_message_fail(message_provider.message_failed_to_retrieve_url(SEARCH_URL)))
-            logger.log_error(message_provider.message_failed_to_retrieve_url(SEARCH_URL))
+        if suspect is None or len(session_pool.healthy_sessions()) < 2:
+            return listing_page
 
-            return
+        session_pool.report_expired(suspect)
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-        last_page_number = get_last_page(soup.find('div', class_='page-icon pagelast'))
+        retry = self.fetch_page(listing_page.page)
 
-        if not last_page_number:
-            print(text_formatter.format_message_fail(message_provider.message_failed_to_retrieve_last_page()))
+        if retry is None or not retry.rows:
+            session_pool.restore(suspect)
 
-            logger.log_error(message_provider.message_failed_to_retrieve_last_page())
+            return listing_page
+
+        self.logger.log_warning(self.message_provider.message_session_expired(suspect.name))
 
+        return retry
+
+    def write_recovered_documents(self) -> None:
+        """
+            Write the documents the background retry worker has recovered since the last call.
+        """
+        if self.retry_worker is None:
             return
 
-        for page in range(last_processed_page, last_page_number):
-            params = {'page': page}
+        for data in self.retry_worker.drain():
+            key = record_key(data)
 
-            response = fetch_response(session, SEARCH_URL, cookies, params)
+            if key in self.existing_notices:
+                continue
 
-            if not response:
-                print(text_formatter.format_message_fail(message_provider.message_failed_to_retrieve_url(SEARCH_URL)))
-                logger.log_error(message_provider.message_failed_to_retrieve_url(SEARCH_URL))
+            self.store.write(data)
+            self.existing_notices.add(key)
 
-                return
+            self.report_success(self.message_provider.message_recovered_failed_document(data['URL']))
 
-            hrefs = extract_hrefs(response)
+    def process_page(self, listing_page: ListingPage) -> bool:
+        """
+            Process one search result page. Returns False when the run has to stop.
+        """
+        page = listing_page.page
+        rows = listing_page.rows
 
-            if not hrefs:
-                print(text_formatter.format_message_fail(
-                    message_provider.message_failed_to_retrieve_page(page, response.status_code)))
+        if not rows:
+            print(self.text_formatter.format_message_fail(
+                self.message_provider.message_failed_to_retrieve_page(page, listing_page.status_code)))
 
-                logger.log_warning(message_provider.message_failed_to_retrieve_page(page, response.status_code))
+            self.logger.log_warning(self.message_provider.message_failed_to_retrieve_page(page,
+                                                                                          listing_page.status_code))
 
-                continue
+            return True
+
+        if action_is_listing_only(self.action):
+            self.process_listing_rows(page, rows)
+
+            return True
+
+        checkpoint(self.state, listing_page)
+
+        self.save_progress()
+
+        for row in rows:
+            if not self.process_document(page, row):
+                return False
+
+        return True
+
+    def process_listing_rows(self, page: int, rows: List[ListingRow]) -> None:
+        new_rows = [row for row in rows if row.notice_number not in self.existing_listing_notices]
+
+        self.listing_store.write_many(row.to_dict() for row in new_rows)
+        self.existing_listing_notices.update(row.notice_number for row in new_rows)
+
+        self.report_success(self.message_provider.message_listing_page_saved(page, len(new_rows),
+                                                                             self.listing_store.filename))
+
+        self.state['last_listing_page'] = page
+
+        self.save_progress()
+
+        time.sleep(self.request_delay)
+
+    def process_document(self, page: int, row: ListingRow) -> bool:
+        """
+            Scrape one document of the listing. Returns False when an update has reached already scraped data.
+        """
+        import requests
+
+        href = row.href
+        current_url = modify_url(href)
+        data_url = BASE_WEBSITE + current_url
+        document_main_url = BASE_WEBSITE + href
+
+        if url_is_scrapped(row.notice_number, self.existing_notices, self.action):
+            print(self.text_formatter.format_message_work_in_progress(
+                self.message_provider.message_url_is_scrapped(page, document_main_url)))
+
+            self.logger.log_info(self.message_provider.message_url_is_scrapped(page, document_main_url))
+
+            return True
+
+        if update_has_reach_last_scrapped_url(row.notice_number, self.existing_notices, self.action):
+            print(self.text_formatter.format_message_success(
+                self.message_provider.message_update_has_reach_last_scrapped_url()))
+
+            self.logger.log_info(self.message_provider.message_update_has_reach_last_scrapped_url())
+
+            return False
+
+        print(self.text_formatter.format_message_work_in_progress(
+            self.message_provider.construct_message_with_time_stamp(
+                self.message_provider.message_work_in_progress(page, self.last_page_number, current_url))))
+
+        try:
+            data_response = fetch_response(self.session, data_url, self.cookies)
+        except requests.RequestException:
+            data_response = None  # queued as a failed request below, like a non-200 response
+
+        data = scrape_ted_data(data_response.text, document_main_url) if data_response else None
+
+        if data:
+            self.store.write(data)
+            self.existing_notices.add(row.notice_number)
+
+            if self.failure_queue is not None and data_url in self.failure_queue:
+                self.failure_queue.remove(data_url)
+
+            self.report_success(self.message_provider.message_successfully_scrapped_data(page, data_url))
+            self.report_success(self.message_provider.message_successful_data_save(self.store.filename))
+        else:
+            print(self.text_formatter.format_message_fail(self.message_provider.construct_message_with_time_stamp(
+                self.message_provider.message_no_data_page(page, document_main_url))))
 
-            state['last_processed_page'] = page
+            self.logger.log_warning(self.message_provider.message_no_data_page(page, document_main_url))
 
-            save_state(state, STATE_FILE)
+            if self.failure_queue is not None:
+                status = STATUS_NO_DATA_PAGE if data_response else STATUS_REQUEST_FAILED
+                self.failure_queue.add(data_url, document_main_url, page, status)
 
-            for href in hrefs:
-                current_url = modify_url(href)
-                data_url = BASE_WEBSITE + current_url
-                document_main_url = BASE_WEBSITE + href
+        self.write_recovered_documents()
 
-                if url_is_scrapped(document_main_url, existing_links, action):
-                    print(text_formatter.format_message_work_in_progress(
-                        message_provider.message_url_is_scrapped(page, document_main_url)))
+        self.save_progress()
 
-                    logger.log_info(message_provider.message_url_is_scrapped(page, document_main_url))
+        time.sleep(self.request_delay)
 
-                    continue
+        return True
 
-                if update_has_reach_last_scrapped_url(document_main_url, existing_links, action):
-                    print(text_formatter.format_message_success(
-                        message_provider.message_update_has_reach_last_scrapped_url()))
 
-                    logger.log_info(message_provider.message_update_has_reach_last_scrapped_url())
+def parse_arguments(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Scrape the DATA pages of TED EUROPA documents.')
+    parser.add_argument('command', nargs='?', choices=(COMMAND_SCRAPE, COMMAND_RETRY_FAILED), default=COMMAND_SCRAPE,
+                        help='scrape the search results (default) or retry the documents that failed before')
+    parser.add_argument('--stream', action='store_true',
+                        help=f'bounded-memory mode: append records to {STREAM_OUTPUT_FILE} instead of '
+                             f'rewriting {OUTPUT_FILE}')
+    parser.add_argument('--output',
+                        help='output file; .jsonl.gz and .jsonl.zst write block-compressed line-delimited JSON '
+                             '(default: the file of the chosen mode)')
+    parser.add_argument('--action', choices=tuple(ACTIONS),
+                        help='run the action without showing the menu, e.g. from cron (default: ask)')
+    parser.add_argument('--sessions', default=SESSIONS_FILE,
+                        help='JSON list of cookie sets to rotate through when a session expires '
+                             '(default: %(default)s, used if it exists)')
 
-                    return
+    return parser.parse_args(argv)
 
-                print(text_formatter.format_message_work_in_progress(message_provider.construct_message_with_time_stamp(
-                    message_provider.message_work_in_progress(page, last_page_number, current_url))))
 
-                data = scrape_ted_data(session, cookies, data_url, document_main_url)
+def retry_failed_documents(session: 'requests.Session',
+                           cookies: dict,
+                           store,
+                           logger: Logger,
+                           message_provider: MessageProvider,
+                           text_formatter: TextFormatter) -> None:
+    failure_queue = FailureQueue()
 
-                if data:
-                    all_data.append(data)
+    if not failure_queue.pending():
+        print(text_formatter.format_message_success(message_provider.message_no_failed_documents()))
+        return
 
-                    print(text_formatter.format_message_success(message_provider.construct_message_with_time_stamp(
-                        message_provider.message_successfully_scrapped_data(page, data_url))))
+    try:
+        recovered, remaining = retry_failed(failure_queue, session, cookies, store, REQUEST_DELAY)
+    except KeyboardInterrupt:
+        print(message_provider.message_interrupted_by_user())
+        logger.log_info(message_provider.message_interrupted_by_user())
+        return
+    finally:
+        store.close()
+
+    print(text_formatter.format_message_success(message_provider.message_retried_failed_documents(recovered,
+                                                                                                   remaining)))
+    logger.log_info(message_provider.message_retried_failed_documents(recovered, remaining))
+
+
+def load_store(filename: str) -> Tuple[object, Set[str]]:
+    """
+        Open the output store and read the keys of the notices it already holds.
+    """
+    store = open_store(filename, index=True, journal=True)
 
-                    logger.log_info(message_provider.message_successfully_scrapped_data(page, data_url))
+    return store, store.keys()
 
-                    save_data(all_data, OUTPUT_FILE)
 
-                    print(text_formatter.format_message_success(message_provider.construct_message_with_time_stamp(
-                        message_provider.message_successful_data_save(OUTPUT_FILE))))
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_arguments(argv)
+
+    logger = Logger()
+    message_provider = MessageProvider()
+    text_formatter = TextFormatter()
+
+    session = create_session_pool(args.sessions) if os.path.exists(args.sessions) else create_session()
+    cookies = get_cookies()
 
-                    logger.log_info(message_provider.message_successful_data_save(OUTPUT_FILE))
-                else:
-                    print(text_formatter.format_message_fail(message_provider.construct_message_with_time_stamp(
-                        message_provider.message_no_data_page(page, document_main_url))))
+    output_file = args.output or (STREAM_OUTPUT_FILE if args.stream else OUTPUT_FILE)
+
+    if args.command == COMMAND_RETRY_FAILED:
+        store, _ = load_store(output_file)
+        retry_failed_documents(session, cookies, store, logger, message_provider, text_formatter)
+        return
+
+    state = load_state(STATE_FILE)
+
+    last_processed_page = state.get('last_processed_page', 1)
+
+    # Reading the existing output is the slowest part of starting up, so it runs while the first listing page is
+    # fetched. Only the interactive menu, which shows the number of entries, has to wait for it.
+    executor = ThreadPoolExecutor(max_workers=1)
+    loading_store = executor.submit(load_store, output_file)
+    executor.shutdown(wait=False)
+
+    if args.action is None:
+        try:
+            _, existing_notices = loading_store.result()
+        except Exception as e:
+            print(text_formatter.format_message_fail(message_provider.message_unexpected_error_occurred(e)))
+            logger.log_error(message_provider.message_unexpected_error_occurred(e))
+
+            return
+
+        message_provider.default_app_message(text_formatter,
+                                             len(existing_notices),
+                                             last_processed_page,
+                                             bool(existing_notices),
+                                             bool(state))
+
+        action = get_user_choice_for_action()
+    else:
+        action = ACTIONS[args.action]
 
-                    logger.log_warning(message_provider.message_no_data_page(page, document_main_url))
+    first_listing_page = None
 
-                save_state(state, STATE_FILE)
+    if action_is_update(action):
+        last_processed_page = 1
 
-                time.sleep(REQUEST_DELAY)
+    listing_store = None
+    retry_worker = None
+    scrape_run = None
 
-            if not action_is_update(action):  # ETA but bad way of doing it
-                pages_remaining = last_page_number - state['last_processed_page']
-                documents_left = pages_remaining * (MAXIMUM_DOCUMENTS_PER_PAGE * REQUEST_DELAY)
-                print(text_formatter.format_message_work_in_progress(message_provider.message_eta(documents_left)))
+    if action_is_listing_only(action):
+        listing_store = open_store(LISTING_FILE)
+        last_processed_page = state.get('last_listing_page', 1)
+
+    try:
+        if not action_is_update(action) and not action_is_listing_only(action):
+            saved_page = last_processed_page
+            last_processed_page, first_listing_page = resume_page(
+                state, lambda page: fetch_listing_page(session, cookies, page))
+
+            if last_processed_page != saved_page:
+                print(text_formatter.format_message_work_in_progress(
+                    message_provider.message_resume_page_moved(saved_page, last_processed_page)))
+                logger.log_info(message_provider.message_resume_page_moved(saved_page, last_processed_page))
+
+        if first_listing_page is None:
+            first_listing_page = fetch_listing_page(session, cookies, last_processed_page)
+
+        if first_listing_page is None:
+            print(text_formatter.format_message_fail(message_provider.message_failed_to_retrieve_url(SEARCH_URL)))
+            logger.log_error(message_provider.message_failed_to_retrieve_url(SEARCH_URL))
+
+            return
+
+        last_page_number = first_listing_page.last_page_number
+
+        if not last_page_number:
+            print(text_formatter.format_message_fail(message_provider.message_failed_to_retrieve_last_page()))
+
+            logger.log_error(message_provider.message_failed_to_retrieve_last_page())
+
+            return
+
+        store, existing_notices = loading_store.result()
+
+        failure_queue = FailureQueue()
+        retry_worker = RetryWorker(failure_queue, session if isinstance(session, SessionPool) else create_session(),
+                                   cookies)
+        retry_worker.start()
+
+        scrape_run = ScrapeRun(session, cookies, store, existing_notices, state, action, logger, message_provider,
+                               text_formatter, listing_store, failure_queue=failure_queue, retry_worker=retry_worker)
+        scrape_run.run(last_processed_page, last_page_number, first_listing_page)
 
     except KeyboardInterrupt:
         print(message_provider.message_interrupted_by_user())
@@ -145,7 +446,21 @@ def main() -> None:
     except Exception as e:
         print(text_formatter.format_message_fail(message_provider.message_unexpected_error_occurred(e)))
         logger.log_error(message_provider.message_unexpected_error_occurred(e))
-        save_data(all_data, OUTPUT_FILE)
+
+    finally:
+        if retry_worker is not None:
+            retry_worker.stop()
+            retry_worker.join()
+
+        if scrape_run is not None:
+            scrape_run.write_recovered_documents()
+
+        if loading_store.exception() is None:  # a store that failed to load was reported above
+            store, _ = loading_store.result()
+            store.close()
+
+        if listing_store is not None:
+            listing_store.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+import argparse
+import json
+import os
+import tempfile
+import zlib
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+from data_handling import iter_records, record_key, write_records
+from records import Record, encode_record
+
+RULE_LAST = 'last'
+RULE_NEWEST = 'newest'
+
+DEFAULT_PARTITIONS = 64
+
+
+def publication_date_key(record: Mapping[str, str]) -> Tuple[str, str, str]:
+    """
+        Sortable (year, month, day) of the DD/MM/YYYY publication date, or empty strings if it is missing.
+    """
+    parts = record.get('Publication date', '').strip().split('/')
+
+    if len(parts) != 3:
+        return '', '', ''
+
+    day, month, year = parts
+
+    return year, month.zfill(2), day.zfill(2)
+
+
+def partition_of(key: str, partitions: int) -> int:
+    return zlib.crc32(key.encode('utf-8')) % partitions
+
+
+def partition_records(inputs: List[str], directory: str, partitions: int) -> Tuple[List[str], int]:
+    """
+        Stream every input file and append each record as a JSON line to the partition file of its key, so all
+        versions of a notice end up in the same partition in input order. Returns the partition files and the
+        number of records read.
+    """
+    partition_files = [os.path.join(directory, f'partition-{number}.jsonl') for number in range(partitions)]
+    handles = [open(filename, 'w', encoding='utf-8') for filename in partition_files]
+    count = 0
+
+    try:
+        for filename in inputs:
+            for record in iter_records(filename):
+                handle = handles[partition_of(record_key(record), partitions)]
+                handle.write(json.dumps(record, ensure_ascii=False, default=encode_record) + '\n')
+                count += 1
+    finally:
+        for handle in handles:
+            handle.close()
+
+    return partition_files, count
+
+
+def resolve_partition(filename: str, rule: str) -> Dict[str, Record]:
+    """
+        Deduplicate one partition. With RULE_LAST the version read last wins, with RULE_NEWEST the version with the
+        latest publication date wins (the last one read on a tie).
+    """
+    merged = {}
+
+    with open(filename, 'r', encoding='utf-8') as partition_file:
+        for line in partition_file:
+            record = json.loads(line, object_pairs_hook=Record.from_pairs)
+            key = record_key(record)
+            current = merged.get(key)
+
+            if current is None or rule == RULE_LAST or \
+                    publication_date_key(record) >= publication_date_key(current):
+                merged[key] = record
+
+    return merged
+
+
+def iter_merged_records(partition_files: List[str], rule: str) -> Iterator[Record]:
+    for filename in partition_files:
+        yield from resolve_partition(filename, rule).values()
+        os.remove(filename)
+
+
+def merge(inputs: List[str], output_file: str, rule: str = RULE_LAST, partitions: int = DEFAULT_PARTITIONS,
+          temporary_directory: Optional[str] = None) -> Tuple[int, int]:
+    """
+        Merge data files (JSON arrays or line-delimited JSON) into one deduplicated store. Records are hash
+        partitioned by notice number to temporary files first, so only one partition has to fit in memory at a
+        time. Returns the number of records read and written.
+    """
+    if rule not in (RULE_LAST, RULE_NEWEST):
+        raise ValueError(f'Unknown merge rule: {rule}')
+
+    with tempfile.TemporaryDirectory(dir=temporary_directory) as directory:
+        partition_files, read = partition_records(inputs, directory, partitions)
+        written = write_records(iter_merged_records(partition_files, rule), output_file)
+
+    return read, written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Merge and deduplicate several output files into one.')
+    parser.add_argument('output', help='merged output file (.jsonl for line-delimited JSON, a JSON array otherwise)')
+    parser.add_argument('inputs', nargs='+', help='input files, from oldest to newest')
+    parser.add_argument('--rule', choices=(RULE_LAST, RULE_NEWEST), default=RULE_LAST,
+                        help='which duplicate to keep: the one from the last input, or the newest publication')
+    parser.add_argument('--partitions', type=int, default=DEFAULT_PARTITIONS,
+                        help='number of temporary partitions (default: %(default)s)')
+    parser.add_argument('--temporary-directory', default=None, help='where to put the temporary partitions')
+    args = parser.parse_args()
+
+    read, written = merge(args.inputs, args.output, args.rule, args.partitions, args.temporary_directory)
+
+    print(f'Merged {read} records into {written} unique records in {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+from typing import Callable, List, Optional, Tuple
+
+from listing_page import ListingPage
+
+MAX_PROBES = 12
+
+
+def notice_order(notice_number: str) -> Tuple[int, int]:
+    """
+        Sortable (year, number) of a notice number like 578920-2023. Newer notices sort higher.
+    """
+    number, _, year = notice_number.partition('-')
+
+    try:
+        return int(year), int(number)
+    except ValueError:
+        return 0, 0
+
+
+def checkpoint(state: dict, listing_page: ListingPage) -> None:
+    """
+        Record the page being processed together with its notice numbers (the anchors) and the current number of
+        pages, so a later session can find where these notices moved to.
+    """
+    state['last_processed_page'] = listing_page.page
+    state['anchor_notices'] = [row.notice_number for row in listing_page.rows]
+
+    if listing_page.last_page_number:
+        state['last_page_number'] = listing_page.last_page_number
+
+
+def anchor_positions(listing_page: ListingPage, anchors: set) -> List[int]:
+    return [position for position, row in enumerate(listing_page.rows) if row.notice_number in anchors]
+
+
+def resume_page(state: dict,
+                fetch_page: Callable[[int], Optional[ListingPage]],
+                max_probes: int = MAX_PROBES) -> Tuple[int, Optional[ListingPage]]:
+    """
+        Find the page that now holds the checkpoint's anchor notices. TED prepends new notices, so the anchors drift
+        to higher pages between sessions (or to lower ones when notices are removed). The saved page is probed first;
+        if the anchors are not on it, the growth of the page count gives the first jump, which then gallops and
+        bisects on notice order. Returns the page to resume from and its listing page if it was already fetched.
+        If the anchors can't be located within max_probes requests the lowest page that can't be past them is
+        returned, so no unscraped notice is skipped.
+    """
+    page = state.get('last_processed_page', 1)
+    anchors = set(state.get('anchor_notices') or [])
+
+    if not anchors:
+        return page, None
+
+    anchor_orders = [notice_order(anchor) for anchor in anchors]
+    newest_anchor, oldest_anchor = max(anchor_orders), min(anchor_orders)
+
+    lower, upper = 1, None
+    probe = page
+    step = 0
+
+    for _ in range(max_probes):
+        listing_page = fetch_page(probe)
+
+        if listing_page is None or not listing_page.rows:
+            break
+
+        positions = anchor_positions(listing_page, anchors)
+
+        if positions:
+            if positions[0] == 0 and len(positions) < len(anchors) and probe > 1:
+                return probe - 1, None  # the newer anchors are at the bottom of the previous page
+
+            return probe, listing_page
+
+        orders = [notice_order(row.notice_number) for row in listing_page.rows]
+
+        if min(orders) > newest_anchor:
+            lower = probe + 1
+
+            if upper is None:
+                drift = listing_page.last_page_number - state.get('last_page_number', listing_page.last_page_number)
+                step = step * 2 if step else max(1, drift)
+                probe += step
+
+                if listing_page.last_page_number:
+                    probe = min(probe, listing_page.last_page_number)
+            else:
+                probe = (lower + upper) // 2
+        elif max(orders) < oldest_anchor:
+            upper = probe - 1
+            probe = (lower + upper) // 2
+        else:
+            return probe, listing_page  # the anchors are gone, but this page straddles them
+
+        if upper is not None and lower > upper:
+            break
+
+    return lower if lower > 1 or upper is not None else page, None
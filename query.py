@@ -0,0 +1,104 @@
+import argparse
+import json
+import sys
+from typing import Dict, Iterator, List, Optional
+
+from corpus_index import CorpusIndex
+from data_handling import OUTPUT_FILE, build_corpus_index, is_compressed, iter_records, load_block_index, \
+    read_block, record_key
+from records import Record, encode_record
+
+
+def iter_records_at_offsets(filename: str, index: CorpusIndex, keys: List[str]) -> Iterator[Record]:
+    """
+        Read line-delimited JSON records by seeking to the offsets kept in the index.
+    """
+    with open(filename, 'rb') as json_file:
+        for key in keys:
+            json_file.seek(index.offset(key))
+            yield json.loads(json_file.readline(), object_pairs_hook=Record.from_pairs)
+
+
+def iter_records_in_blocks(filename: str, keys: List[str]) -> Iterator[Record]:
+    """
+        Read records of a compressed store, decompressing each block that holds a match once.
+    """
+    wanted = set(keys)
+    blocks = [block for block in load_block_index(filename) if wanted.intersection(block['keys'])]
+    latest: Dict[str, Record] = {}
+
+    for block in blocks:
+        for record in read_block(filename, block['offset'], block['length']):
+            if record_key(record) in wanted:
+                latest[record_key(record)] = record
+
+    for key in keys:
+        if key in latest:
+            yield latest[key]
+
+
+def iter_matching_records(filename: str, index: CorpusIndex, keys: List[str]) -> Iterator[Record]:
+    """
+        Stream the records of the given keys without loading the data file. Line-delimited JSON is read by offset
+        and compressed stores by block; a JSON array has no offsets, so it is streamed and filtered in file order.
+    """
+    if filename.endswith('.jsonl') and all(index.offset(key) is not None for key in keys):
+        yield from iter_records_at_offsets(filename, index, keys)
+    elif is_compressed(filename):
+        yield from iter_records_in_blocks(filename, keys)
+    else:
+        wanted = set(keys)
+
+        for record in iter_records(filename):
+            if record_key(record) in wanted:
+                yield record
+
+
+def query(filename: str,
+          country: Optional[str] = None,
+          notice_type: Optional[str] = None,
+          cpv: Optional[str] = None,
+          nuts: Optional[str] = None,
+          date_from: Optional[str] = None,
+          date_to: Optional[str] = None,
+          limit: Optional[int] = None) -> Iterator[Record]:
+    """
+        Stream the records of a data file that match every given criterion, using (and if needed building) its
+        query index.
+    """
+    index = build_corpus_index(filename)
+
+    try:
+        keys = index.query(country, notice_type, cpv, nuts, date_from, date_to)
+
+        yield from iter_matching_records(filename, index, keys[:limit] if limit is not None else keys)
+    finally:
+        index.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Query the scraped notices through the precomputed indexes.')
+    parser.add_argument('--data', default=OUTPUT_FILE, help='data file to query (default: %(default)s)')
+    parser.add_argument('--country', help='country of the buyer, e.g. DE')
+    parser.add_argument('--notice-type', help='notice type, e.g. "Contract notice"')
+    parser.add_argument('--cpv', help='CPV code prefix, e.g. 45')
+    parser.add_argument('--nuts', help='NUTS code prefix, e.g. DE2')
+    parser.add_argument('--from', dest='date_from', help='first publication date (DD/MM/YYYY or YYYY-MM-DD)')
+    parser.add_argument('--to', dest='date_to', help='last publication date (DD/MM/YYYY or YYYY-MM-DD)')
+    parser.add_argument('--limit', type=int, default=None, help='return at most this many notices')
+    parser.add_argument('--count', action='store_true', help='only print the number of matching notices')
+    args = parser.parse_args()
+
+    if args.count:
+        index = build_corpus_index(args.data)
+        print(len(index.query(args.country, args.notice_type, args.cpv, args.nuts, args.date_from, args.date_to)))
+        index.close()
+        return
+
+    for record in query(args.data, args.country, args.notice_type, args.cpv, args.nuts, args.date_from,
+                        args.date_to, args.limit):
+        sys.stdout.write(json.dumps(record, ensure_ascii=False, default=encode_record) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+# Field registry: the keys of a scraped document, in the order of the DATA section of the README.
+FIELDS = (
+    'URL',
+    'Title',
+    'Notice publication number',
+    'Publication date',
+    'OJ S issue number',
+    'Town/city of the buyer',
+    'Official name of the buyer',
+    'Original language',
+    'Country of the buyer',
+    'Type of buyer',
+    'EU institution/agency',
+    'Document sent',
+    'Type of contract',
+    'Type of procedure',
+    'Notice type',
+    'Regulation',
+    'Type of bid',
+    'Award criteria',
+    'Common procurement vocabulary (CPV)',
+    'Place of performance (NUTS)',
+    'Internet address (URL)',
+    'Legal basis',
+    'Content hash'
+)
+
+CONTENT_HASH_FIELD = 'Content hash'
+
+FIELD_INDEX = {field: index for index, field in enumerate(FIELDS)}
+
+# Fields with a small set of values that repeat across notices, so every record can share the same string object.
+INTERNED_FIELDS = frozenset({
+    'Publication date',
+    'OJ S issue number',
+    'Town/city of the buyer',
+    'Original language',
+    'Country of the buyer',
+    'Type of buyer',
+    'EU institution/agency',
+    'Document sent',
+    'Type of contract',
+    'Type of procedure',
+    'Notice type',
+    'Regulation',
+    'Type of bid',
+    'Award criteria',
+    'Legal basis'
+})
+
+
+def intern_value(key: str, value: Any) -> Any:
+    if key in INTERNED_FIELDS and isinstance(value, str):
+        return sys.intern(value)
+
+    return value
+
+
+class Record(Mapping):
+    """
+        A read-only, memory-compact mapping of a scraped document. Known fields are stored positionally in a tuple
+        (following FIELDS), so the long key strings are not repeated per record, and values of INTERNED_FIELDS are
+        interned. Keys that are not in the registry are kept in a small dict.
+    """
+    __slots__ = ('_values', '_extra')
+
+    def __init__(self, values: Tuple[Any, ...], extra: Optional[Dict[str, Any]] = None):
+        self._values = values
+        self._extra = extra
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[Tuple[str, Any]]) -> 'Record':
+        values = [None] * len(FIELDS)
+        extra = None
+
+        for key, value in pairs:
+            index = FIELD_INDEX.get(key)
+
+            if index is not None:
+                values[index] = intern_value(key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[sys.intern(key)] = value
+
+        return cls(tuple(values), extra)
+
+    @classmethod
+    def from_mapping(cls, mapping: Mapping) -> 'Record':
+        if isinstance(mapping, Record):
+            return mapping
+
+        return cls.from_pairs(mapping.items())
+
+    def updated(self, pairs: Iterable[Tuple[str, Any]]) -> 'Record':
+        """
+            Return a new record with the given keys added or replaced.
+        """
+        return Record.from_pairs(list(self.items()) + list(pairs))
+
+    def __getitem__(self, key: str) -> Any:
+        index = FIELD_INDEX.get(key)
+
+        if index is not None:
+            value = self._values[index]
+
+            if value is not None:
+                return value
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for field, value in zip(FIELDS, self._values):
+            if value is not None:
+                yield field
+
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(value is not None for value in self._values) + len(self._extra or ())
+
+    def __repr__(self) -> str:
+        return f'Record({self.to_dict()!r})'
+
+    def __reduce__(self):
+        return Record, (self._values, self._extra)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+
+def encode_record(value: Any) -> Dict[str, Any]:
+    """
+        json.dump `default` hook that serializes Record objects as plain JSON objects.
+    """
+    if isinstance(value, Record):
+        return value.to_dict()
+
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
@@ -0,0 +1,478 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, TYPE_CHECKING
+
+from data_handling import OUTPUT_FILE, load_state, save_state, open_store
+from data_scrapper import SEARCH_URL
+from failure_queue import FailureQueue
+from listing_page import ListingPage, fetch_listing_page
+from main import ScrapeRun
+from page_cursor import checkpoint, notice_order, resume_page
+from session_pool import SESSIONS_FILE, create_session_pool
+from user_interface import MessageProvider
+from utils import Logger, TextFormatter, create_session, get_cookies
+
+if TYPE_CHECKING:
+    import requests
+
+SEARCHES_FILE = 'searches.json'
+SEARCH_STATE_FILE = 'search_state.json'
+
+DEFAULT_INTERVAL = 60 * 60
+DEFAULT_MAX_PAGES = 20
+DEFAULT_RATE = 1.0
+DEFAULT_WORKERS = 4
+
+# A search whose refresh raised is tried again after this many seconds (or its interval, if that is shorter).
+FAILURE_RETRY_DELAY = 5 * 60
+
+ACTION_UPDATE = '2'
+
+
+class Search(NamedTuple):
+    """
+        A saved TED search: the query parameters added to the search result URL, how often it should be refreshed
+        and how many pages with unscraped notices a run may walk before it catches up with the previous run.
+    """
+    name: str
+    params: dict
+    url: str = SEARCH_URL
+    interval: float = DEFAULT_INTERVAL
+    max_pages: int = DEFAULT_MAX_PAGES
+
+
+def load_searches(filename: str = SEARCHES_FILE) -> List[Search]:
+    """
+        Load the search definitions: a JSON list of objects like
+        {"name": "de-construction", "params": {...}, "interval": 3600, "max_pages": 20}.
+    """
+    try:
+        with open(filename, 'r', encoding='utf-8') as searches_file:
+            return [Search(**definition) for definition in json.load(searches_file)]
+    except FileNotFoundError:
+        return []
+
+
+def search_priority(search: Search, search_state: dict, now: float) -> Optional[float]:
+    """
+        Priority of a search, or None if it is not due yet. A search that never ran comes first; otherwise the time
+        since its last run (in refresh intervals) is weighted by how many new documents its recent runs found, so
+        busy feeds are refreshed before quiet ones that are equally overdue.
+    """
+    last_run = search_state.get('last_run')
+
+    if last_run is None:
+        return float('inf')
+
+    staleness = (now - last_run) / search.interval
+
+    if staleness < 1:
+        return None
+
+    return staleness * (1 + search_state.get('volume', 0))
+
+
+class RateLimiter:
+    """
+        Spaces requests at least 1/rate seconds apart across every thread that shares it.
+    """
+
+    def __init__(self,
+                 rate: float = DEFAULT_RATE,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.interval = 1 / rate
+        self.clock = clock
+        self.sleep = sleep
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self.lock:
+            now = self.clock()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+
+        if slot > now:
+            self.sleep(slot - now)
+
+
+class RateLimitedSession:
+    """
+        Wraps a requests.Session (or a SessionPool) so that every GET waits for the shared rate limiter.
+    """
+
+    def __init__(self, session, rate_limiter: RateLimiter):
+        self.session = session
+        self.rate_limiter = rate_limiter
+
+    def get(self,
+            url: str,
+            cookies: Optional[dict] = None,
+            allow_redirects: bool = False,
+            params: Optional[dict] = None) -> 'requests.Response':
+        self.rate_limiter.wait()
+
+        return self.session.get(url, cookies=cookies, allow_redirects=allow_redirects, params=params)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class SynchronizedStore:
+    """
+        Lets the searches of a scheduler share one store: every call goes through a lock.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.filename = store.filename
+        self.lock = threading.Lock()
+
+    def keys(self) -> Set[str]:
+        with self.lock:
+            return self.store.keys()
+
+    def write(self, record):
+        with self.lock:
+            return self.store.write(record)
+
+    def write_many(self, records):
+        with self.lock:
+            return self.store.write_many(records)
+
+    def close(self) -> None:
+        with self.lock:
+            self.store.close()
+
+
+class SearchRun(ScrapeRun):
+    """
+        One refresh of a saved search: walks its result pages from the newest notice until it reaches the newest
+        notice of the previous run (or max_pages). Documents already in the shared dedupe index, whichever search
+        found them, are skipped without a request.
+
+        A refresh cut short by max_pages leaves a backlog: its newest notice is kept as the pending notice and the
+        page it stopped at as a cursor (see page_cursor), and the newest notice is only moved forward once a later
+        refresh has worked through the backlog. Such a refresh walks down to the pending notice, then jumps to the
+        cursor and carries on from there.
+    """
+
+    def __init__(self, scheduler: 'Scheduler', search: Search):
+        super().__init__(scheduler.session, scheduler.cookies, scheduler.store, scheduler.existing_notices,
+                         scheduler.search_state(search), ACTION_UPDATE, scheduler.logger, scheduler.message_provider,
+                         scheduler.text_formatter, request_delay=0, failure_queue=scheduler.failure_queue)
+        self.scheduler = scheduler
+        self.search = search
+        self.high_water = None
+        self.newest_notice = None
+        self.new_documents = 0
+        self.pages = 0
+        self.cursor = {}
+        self.caught_up = False
+
+    def walk(self, first_page: int, last_page_number: int, high_water: Optional[str],
+             listing_page: Optional[ListingPage] = None) -> None:
+        """
+            Walk the pages from first_page until a notice no newer than high_water, the last page or max_pages.
+        """
+        self.high_water = notice_order(high_water) if high_water else None
+        self.caught_up = False
+        self.cursor = {}
+
+        self.run(first_page, last_page_number, listing_page)
+
+    def fetch_page(self, page: int) -> Optional[ListingPage]:
+        return fetch_listing_page(self.session, self.cookies, page, self.search.url, self.search.params)
+
+    def save_progress(self) -> None:
+        self.scheduler.save()
+
+    def process_page(self, listing_page: ListingPage) -> bool:
+        if not listing_page.rows:
+            return super().process_page(listing_page)
+
+        if self.newest_notice is None:
+            self.newest_notice = listing_page.rows[0].notice_number
+
+        if any(row.notice_number not in self.existing_notices for row in listing_page.rows):
+            self.pages += 1  # pages that were scraped already, e.g. on the way to the cursor, are not counted
+
+        for row in listing_page.rows:
+            if self.high_water is not None and notice_order(row.notice_number) <= self.high_water:
+                self.caught_up = True
+                return False
+
+            if not self.process_document(listing_page.page, row):
+                return False
+
+        checkpoint(self.cursor, listing_page)
+
+        if listing_page.page >= (listing_page.last_page_number or listing_page.page):
+            self.caught_up = True
+            return False
+
+        return self.pages < self.search.max_pages
+
+    def process_document(self, page: int, row) -> bool:
+        if not self.scheduler.claim(row.notice_number):
+            return True
+
+        try:
+            super().process_document(page, row)
+        finally:
+            self.scheduler.release(row.notice_number)
+
+        if row.notice_number in self.existing_notices:
+            self.new_documents += 1
+
+        return True
+
+    def refresh(self) -> int:
+        """
+            Run the search and record it in the search state. Returns the number of new documents.
+        """
+        with self.scheduler.lock:
+            newest_notice = self.state.get('newest_notice')
+            pending_notice = self.state.get('pending_notice')
+            backlog = dict(self.state.get('backlog') or {})
+
+        listing_page = self.fetch_page(1)
+
+        if listing_page is None:
+            self.report_fail(self.message_provider.message_failed_to_retrieve_url(self.search.url))
+            return 0
+
+        self.walk(1, listing_page.last_page_number or 1, pending_notice or newest_notice, listing_page)
+
+        if self.caught_up and pending_notice is not None:
+            # everything down to the pending notice is scraped, and so is the backlog down to its cursor
+            pending_notice = self.newest_notice or pending_notice
+            self.cursor = backlog
+
+            if self.pages < self.search.max_pages:
+                page, listing_page = resume_page(backlog, self.fetch_page)
+                self.walk(page, max(page, backlog.get('last_page_number', page)), newest_notice, listing_page)
+            else:
+                self.caught_up = False
+        elif not self.caught_up and pending_notice is None:
+            pending_notice = self.newest_notice
+        elif not self.caught_up:
+            self.cursor = backlog  # stopped above the pending notice: the backlog stays where it was
+
+        with self.scheduler.lock:
+            self.state['last_run'] = self.scheduler.clock()
+            self.state['volume'] = (self.state.get('volume', 0) + self.new_documents) / 2
+
+            if self.caught_up:
+                if pending_notice or self.newest_notice:
+                    self.state['newest_notice'] = pending_notice or self.newest_notice
+
+                self.state.pop('pending_notice', None)
+                self.state.pop('backlog', None)
+            elif pending_notice is not None and self.cursor:
+                self.state['pending_notice'] = pending_notice
+                self.state['backlog'] = self.cursor
+
+        self.save_progress()
+
+        return self.new_documents
+
+
+class Scheduler:
+    """
+        Keeps several saved searches fresh from one process. Due searches run concurrently on a few worker threads,
+        most stale and busiest first; they share one rate limiter, so the total request rate stays the same however
+        many searches there are, and one dedupe index of scraped notices, so a notice that matches several
+        searches is only fetched once.
+    """
+
+    def __init__(self,
+                 searches: List[Search],
+                 session,
+                 cookies: dict,
+                 store,
+                 logger: Logger,
+                 message_provider: MessageProvider,
+                 text_formatter: TextFormatter,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 workers: int = DEFAULT_WORKERS,
+                 state_file: str = SEARCH_STATE_FILE,
+                 failure_queue: Optional[FailureQueue] = None,
+                 clock: Callable[[], float] = time.time):
+        self.searches = searches
+        self.session = RateLimitedSession(session, rate_limiter or RateLimiter())
+        self.cookies = cookies
+        self.store = SynchronizedStore(store)
+        self.logger = logger
+        self.message_provider = message_provider
+        self.text_formatter = text_formatter
+        self.workers = workers
+        self.state_file = state_file
+        self.failure_queue = failure_queue
+        self.clock = clock
+
+        self.state: Dict[str, dict] = load_state(state_file)
+        self.existing_notices = self.store.keys()
+        self.in_progress: Set[str] = set()
+        self.failed_at: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def search_state(self, search: Search) -> dict:
+        with self.lock:
+            return self.state.setdefault(search.name, {})
+
+    def save(self) -> None:
+        with self.lock:
+            save_state({name: dict(entry) for name, entry in self.state.items()}, self.state_file)
+
+    def claim(self, notice_number: str) -> bool:
+        """
+            Reserve a notice for the calling search. Fails if it is already scraped or being scraped by another one.
+        """
+        with self.lock:
+            if notice_number in self.existing_notices or notice_number in self.in_progress:
+                return False
+
+            self.in_progress.add(notice_number)
+
+            return True
+
+    def release(self, notice_number: str) -> None:
+        with self.lock:
+            self.in_progress.discard(notice_number)
+
+    def retry_at(self, search: Search) -> float:
+        """
+            When a search whose last refresh raised may be tried again; 0 if it did not fail.
+        """
+        with self.lock:
+            failed_at = self.failed_at.get(search.name)
+
+        return 0.0 if failed_at is None else failed_at + min(search.interval, FAILURE_RETRY_DELAY)
+
+    def due_searches(self) -> List[Search]:
+        now = self.clock()
+        priorities = [(search_priority(search, self.search_state(search), now), search) for search in self.searches
+                      if self.retry_at(search) <= now]
+
+        return [search for priority, search in sorted((entry for entry in priorities if entry[0] is not None),
+                                                      key=lambda entry: entry[0], reverse=True)]
+
+    def seconds_until_due(self) -> Iterable[tuple]:
+        now = self.clock()
+
+        for search in self.searches:
+            last_run = self.search_state(search).get('last_run')
+            due = 0.0 if last_run is None else last_run + search.interval
+            yield max(0.0, due - now, self.retry_at(search) - now), search
+
+    def refresh(self, search: Search) -> Optional[int]:
+        """
+            Refresh one search. If it raises (e.g. the connection drops) the error is reported and None returned; its
+            last_run is left as it was, so it is retried after FAILURE_RETRY_DELAY while the other searches go on.
+        """
+        try:
+            new_documents = SearchRun(self, search).refresh()
+        except Exception as error:
+            with self.lock:
+                self.failed_at[search.name] = self.clock()
+
+            message = self.message_provider.message_search_failed(search.name, error)
+            print(self.text_formatter.format_message_fail(self.message_provider.construct_message_with_time_stamp(
+                message)))
+            self.logger.log_error(message)
+
+            return None
+
+        with self.lock:
+            self.failed_at.pop(search.name, None)
+
+        self.report(self.message_provider.message_search_finished(search.name, new_documents))
+
+        return new_documents
+
+    def report(self, message: str) -> None:
+        print(self.text_formatter.format_message_success(self.message_provider.construct_message_with_time_stamp(
+            message)))
+        self.logger.log_info(message)
+
+    def run_once(self) -> Dict[str, int]:
+        """
+            Refresh every due search, in priority order. Returns the number of new documents per search that
+            refreshed successfully.
+        """
+        due = self.due_searches()
+
+        if not due:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(due))) as executor:
+            results = executor.map(self.refresh, due)
+
+            return {search.name: new_documents for search, new_documents in zip(due, results)
+                    if new_documents is not None}
+
+    def run_forever(self, sleep: Callable[[float], None] = time.sleep) -> None:
+        while True:
+            self.run_once()
+
+            seconds, search = min(self.seconds_until_due(), key=lambda entry: entry[0])
+
+            print(self.text_formatter.format_message_work_in_progress(
+                self.message_provider.message_next_search_due(search.name, seconds)))
+
+            sleep(seconds)
+
+    def close(self) -> None:
+        self.store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Keep several saved TED searches up to date.')
+    parser.add_argument('--searches', default=SEARCHES_FILE, help='search definitions (default: %(default)s)')
+    parser.add_argument('--output', default=OUTPUT_FILE, help='output file shared by all searches '
+                                                              '(default: %(default)s)')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help='requests per second across all searches (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help='searches refreshed at the same time (default: %(default)s)')
+    parser.add_argument('--sessions', default=SESSIONS_FILE,
+                        help='JSON list of cookie sets to rotate through (default: %(default)s, used if it exists)')
+    parser.add_argument('--once', action='store_true', help='refresh the due searches once and exit')
+    args = parser.parse_args()
+
+    logger = Logger()
+    message_provider = MessageProvider()
+    text_formatter = TextFormatter()
+
+    searches = load_searches(args.searches)
+
+    if not searches:
+        print(text_formatter.format_message_fail(message_provider.message_no_searches(args.searches)))
+        return
+
+    session = create_session_pool(args.sessions) if os.path.exists(args.sessions) else create_session()
+
+    store = open_store(args.output, index=True, journal=True)
+    scheduler = Scheduler(searches, session, get_cookies(), store, logger, message_provider, text_formatter,
+                          RateLimiter(args.rate), args.workers, failure_queue=FailureQueue())
+
+    try:
+        if args.once:
+            scheduler.run_once()
+        else:
+            scheduler.run_forever()
+    except KeyboardInterrupt:
+        print(message_provider.message_interrupted_by_user())
+        logger.log_info(message_provider.message_interrupted_by_user())
+    finally:
+        scheduler.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, Optional, TYPE_CHECKING
+
+from utils import get_cookies, create_session
+
+if TYPE_CHECKING:
+    import requests
+
+SESSIONS_FILE = 'sessions.json'
+
+QUARANTINE_SECONDS = 15 * 60
+
+logger = logging.getLogger(__name__)
+
+
+def load_cookie_sets(filename: str = SESSIONS_FILE) -> List[dict]:
+    """
+        Load the cookie sets of a sessions file: a JSON list of objects like {"JSESSIONID": "...", "ln_pref": "en"}.
+    """
+    try:
+        with open(filename, 'r', encoding='utf-8') as sessions_file:
+            return json.load(sessions_file)
+    except FileNotFoundError:
+        return []
+
+
+def environment_cookie_sets() -> List[dict]:
+    """
+        The cookie set from .env, if a JSESSIONID is configured.
+    """
+    cookies = get_cookies()
+
+    return [cookies] if cookies.get('JSESSIONID') else []
+
+
+def is_expired_response(response: 'requests.Response') -> bool:
+    """
+        Requests are sent with allow_redirects=False, so an expired JSESSIONID shows up as a redirect.
+    """
+    return 300 <= response.status_code < 400
+
+
+class PooledSession:
+    """
+        One cookie set with its own requests.Session.
+    """
+
+    def __init__(self, cookies: dict):
+        self.cookies = cookies
+        self.session = create_session()
+        self.quarantined_until = 0.0
+        self.expirations = 0
+
+    @property
+    def name(self) -> str:
+        return (self.cookies.get('JSESSIONID') or '')[:8]
+
+
+class SessionPool:
+    """
+        A pool of TED sessions (cookie sets) shared by the workers of a run. Each worker (by default the calling
+        thread) sticks to one session; when a session expires it is quarantined and the worker moves to the healthy
+        session with the fewest workers. Quarantine doubles on every expiry, and when no session is healthy the
+        provider is asked for fresh cookie sets.
+
+        The pool can be passed wherever a requests.Session is used with fetch_response: get() ignores the given
+        cookies and uses the ones of the worker's session.
+    """
+
+    def __init__(self,
+                 cookie_sets: List[dict],
+                 provider: Optional[Callable[[], List[dict]]] = None,
+                 quarantine_seconds: float = QUARANTINE_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.sessions = []
+        self.provider = provider
+        self.quarantine_seconds = quarantine_seconds
+        self.clock = clock
+        self.assignments: Dict[Hashable, PooledSession] = {}
+        self.lock = threading.Lock()
+
+        self.add_cookie_sets(cookie_sets)
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def add_cookie_sets(self, cookie_sets: List[dict]) -> int:
+        known = {pooled.cookies.get('JSESSIONID') for pooled in self.sessions}
+        added = 0
+
+        for cookies in cookie_sets:
+            if cookies.get('JSESSIONID') and cookies['JSESSIONID'] not in known:
+                self.sessions.append(PooledSession(cookies))
+                known.add(cookies['JSESSIONID'])
+                added += 1
+
+        return added
+
+    def is_healthy(self, pooled: PooledSession) -> bool:
+        return pooled.quarantined_until <= self.clock()
+
+    def healthy_sessions(self) -> List[PooledSession]:
+        return [pooled for pooled in self.sessions if self.is_healthy(pooled)]
+
+    def acquire(self, worker: Optional[Hashable] = None) -> Optional[PooledSession]:
+        """
+            Return the session assigned to the worker, assigning the least used healthy one if it has none or its
+            session is quarantined. Returns None if no session is healthy, even after asking the provider.
+        """
+        worker = threading.get_ident() if worker is None else worker
+
+        with self.lock:
+            pooled = self.assignments.get(worker)
+
+            if pooled is not None and self.is_healthy(pooled):
+                return pooled
+
+            healthy = self.healthy_sessions()
+
+            if not healthy and self.provider is not None and self.add_cookie_sets(self.provider()):
+                healthy = self.healthy_sessions()
+
+            if not healthy:
+                self.assignments.pop(worker, None)
+                return None
+
+            load = {id(session): 0 for session in healthy}
+            for assigned in self.assignments.values():
+                if id(assigned) in load:
+                    load[id(assigned)] += 1
+
+            pooled = min(healthy, key=lambda session: load[id(session)])
+            self.assignments[worker] = pooled
+
+            return pooled
+
+    def report_expired(self, pooled: PooledSession) -> None:
+        with self.lock:
+            pooled.expirations += 1
+            pooled.quarantined_until = self.clock() + self.quarantine_seconds * 2 ** (pooled.expirations - 1)
+
+    def restore(self, pooled: PooledSession) -> None:
+        """
+            Take a session out of quarantine, e.g. when it was suspected of having expired but wasn't.
+        """
+        with self.lock:
+            pooled.expirations = max(0, pooled.expirations - 1)
+            pooled.quarantined_until = 0.0
+
+    def get(self,
+            url: str,
+            cookies: Optional[dict] = None,
+            allow_redirects: bool = False,
+            params: Optional[dict] = None,
+            worker: Optional[Hashable] = None) -> Optional['requests.Response']:
+        """
+            GET with the worker's session, rotating to another session on every expired response. Returns the last
+            response (or None if no session is available) once every session has been tried.
+        """
+        response = None
+
+        for _ in range(len(self.sessions) + 1):
+            pooled = self.acquire(worker)
+
+            if pooled is None:
+                break
+
+            response = pooled.session.get(url, cookies=pooled.cookies, allow_redirects=allow_redirects, params=params)
+
+            if not is_expired_response(response):
+                return response
+
+            logger.warning(f'Session {pooled.name}... expired (status {response.status_code}), rotating')
+            self.report_expired(pooled)
+
+        return response
+
+    def close(self) -> None:
+        for pooled in self.sessions:
+            pooled.session.close()
+
+
+def create_session_pool(filename: str = SESSIONS_FILE) -> SessionPool:
+    """
+        Build a pool from the sessions file and .env. The provider re-reads both, so fresh cookies can be dropped in
+        while a run is going.
+    """
+    def provider() -> List[dict]:
+        return load_cookie_sets(filename) + environment_cookie_sets()
+
+    return SessionPool(provider(), provider)
@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from analytics import update_corpus_arrays, analytics_filename, numpy
+from data_handling import open_store, save_data
+
+RECORDS = [
+    {'Notice publication number': '1-2023', 'Country of the buyer': 'DE', 'Publication date': '06/10/2023',
+     'Common procurement vocabulary (CPV)': '45000000 - Construction work, 45210000 - Building construction work',
+     'Place of performance (NUTS)': 'DE212 - München, Kreisfreie Stadt'},
+    {'Notice publication number': '2-2023', 'Country of the buyer': 'PL', 'Publication date': '07/11/2023',
+     'Common procurement vocabulary (CPV)': '33600000 - Pharmaceutical products, 45000000 - Construction work',
+     'Place of performance (NUTS)': 'PL911 - Miasto Warszawa'},
+    {'Notice publication number': '3-2023', 'Country of the buyer': 'DE', 'Publication date': '08/11/2023'}
+]
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class AnalyticsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.data_file = os.path.join(self.directory, 'output.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, records):
+        store = open_store(self.data_file, index=True)
+        store.write_many(records)
+        store.close()
+
+    def test_arrays_are_typed(self):
+        self.write(RECORDS)
+
+        arrays = update_corpus_arrays(self.data_file)
+
+        self.assertEqual(arrays.dates.dtype, numpy.dtype('datetime64[D]'))
+        self.assertEqual(arrays.cpv_codes.tolist(), [45000000, 45210000, 33600000, 45000000])
+        self.assertEqual(arrays.cpv_offsets.tolist(), [0, 2, 4, 4])
+        self.assertEqual([arrays.countries[code] for code in arrays.country], ['DE', 'PL', 'DE'])
+        self.assertEqual([arrays.nuts[code] for code in arrays.nuts_codes], ['DE212', 'PL911'])
+
+    def test_counts(self):
+        self.write(RECORDS)
+
+        arrays = update_corpus_arrays(self.data_file)
+
+        self.assertEqual(arrays.counts_by_country(), {'DE': 2, 'PL': 1})
+        self.assertEqual(arrays.counts_by_cpv_division(), {'33': 1, '45': 2})
+        self.assertEqual(arrays.counts_by_month(), {'2023-10': 1, '2023-11': 2})
+
+    def test_update_reads_only_new_entries_and_replaces_amended_notices(self):
+        self.write(RECORDS[:2])
+        update_corpus_arrays(self.data_file)
+
+        self.write([RECORDS[2], dict(RECORDS[0], **{'Country of the buyer': 'FR'})])
+        arrays = update_corpus_arrays(self.data_file)
+
+        self.assertEqual(len(arrays), 4)
+        self.assertEqual(arrays.counts_by_country(), {'DE': 1, 'FR': 1, 'PL': 1})
+        self.assertTrue(os.path.exists(analytics_filename(self.data_file)))
+        self.assertEqual(update_corpus_arrays(self.data_file).counts_by_country(), {'DE': 1, 'FR': 1, 'PL': 1})
+
+    def test_update_does_not_load_query_index(self):
+        self.write(RECORDS)
+
+        with patch('data_handling.CorpusIndex') as mock_corpus_index:
+            update_corpus_arrays(self.data_file)
+
+        mock_corpus_index.assert_not_called()
+
+    def test_rebuilds_when_index_is_rebuilt(self):
+        json_file = os.path.join(self.directory, 'output.json')
+        save_data(RECORDS[:1], json_file)
+        self.assertEqual(update_corpus_arrays(json_file).counts_by_country(), {'DE': 1})
+
+        save_data(RECORDS[1:2], json_file)
+        os.utime(json_file, (os.path.getmtime(json_file) + 10,) * 2)
+
+        self.assertEqual(update_corpus_arrays(json_file).counts_by_country(), {'PL': 1})
@@ -0,0 +1,205 @@
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+import requests
+import requests_mock
+
+from bulk_ingest import format_xml_date, iter_notices, iter_package_records, list_packages, ingest
+
+NOTICE_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<TED_EXPORT xmlns="http://publications.europa.eu/resource/schema/ted/R2.0.9/publication"
+            xmlns:n2016="http://publications.europa.eu/resource/schema/ted/2016/nuts" DOC_ID="{doc_id}">
+    <CODED_DATA_SECTION>
+        <REF_OJS>
+            <COLL_OJ>S</COLL_OJ>
+            <NO_OJ>194</NO_OJ>
+            <DATE_PUB>20231006</DATE_PUB>
+        </REF_OJS>
+        <NOTICE_DATA>
+            <NO_DOC_OJS>2023/S 194-{doc_id}</NO_DOC_OJS>
+            <URI_LIST>
+                <URI_DOC LG="DE">https://ted.europa.eu/udl?uri=TED:NOTICE:{doc_id}:TEXT:DE:HTML</URI_DOC>
+                <URI_DOC LG="EN">https://ted.europa.eu/udl?uri=TED:NOTICE:{doc_id}:TEXT:EN:HTML</URI_DOC>
+            </URI_LIST>
+            <LG_ORIG>DE</LG_ORIG>
+            <ISO_COUNTRY VALUE="DE"/>
+            <IA_URL_GENERAL>https://www.muenchen.de</IA_URL_GENERAL>
+            <ORIGINAL_CPV CODE="45000000">Construction work</ORIGINAL_CPV>
+            <ORIGINAL_CPV CODE="45210000">Building construction work</ORIGINAL_CPV>
+            <n2016:PERFORMANCE_NUTS CODE="DE212">München, Kreisfreie Stadt</n2016:PERFORMANCE_NUTS>
+        </NOTICE_DATA>
+        <CODIF_DATA>
+            <DS_DATE_DISPATCH>20231004</DS_DATE_DISPATCH>
+            <AA_AUTHORITY_TYPE CODE="3">Regional or local authority</AA_AUTHORITY_TYPE>
+            <TD_DOCUMENT_TYPE CODE="3">Contract notice</TD_DOCUMENT_TYPE>
+            <NC_CONTRACT_NATURE CODE="1">Works</NC_CONTRACT_NATURE>
+            <PR_PROC CODE="1">Open procedure</PR_PROC>
+        </CODIF_DATA>
+    </CODED_DATA_SECTION>
+    <TRANSLATION_SECTION>
+        <ML_TITLES>
+            <ML_TI_DOC LG="DE">
+                <TI_CY>Deutschland</TI_CY><TI_TOWN>München</TI_TOWN><TI_TEXT><P>Bauarbeiten</P></TI_TEXT>
+            </ML_TI_DOC>
+            <ML_TI_DOC LG="EN">
+                <TI_CY>Germany</TI_CY><TI_TOWN>Munich</TI_TOWN><TI_TEXT><P>Construction work</P></TI_TEXT>
+            </ML_TI_DOC>
+        </ML_TITLES>
+        <ML_AA_NAMES>
+            <AA_NAME LG="DE">Landeshauptstadt München</AA_NAME>
+        </ML_AA_NAMES>
+    </TRANSLATION_SECTION>
+    <FORM_SECTION>
+        <F02_2014 CATEGORY="ORIGINAL" FORM="F02" LG="DE">
+            <LEGAL_BASIS VALUE="32014L0024"/>
+        </F02_2014>
+    </FORM_SECTION>
+</TED_EXPORT>
+"""
+
+
+class BulkIngestTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.output_file = os.path.join(self.directory, 'output.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_xml(self, filename: str, doc_id: str) -> str:
+        path = os.path.join(self.directory, filename)
+
+        with open(path, 'w', encoding='utf-8') as xml_file:
+            xml_file.write(NOTICE_XML.format(doc_id=doc_id))
+
+        return path
+
+    # format_xml_date
+
+    def test_format_xml_date(self):
+        self.assertEqual(format_xml_date('20231006'), '06/10/2023')
+
+    def test_format_xml_date_with_invalid_date(self):
+        self.assertEqual(format_xml_date('unknown'), 'unknown')
+
+    # iter_notices
+
+    def test_iter_notices_maps_fields_to_record_schema(self):
+        xml_file = io.BytesIO(NOTICE_XML.format(doc_id='607845-2023').encode('utf-8'))
+
+        records = list(iter_notices(xml_file))
+
+        expected_record = {
+            'URL': 'https://ted.europa.eu/udl?uri=TED:NOTICE:607845-2023:TEXT:EN:HTML',
+            'Title': 'Germany-Munich: Construction work',
+            'Notice publication number': '607845-2023',
+            'Publication date': '06/10/2023',
+            'OJ S issue number': '194',
+            'Town/city of the buyer': 'Munich',
+            'Official name of the buyer': 'Landeshauptstadt München',
+            'Original language': 'DE',
+            'Country of the buyer': 'DE',
+            'Document sent': '04/10/2023',
+            'Type of buyer': '3 - Regional or local authority',
+            'Type of contract': '1 - Works',
+            'Type of procedure': '1 - Open procedure',
+            'Notice type': '3 - Contract notice',
+            'Common procurement vocabulary (CPV)': '45000000 - Construction work, '
+                                                   '45210000 - Building construction work',
+            'Place of performance (NUTS)': 'DE212 - München, Kreisfreie Stadt',
+            'Internet address (URL)': 'https://www.muenchen.de',
+            'Legal basis': '32014L0024'
+        }
+        self.assertEqual(records, [expected_record])
+
+    # iter_package_records
+
+    def test_iter_package_records_from_zip(self):
+        path = os.path.join(self.directory, '20231006.zip')
+
+        with zipfile.ZipFile(path, 'w') as archive:
+            archive.writestr('1-2023.xml', NOTICE_XML.format(doc_id='1-2023'))
+            archive.writestr('2-2023.xml', NOTICE_XML.format(doc_id='2-2023'))
+            archive.writestr('readme.txt', 'not a notice')
+
+        numbers = [record['Notice publication number'] for record in iter_package_records(path)]
+
+        self.assertEqual(numbers, ['1-2023', '2-2023'])
+
+    def test_iter_package_records_from_tar_gz(self):
+        xml_path = self.write_xml('3-2023.xml', '3-2023')
+        path = os.path.join(self.directory, '20231006.tar.gz')
+
+        with tarfile.open(path, 'w:gz') as archive:
+            archive.add(xml_path, arcname='20231006/3-2023.xml')
+
+        numbers = [record['Notice publication number'] for record in iter_package_records(path)]
+
+        self.assertEqual(numbers, ['3-2023'])
+
+    def test_iter_package_records_skips_malformed_xml(self):
+        path = os.path.join(self.directory, 'broken.xml')
+
+        with open(path, 'w', encoding='utf-8') as xml_file:
+            xml_file.write('<TED_EXPORT>')
+
+        self.assertEqual(list(iter_package_records(path)), [])
+
+    # list_packages
+
+    def test_list_packages_from_directory(self):
+        self.write_xml('b.xml', '2-2023')
+        self.write_xml('a.xml', '1-2023')
+
+        packages = [os.path.basename(path) for path in list_packages(self.directory)]
+
+        self.assertEqual(packages, ['a.xml', 'b.xml'])
+
+    # ingest
+
+    def test_ingest_skips_existing_notices(self):
+        with open(self.output_file, 'w', encoding='utf-8') as json_file:
+            json.dump([{'URL': 'url', 'Notice publication number': '1-2023'}], json_file)
+
+        self.write_xml('a.xml', '1-2023')
+        self.write_xml('b.xml', '2-2023')
+
+        added = ingest([self.directory], self.output_file)
+
+        with open(self.output_file, 'r', encoding='utf-8') as json_file:
+            saved_data = json.load(json_file)
+
+        self.assertEqual(added, 1)
+        self.assertEqual([record['Notice publication number'] for record in saved_data], ['1-2023', '2-2023'])
+
+    def test_ingest_revalidate_updates_only_amended_notices(self):
+        self.write_xml('a.xml', '1-2023')
+
+        self.assertEqual(ingest([self.directory], self.output_file), 1)
+        self.assertEqual(ingest([self.directory], self.output_file, revalidate=True), 0)
+
+        with open(os.path.join(self.directory, 'a.xml'), 'w', encoding='utf-8') as xml_file:
+            xml_file.write(NOTICE_XML.format(doc_id='1-2023').replace('Construction work</P>', 'Amended</P>'))
+
+        self.assertEqual(ingest([self.directory], self.output_file, revalidate=True), 1)
+
+        with open(self.output_file, 'r', encoding='utf-8') as json_file:
+            saved_data = json.load(json_file)
+
+        self.assertEqual([record['Title'] for record in saved_data], ['Germany-Munich: Amended'])
+
+    def test_ingest_from_url(self):
+        url = 'http://bulk-example-mock.com/packages/20231006.xml'
+
+        with requests_mock.Mocker() as m:
+            m.get(url, content=NOTICE_XML.format(doc_id='4-2023').encode('utf-8'))
+
+            added = ingest([url], self.output_file, requests.Session())
+
+        self.assertEqual(added, 1)
@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from corpus_index import CorpusIndex, CorpusIndexLog, database_filename, index_terms, iso_date, \
+    normalize_notice_type
+
+
+class CorpusIndexTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.index_file = os.path.join(self.directory, 'output.json.index.jsonl')
+
+        self.index = CorpusIndex(self.index_file)
+        self.index.add_many([
+            ('1-2023', {'Country of the buyer': 'DE', 'Notice type': 'Contract notice',
+                        'Common procurement vocabulary (CPV)': '45000000 - Construction work',
+                        'Place of performance (NUTS)': 'DE212 - München, Kreisfreie Stadt',
+                        'Publication date': '06/10/2023'}, 0),
+            ('2-2023', {'Country of the buyer': 'DE', 'Notice type': '7 - Contract award notice',
+                        'Common procurement vocabulary (CPV)': '45210000 - Building construction work, '
+                                                               '71000000 - Architectural services',
+                        'Place of performance (NUTS)': 'DE300 - Berlin',
+                        'Publication date': '07/10/2023'}, 100),
+            ('3-2023', {'Country of the buyer': 'PL', 'Notice type': 'Contract notice',
+                        'Common procurement vocabulary (CPV)': '33600000 - Pharmaceutical products',
+                        'Place of performance (NUTS)': 'PL911 - Miasto Warszawa',
+                        'Publication date': '08/10/2023'}, 200)
+        ])
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.directory)
+
+    # index_terms
+
+    def test_index_terms(self):
+        terms = index_terms({'Country of the buyer': ' de ', 'Notice type': '3 - Contract notice',
+                             'Common procurement vocabulary (CPV)': '45000000 - Construction work, 45210000',
+                             'Place of performance (NUTS)': 'DE212 - München, DE300 - Berlin',
+                             'Publication date': '6/10/2023'})
+
+        self.assertEqual(terms, {'country': 'DE', 'notice_type': 'contract notice', 'cpv': ['45000000', '45210000'],
+                                 'nuts': ['DE212', 'DE300'], 'date': '2023-10-06'})
+
+    def test_iso_date(self):
+        self.assertEqual(iso_date('06/10/2023'), '2023-10-06')
+        self.assertEqual(iso_date('2023-10-06'), '2023-10-06')
+        self.assertIsNone(iso_date('-'))
+
+    def test_normalize_notice_type(self):
+        self.assertEqual(normalize_notice_type('7 - Contract award notice'), 'contract award notice')
+        self.assertIsNone(normalize_notice_type(''))
+
+    # query
+
+    def test_query_by_country_and_cpv_prefix(self):
+        self.assertEqual(self.index.query(country='de', cpv='45'), ['2-2023', '1-2023'])
+        self.assertEqual(self.index.query(country='DE', cpv='452'), ['2-2023'])
+        self.assertEqual(self.index.query(cpv='71'), ['2-2023'])
+
+    def test_query_by_notice_type_and_nuts_prefix(self):
+        self.assertEqual(self.index.query(notice_type='Contract notice'), ['3-2023', '1-2023'])
+        self.assertEqual(self.index.query(nuts='DE'), ['2-2023', '1-2023'])
+        self.assertEqual(self.index.query(nuts='DE2'), ['1-2023'])
+
+    def test_query_by_date_range(self):
+        self.assertEqual(self.index.query(date_from='07/10/2023'), ['3-2023', '2-2023'])
+        self.assertEqual(self.index.query(date_from='2023-10-06', date_to='2023-10-07'), ['2-2023', '1-2023'])
+        self.assertEqual(self.index.query(date_to='05/10/2023'), [])
+
+    def test_query_without_criteria_returns_everything(self):
+        self.assertEqual(self.index.query(), ['3-2023', '2-2023', '1-2023'])
+
+    def test_later_entry_replaces_earlier_one(self):
+        self.index.add('1-2023', {'Country of the buyer': 'FR', 'Publication date': '06/10/2023'}, 300)
+        self.index.close()
+
+        index = CorpusIndex(self.index_file)
+
+        self.assertEqual(index.query(country='FR'), ['1-2023'])
+        self.assertEqual(index.query(country='DE'), ['2-2023'])
+        self.assertEqual(index.offset('1-2023'), 300)
+        self.assertEqual(len(index), 3)
+
+    def test_index_reads_only_entries_appended_since_last_update(self):
+        self.index.close()
+
+        log = CorpusIndexLog(self.index_file)
+        log.add('4-2023', {'Country of the buyer': 'FR', 'Publication date': '09/10/2023'}, 300)
+        log.close()
+
+        self.index = CorpusIndex(self.index_file)
+
+        self.assertTrue(os.path.exists(database_filename(self.index_file)))
+        self.assertEqual(self.index.query(country='FR'), ['4-2023'])
+        self.assertEqual(len(self.index), 4)
+
+    def test_rewritten_log_rebuilds_database(self):
+        self.index.close()
+
+        log = CorpusIndexLog(self.index_file)
+        log.reset()
+        log.add('5-2023', {'Country of the buyer': 'ES', 'Publication date': '10/10/2023'}, 0)
+        log.close()
+
+        self.index = CorpusIndex(self.index_file)
+
+        self.assertEqual(self.index.query(), ['5-2023'])
+        self.assertIsNone(self.index.offset('1-2023'))
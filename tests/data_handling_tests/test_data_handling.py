@@ -1,8 +1,18 @@
+import gzip
+import importlib.util
 import json
 import os
 import unittest
+from unittest.mock import patch
 
-from data_handling import load_data, save_data, load_state, save_state
+from data_handling import load_data, save_data, load_state, save_state, record_key, build_index, iter_records, \
+    JsonLinesStore, JsonArrayStore, open_store, READ_CHUNK_SIZE, ChangeTrackingStore, content_hash, changes_filename, \
+    CompressedJsonLinesStore, block_index_filename, load_block_index, write_records, JournaledStore, \
+    journal_filename, IndexingStore, corpus_index_filename
+from corpus_index import CorpusIndexLog
+from records import CONTENT_HASH_FIELD
+
+HAS_ZSTANDARD = importlib.util.find_spec('zstandard') is not None
 
 
 class DataHandlingTests(unittest.TestCase):
@@ -10,12 +20,26 @@ class DataHandlingTests(unittest.TestCase):
         self.test_data = [{"key1": "value1"}, {"key2": "value2"}]
         self.test_state = {"key1": "value1", "key2": "value2"}
         self.output_file = 'test_output.json'
+        self.lines_file = 'test_output.jsonl'
         self.state_file = 'test_state.json'
+        self.gzip_file = 'test_output.jsonl.gz'
+        self.zstd_file = 'test_output.jsonl.zst'
 
     def tearDown(self):
+        for filename in (self.gzip_file, self.zstd_file):
+            for path in (filename, block_index_filename(filename)):
+                if os.path.exists(path):
+                    os.remove(path)
+
         if os.path.exists(self.output_file):
             os.remove(self.output_file)
 
+        if os.path.exists(journal_filename(self.output_file)):
+            os.remove(journal_filename(self.output_file))
+
+        if os.path.exists(self.lines_file):
+            os.remove(self.lines_file)
+
         if os.path.exists("test_state.json"):
             os.remove("test_state.json")
 
@@ -71,3 +95,366 @@ class DataHandlingTests(unittest.TestCase):
             saved_state = json.load(json_file)
 
         self.assertEqual(saved_state, self.test_state)
+
+    # record_key
+
+    def test_record_key_with_notice_number(self):
+        record = {'URL': 'https://ted.europa.eu/udl?uri=TED:NOTICE:1-2023:TEXT:EN:HTML',
+                  'Notice publication number': '578920-2023'}
+
+        self.assertEqual(record_key(record), '578920-2023')
+
+    def test_record_key_falls_back_to_url(self):
+        record = {'URL': 'https://ted.europa.eu/udl?uri=TED:NOTICE:578920-2023:TEXT:EN:HTML'}
+
+        self.assertEqual(record_key(record), '578920-2023')
+
+    def test_record_key_with_unparsable_url(self):
+        self.assertEqual(record_key({'URL': 'url1'}), 'url1')
+
+    # build_index
+
+    def test_build_index(self):
+        data = [{'Notice publication number': '1-2023'}, {'URL': 'url1'}]
+
+        self.assertEqual(build_index(data), {'1-2023', 'url1'})
+
+    # iter_records
+
+    def test_iter_records_from_json_array(self):
+        save_data(self.test_data, self.output_file)
+
+        self.assertEqual(list(iter_records(self.output_file)), self.test_data)
+
+    def test_iter_records_from_json_array_larger_than_chunk(self):
+        data = [{'URL': f'url{i}', 'Title': 'x' * 100} for i in range(READ_CHUNK_SIZE // 50)]
+        save_data(data, self.output_file)
+
+        self.assertEqual(list(iter_records(self.output_file)), data)
+
+    def test_iter_records_from_empty_json_array(self):
+        save_data([], self.output_file)
+
+        self.assertEqual(list(iter_records(self.output_file)), [])
+
+    def test_iter_records_from_json_lines(self):
+        with open(self.lines_file, 'w', encoding='utf-8') as json_file:
+            json_file.write('{"key1": "value1"}\n\n{"key2": "value2"}\n')
+
+        self.assertEqual(list(iter_records(self.lines_file)), self.test_data)
+
+    def test_iter_records_file_not_found(self):
+        self.assertEqual(list(iter_records(self.lines_file)), [])
+
+    # JsonLinesStore
+
+    def test_json_lines_store_appends_records(self):
+        store = JsonLinesStore(self.lines_file)
+        store.write({'URL': 'url1'})
+        store.write_many([{'URL': 'url2'}])
+        store.close()
+
+        store = JsonLinesStore(self.lines_file)
+
+        self.assertEqual(store.keys(), {'url1', 'url2'})
+        self.assertEqual(len(store), 2)
+
+    def test_json_lines_store_recovers_from_torn_last_line(self):
+        with open(self.lines_file, 'w', encoding='utf-8') as json_file:
+            json_file.write('{"URL": "url1"}\n{"URL": "url2", "Notice publication number": "2-20')
+
+        index_file = corpus_index_filename(self.lines_file)
+        self.addCleanup(lambda: os.path.exists(index_file) and os.remove(index_file))
+
+        store = open_store(self.lines_file, track_changes=False, index=True, journal=True)
+
+        self.assertEqual(store.keys(), {'url1'})
+
+        with self.assertLogs('data_handling', 'WARNING'):
+            store.write({'URL': 'url3'})
+
+        store.close()
+
+        self.assertEqual([record['URL'] for record in iter_records(self.lines_file)], ['url1', 'url3'])
+
+    # open_store
+
+    def test_open_store_by_extension(self):
+        self.assertIsInstance(open_store(self.lines_file, track_changes=False), JsonLinesStore)
+        self.assertIsInstance(open_store(self.output_file, track_changes=False), JsonArrayStore)
+
+    def test_open_store_tracks_changes_by_default(self):
+        store = open_store(self.lines_file)
+
+        self.assertIsInstance(store, ChangeTrackingStore)
+        self.assertIsInstance(store.store, JsonLinesStore)
+
+    def test_open_store_compressed_by_extension(self):
+        store = open_store(self.gzip_file, track_changes=False)
+
+        self.assertIsInstance(store, CompressedJsonLinesStore)
+        self.assertEqual(changes_filename(self.gzip_file), 'test_output.changes.jsonl')
+
+    # CompressedJsonLinesStore
+
+    def write_compressed(self, filename):
+        store = CompressedJsonLinesStore(filename, block_size=2)
+        store.write_many({'URL': f'url{number}', 'Title': f'Title {number}'} for number in range(5))
+        store.close()
+
+    def test_compressed_store_writes_independent_blocks(self):
+        self.write_compressed(self.gzip_file)
+
+        blocks = load_block_index(self.gzip_file)
+
+        self.assertEqual([block['keys'] for block in blocks], [['url0', 'url1'], ['url2', 'url3'], ['url4']])
+        self.assertEqual([record['URL'] for record in iter_records(self.gzip_file)],
+                         ['url0', 'url1', 'url2', 'url3', 'url4'])
+
+        with open(self.gzip_file, 'rb') as data_file:
+            data_file.seek(blocks[1]['offset'])
+            block = gzip.decompress(data_file.read(blocks[1]['length']))
+
+        self.assertEqual([json.loads(line)['URL'] for line in block.splitlines()], ['url2', 'url3'])
+
+    def test_compressed_store_reads_one_record_through_index(self):
+        self.write_compressed(self.gzip_file)
+
+        store = CompressedJsonLinesStore(self.gzip_file)
+
+        self.assertEqual(store.keys(), {'url0', 'url1', 'url2', 'url3', 'url4'})
+        self.assertEqual(store.read('url3')['Title'], 'Title 3')
+        self.assertIsNone(store.read('url9'))
+
+    def test_compressed_store_drops_unindexed_partial_block(self):
+        self.write_compressed(self.gzip_file)
+        size = os.path.getsize(self.gzip_file)
+
+        with open(self.gzip_file, 'ab') as data_file:
+            data_file.write(b'partial block')
+
+        store = CompressedJsonLinesStore(self.gzip_file)
+
+        self.assertEqual(os.path.getsize(self.gzip_file), size)
+        self.assertEqual(len(store), 5)
+
+    def test_compressed_store_rebuilds_missing_block_index(self):
+        self.write_compressed(self.gzip_file)
+        size = os.path.getsize(self.gzip_file)
+        os.remove(block_index_filename(self.gzip_file))
+
+        store = CompressedJsonLinesStore(self.gzip_file)
+
+        self.assertEqual(os.path.getsize(self.gzip_file), size)
+        self.assertEqual(store.keys(), {'url0', 'url1', 'url2', 'url3', 'url4'})
+        self.assertEqual(store.read('url2')['Title'], 'Title 2')
+        self.assertEqual([block['keys'] for block in load_block_index(self.gzip_file)],
+                         [['url0', 'url1'], ['url2', 'url3'], ['url4']])
+
+    def test_compressed_store_indexes_complete_block_written_before_crash(self):
+        self.write_compressed(self.gzip_file)
+
+        with open(block_index_filename(self.gzip_file), 'r', encoding='utf-8') as index_file:
+            lines = index_file.readlines()
+
+        with open(block_index_filename(self.gzip_file), 'w', encoding='utf-8') as index_file:
+            index_file.writelines(lines[:-1])
+
+        with open(self.gzip_file, 'ab') as data_file:
+            data_file.write(gzip.compress(b'{"URL": "url5"}\n')[:10])
+
+        store = CompressedJsonLinesStore(self.gzip_file)
+
+        self.assertEqual(len(store), 5)
+        self.assertEqual(store.read('url4')['Title'], 'Title 4')
+        self.assertEqual([record['URL'] for record in iter_records(self.gzip_file)],
+                         ['url0', 'url1', 'url2', 'url3', 'url4'])
+
+    def test_compressed_store_reindexes_block_of_torn_index_line(self):
+        self.write_compressed(self.gzip_file)
+
+        with open(block_index_filename(self.gzip_file), 'r+b') as index_file:
+            index_file.truncate(os.path.getsize(block_index_filename(self.gzip_file)) - 10)
+
+        with self.assertLogs('data_handling', 'WARNING'):
+            store = CompressedJsonLinesStore(self.gzip_file)
+
+        self.assertEqual(store.keys(), {'url0', 'url1', 'url2', 'url3', 'url4'})
+        self.assertEqual(store.read('url4')['Title'], 'Title 4')
+        self.assertEqual([block['keys'] for block in load_block_index(self.gzip_file)],
+                         [['url0', 'url1'], ['url2', 'url3'], ['url4']])
+
+    def test_compressed_store_opens_plain_gzip_file(self):
+        with gzip.open(self.gzip_file, 'wt', encoding='utf-8') as data_file:
+            data_file.write('{"URL": "url1"}\n{"URL": "url2"}')
+
+        store = open_store(self.gzip_file)
+
+        self.assertEqual(store.keys(), {'url1', 'url2'})
+        self.assertEqual([record['URL'] for record in iter_records(self.gzip_file)], ['url1', 'url2'])
+
+    def test_compressed_store_refuses_unreadable_file(self):
+        with open(self.gzip_file, 'wb') as data_file:
+            data_file.write(b'not compressed')
+
+        with self.assertRaises(ValueError):
+            CompressedJsonLinesStore(self.gzip_file)
+
+        self.assertEqual(os.path.getsize(self.gzip_file), len(b'not compressed'))
+
+    @unittest.skipUnless(HAS_ZSTANDARD, 'zstandard is not installed')
+    def test_compressed_store_with_zstd(self):
+        self.write_compressed(self.zstd_file)
+
+        self.assertEqual(len(load_block_index(self.zstd_file)), 3)
+        self.assertEqual([record['URL'] for record in iter_records(self.zstd_file)],
+                         ['url0', 'url1', 'url2', 'url3', 'url4'])
+        self.assertEqual(CompressedJsonLinesStore(self.zstd_file).read('url4')['Title'], 'Title 4')
+
+    def test_write_no_records_replaces_compressed_file(self):
+        self.write_compressed(self.gzip_file)
+
+        self.assertEqual(write_records([], self.gzip_file), 0)
+
+        self.assertEqual(list(iter_records(self.gzip_file)), [])
+        self.assertEqual(load_block_index(self.gzip_file), [])
+        self.assertEqual(CompressedJsonLinesStore(self.gzip_file).keys(), set())
+
+    def test_write_records_to_compressed_file(self):
+        self.assertEqual(write_records([{'URL': 'url1'}, {'URL': 'url2'}], self.gzip_file), 2)
+
+        self.assertEqual([record['URL'] for record in iter_records(self.gzip_file)], ['url1', 'url2'])
+        self.assertEqual(load_block_index(self.gzip_file)[0]['keys'], ['url1', 'url2'])
+
+    def test_write_records_ignores_leftover_temporary_file(self):
+        self.write_compressed(self.gzip_file + '.tmp.gz')
+
+        try:
+            self.assertEqual(write_records([{'URL': 'url9'}], self.gzip_file), 1)
+        finally:
+            for path in (self.gzip_file + '.tmp.gz', block_index_filename(self.gzip_file + '.tmp.gz')):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        self.assertEqual([record['URL'] for record in iter_records(self.gzip_file)], ['url9'])
+        self.assertEqual(CompressedJsonLinesStore(self.gzip_file).keys(), {'url9'})
+
+    # IndexingStore
+
+    def test_indexing_store_only_appends_to_index_file(self):
+        index_file = corpus_index_filename(self.lines_file)
+        self.addCleanup(os.remove, index_file)
+
+        store = open_store(self.lines_file, track_changes=False, index=True)
+        store.write_many([{'URL': 'url1', 'Country of the buyer': 'DE'}, {'URL': 'url2'}])
+        store.close()
+
+        self.assertIsInstance(store, IndexingStore)
+        self.assertIsInstance(store.index, CorpusIndexLog)
+
+        with open(index_file, 'r', encoding='utf-8') as index:
+            entries = [json.loads(line) for line in index]
+
+        self.assertEqual([(entry['key'], entry['offset'], entry['country']) for entry in entries],
+                         [('url1', 0, 'DE'), ('url2', 46, None)])
+
+    # JournaledStore
+
+    def test_journaled_store_checkpoints_into_data_file(self):
+        store = JournaledStore(JsonArrayStore(self.output_file), checkpoint_size=3)
+        store.write({'URL': 'url1'})
+        store.write({'URL': 'url2'})
+
+        self.assertEqual(load_data(self.output_file), [])
+        self.assertEqual(store.keys(), {'url1', 'url2'})
+
+        store.write({'URL': 'url3'})
+
+        self.assertEqual(load_data(self.output_file), [{'URL': 'url1'}, {'URL': 'url2'}, {'URL': 'url3'}])
+        self.assertFalse(os.path.exists(journal_filename(self.output_file)))
+
+        store.write({'URL': 'url4'})
+        store.close()
+
+        self.assertEqual(len(load_data(self.output_file)), 4)
+
+    def test_journaled_store_replays_journal_after_crash(self):
+        store = JournaledStore(JsonArrayStore(self.output_file))
+        store.write_many([{'URL': 'url1'}, {'URL': 'url2'}])
+        store.journal.write('{"URL": "url3", "Ti')  # killed in the middle of a write
+        store.journal.close()
+
+        recovered = JournaledStore(JsonArrayStore(self.output_file))
+
+        self.assertEqual(recovered.recovered, 2)
+        self.assertEqual(load_data(self.output_file), [{'URL': 'url1'}, {'URL': 'url2'}])
+        self.assertFalse(os.path.exists(journal_filename(self.output_file)))
+
+    @patch('data_handling.os.fsync')
+    def test_journaled_store_fsyncs_in_groups(self, mock_fsync):
+        store = JournaledStore(JsonArrayStore(self.output_file), group_size=2, clock=lambda: 0)
+
+        for number in range(5):
+            store.write({'URL': f'url{number}'})
+
+        self.assertEqual(mock_fsync.call_count, 2)
+
+        store.close()
+
+        self.assertEqual(len(load_data(self.output_file)), 5)
+
+    # JsonArrayStore
+
+    def test_json_array_store_replaces_record_with_same_key(self):
+        store = JsonArrayStore(self.output_file)
+        store.write({'URL': 'url1', 'Title': 'old'})
+        store.write({'URL': 'url2'})
+        store.write({'URL': 'url1', 'Title': 'new'})
+
+        self.assertEqual(load_data(self.output_file), [{'URL': 'url1', 'Title': 'new'}, {'URL': 'url2'}])
+
+    # content_hash
+
+    def test_content_hash_ignores_whitespace_order_and_hash_field(self):
+        record = {'URL': 'url1', 'Title': 'Construction  work'}
+        same_record = {'Title': ' Construction work', 'URL': 'url1', CONTENT_HASH_FIELD: 'stale'}
+
+        self.assertEqual(content_hash(record), content_hash(same_record))
+        self.assertNotEqual(content_hash(record), content_hash({'URL': 'url1', 'Title': 'Other work'}))
+
+    # ChangeTrackingStore
+
+    def test_change_tracking_store_skips_unchanged_records(self):
+        store = ChangeTrackingStore(JsonLinesStore(self.lines_file))
+
+        self.assertTrue(store.write({'URL': 'url1', 'Title': 'Title'}))
+        self.assertFalse(store.write({'URL': 'url1', 'Title': 'Title'}))
+        store.close()
+
+        store = ChangeTrackingStore(JsonLinesStore(self.lines_file))
+
+        self.assertEqual(store.write_many([{'URL': 'url1', 'Title': 'Title'}, {'URL': 'url2'}]), 1)
+        store.close()
+
+        records = list(iter_records(self.lines_file))
+
+        self.assertEqual([record['URL'] for record in records], ['url1', 'url2'])
+        self.assertEqual(records[0][CONTENT_HASH_FIELD], content_hash(records[0]))
+        self.assertFalse(os.path.exists(changes_filename(self.lines_file)))
+
+    def test_change_tracking_store_logs_amended_records(self):
+        save_data([{'URL': 'url1', 'Title': 'Title'}], self.output_file)
+        store = ChangeTrackingStore(JsonArrayStore(self.output_file))
+
+        self.assertTrue(store.write({'URL': 'url1', 'Title': 'Amended title'}))
+        store.close()
+
+        with open(changes_filename(self.output_file), 'r', encoding='utf-8') as change_log:
+            change, = [json.loads(line) for line in change_log]
+
+        os.remove(changes_filename(self.output_file))
+
+        self.assertEqual(change['key'], 'url1')
+        self.assertEqual(change['old'], content_hash({'URL': 'url1', 'Title': 'Title'}))
+        self.assertEqual(change['new'], content_hash({'URL': 'url1', 'Title': 'Amended title'}))
+        self.assertEqual([record['Title'] for record in load_data(self.output_file)], ['Amended title'])
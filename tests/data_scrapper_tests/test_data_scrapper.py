@@ -6,7 +6,7 @@ import requests_mock
 from bs4 import BeautifulSoup
 
 from data_scrapper import extract_hrefs, get_last_page, modify_url, data_page_exist_in_document, \
-    extract_data_from_table, scrape_ted_data
+    extract_data_from_table, scrape_ted_data, listing_rows_from_soup, ListingRow, BASE_WEBSITE
 from utils import fetch_response
 
 
@@ -48,6 +48,61 @@ class DataScrapperTests(unittest.TestCase):
 
             self.assertEqual(hrefs, [])
 
+    # listing_rows_from_soup
+
+    def test_listing_rows_from_soup(self):
+        html_content = """
+        <html>
+            <body>
+                <table>
+                    <tr>
+                        <td class="nowrap">
+                            <a href="/udl?uri=TED:NOTICE:578920-2023:TEXT:EN:HTML&src=0">578920-2023</a>
+                        </td>
+                        <td>Germany-Munich: Construction
+                            work</td>
+                        <td>DE</td>
+                        <td>06/10/2023</td>
+                        <td>13/11/2023</td>
+                    </tr>
+                    <tr>
+                        <td class="nowrap"><a href="link2">Link 2</a></td>
+                    </tr>
+                    <tr>
+                        <td class="nowrap">No link here</td>
+                    </tr>
+                </table>
+            </body>
+        </html>
+        """
+        soup = BeautifulSoup(html_content, 'html.parser')
+
+        rows = listing_rows_from_soup(soup)
+
+        expected_rows = [
+            ListingRow('/udl?uri=TED:NOTICE:578920-2023:TEXT:EN:HTML&src=0', '578920-2023',
+                       'Germany-Munich: Construction work', 'DE', '06/10/2023', '13/11/2023'),
+            ListingRow('link2', 'Link 2')
+        ]
+        self.assertEqual(rows, expected_rows)
+
+    def test_listing_rows_from_soup_without_rows(self):
+        self.assertEqual(listing_rows_from_soup(BeautifulSoup('', 'html.parser')), [])
+
+    def test_listing_row_to_dict(self):
+        row = ListingRow('/udl?uri=TED:NOTICE:578920-2023:TEXT:EN:HTML&src=0', '578920-2023', 'Title', 'DE',
+                         '06/10/2023', '13/11/2023')
+
+        expected_dict = {
+            'URL': BASE_WEBSITE + '/udl?uri=TED:NOTICE:578920-2023:TEXT:EN:HTML&src=0',
+            'Notice publication number': '578920-2023',
+            'Title': 'Title',
+            'Country': 'DE',
+            'Publication date': '06/10/2023',
+            'Deadline': '13/11/2023'
+        }
+        self.assertEqual(row.to_dict(), expected_dict)
+
     def test_get_last_page_with_valid_element(self):
         html_content = """
         <html>
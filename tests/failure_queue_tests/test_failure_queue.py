@@ -0,0 +1,164 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import requests
+import requests_mock
+
+from data_handling import JsonLinesStore, iter_records
+from failure_queue import FailureQueue, RetryWorker, retry_failed, STATUS_REQUEST_FAILED, STATUS_NO_DATA_PAGE, \
+    STATUS_ERROR
+
+DATA_URL = 'http://test-example-mock.com/DATA?tabId=3'
+DOCUMENT_URL = 'http://test-example-mock.com/TEXT?src=0'
+
+DATA_PAGE = """
+<html>
+    <body>
+        <a class="selected">Data</a>
+        <table class="data">
+            <tr><th>1</th><td>Notice publication number</td><td>1-2023</td></tr>
+        </table>
+    </body>
+</html>
+"""
+
+
+class FailureQueueTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.failed_file = os.path.join(self.directory, 'failed.json')
+        self.output_file = os.path.join(self.directory, 'output.jsonl')
+        self.failure_queue = FailureQueue(self.failed_file, max_attempts=3)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    # FailureQueue
+
+    def test_add_is_persistent_and_counts_attempts(self):
+        self.failure_queue.add(DATA_URL, DOCUMENT_URL, 7, STATUS_REQUEST_FAILED)
+        self.failure_queue.add(DATA_URL, DOCUMENT_URL, 7, STATUS_NO_DATA_PAGE)
+
+        entry = FailureQueue(self.failed_file).entries[DATA_URL]
+
+        self.assertEqual(entry['page'], 7)
+        self.assertEqual(entry['status'], STATUS_NO_DATA_PAGE)
+        self.assertEqual(entry['attempts'], 2)
+
+    def test_remove(self):
+        self.failure_queue.add(DATA_URL, DOCUMENT_URL, 7, STATUS_REQUEST_FAILED)
+        self.failure_queue.remove(DATA_URL)
+
+        self.assertNotIn(DATA_URL, FailureQueue(self.failed_file))
+
+    def test_pending_skips_exhausted_entries(self):
+        for _ in range(3):
+            self.failure_queue.add(DATA_URL, DOCUMENT_URL, 7, STATUS_REQUEST_FAILED)
+
+        self.failure_queue.add('other', DOCUMENT_URL, 8, STATUS_REQUEST_FAILED)
+
+        self.assertEqual([entry['url'] for entry in self.failure_queue.pending()], ['other'])
+
+    def test_claim_does_not_hand_out_an_entry_twice(self):
+        self.failure_queue.add(DATA_URL, DOCUMENT_URL, 7, STATUS_REQUEST_FAILED)
+
+        self.assertEqual(self.failure_queue.claim()['url'], DATA_URL)
+        self.assertIsNone(self.failure_queue.claim())
+
+    # retry_failed
+
+    def test_retry_failed_recovers_documents(self):
+        self.failure_queue.add(DATA_URL, DOCUMENT_URL, 7, STATUS_REQUEST_FAILED)
+        self.failure_queue.add('http://test-example-mock.com/missing', DOCUMENT_URL, 8, STATUS_REQUEST_FAILED)
+        store = JsonLinesStore(self.output_file)
+
+        with requests_mock.Mocker() as m:
+            m.get(DATA_URL, text=DATA_PAGE)
+            m.get('http://test-example-mock.com/missing', status_code=500)
+
+            recovered, remaining = retry_failed(self.failure_queue, requests.Session(), {}, store, request_delay=0)
+
+        store.close()
+
+        self.assertEqual((recovered, remaining), (1, 1))
+        self.assertEqual([record['URL'] for record in iter_records(self.output_file)], [DOCUMENT_URL])
+        self.assertEqual(self.failure_queue.entries['http://test-example-mock.com/missing']['attempts'], 2)
+
+    def test_retry_failed_records_raising_request_and_goes_on(self):
+        self.failure_queue.add('http://test-example-mock.com/down', DOCUMENT_URL, 7, STATUS_REQUEST_FAILED)
+        self.failure_queue.add(DATA_URL, DOCUMENT_URL, 8, STATUS_REQUEST_FAILED)
+        store = JsonLinesStore(self.output_file)
+
+        with requests_mock.Mocker() as m:
+            m.get('http://test-example-mock.com/down', exc=requests.ConnectionError)
+            m.get(DATA_URL, text=DATA_PAGE)
+
+            recovered, remaining = retry_failed(self.failure_queue, requests.Session(), {}, store, request_delay=0)
+
+        store.close()
+
+        entry = self.failure_queue.entries['http://test-example-mock.com/down']
+
+        self.assertEqual((recovered, remaining), (1, 1))
+        self.assertEqual((entry['status'], entry['attempts']), (STATUS_REQUEST_FAILED, 2))
+
+    def test_retry_failed_does_not_count_exhausted_entries_as_remaining(self):
+        for _ in range(3):
+            self.failure_queue.add(DATA_URL, DOCUMENT_URL, 7, STATUS_REQUEST_FAILED)
+
+        recovered, remaining = retry_failed(self.failure_queue, requests.Session(), {}, JsonLinesStore(
+            self.output_file), request_delay=0)
+
+        self.assertEqual((recovered, remaining), (0, 0))
+        self.assertIn(DATA_URL, self.failure_queue)
+
+    # RetryWorker
+
+    def test_retry_worker_recovers_in_background(self):
+        self.failure_queue.add(DATA_URL, DOCUMENT_URL, 7, STATUS_REQUEST_FAILED)
+
+        with requests_mock.Mocker() as m:
+            m.get(DATA_URL, text=DATA_PAGE)
+
+            retry_worker = RetryWorker(self.failure_queue, requests.Session(), {}, interval=0.01)
+            retry_worker.start()
+
+            deadline = time.time() + 5
+            while DATA_URL in self.failure_queue and time.time() < deadline:
+                time.sleep(0.01)
+
+            retry_worker.stop()
+            retry_worker.join()
+
+        records = retry_worker.drain()
+
+        self.assertEqual([record['URL'] for record in records], [DOCUMENT_URL])
+        self.assertEqual(len(self.failure_queue), 0)
+
+    def test_retry_worker_survives_unexpected_errors(self):
+        self.failure_queue.add(DATA_URL, DOCUMENT_URL, 7, STATUS_REQUEST_FAILED)
+
+        with requests_mock.Mocker() as m, patch('failure_queue.scrape_ted_data', side_effect=ValueError('bad page')), \
+                self.assertLogs('failure_queue', level='ERROR'):
+            m.get(DATA_URL, text=DATA_PAGE)
+
+            retry_worker = RetryWorker(self.failure_queue, requests.Session(), {}, interval=0.01)
+            retry_worker.start()
+
+            deadline = time.time() + 5
+            while self.failure_queue.entries[DATA_URL]['attempts'] < 2 and time.time() < deadline:
+                time.sleep(0.01)
+
+            self.assertTrue(retry_worker.is_alive())
+
+            retry_worker.stop()
+            retry_worker.join()
+
+        entry = self.failure_queue.entries[DATA_URL]
+
+        self.assertEqual(entry['status'], STATUS_ERROR)
+        self.assertNotIn(DATA_URL, self.failure_queue.in_progress)
@@ -0,0 +1,41 @@
+LISTING_ROW = """
+<tr>
+    <td class="nowrap"><a href="/udl?uri=TED:NOTICE:{number}-2023:TEXT:EN:HTML&src=0">{number}-2023</a></td>
+    <td>Germany-Munich: Construction work</td>
+    <td>DE</td>
+    <td>06/10/2023</td>
+    <td>13/11/2023</td>
+</tr>
+"""
+
+DOCUMENT_PAGE = """
+<html>
+    <body>
+        <a class="selected">Data</a>
+        <table class="data">
+            <tr><th>1</th><td>Notice publication number</td><td>{number}-2023</td></tr>
+            <tr><th>2</th><td>Country of the buyer</td><td>DE</td></tr>
+            <tr><th>3</th><td>Notice type</td><td>Contract notice</td></tr>
+            <tr><th>4</th><td>Common procurement vocabulary (CPV)</td><td>45000000 - Construction work</td></tr>
+        </table>
+    </body>
+</html>
+"""
+
+
+class MockResponse:
+    status_code = 200
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class NullLogger:
+    def log_info(self, message: str) -> None:
+        pass
+
+    def log_error(self, message: str) -> None:
+        pass
+
+    def log_warning(self, message: str) -> None:
+        pass
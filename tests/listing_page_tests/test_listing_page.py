@@ -0,0 +1,68 @@
+import unittest
+
+import requests
+import requests_mock
+
+from data_scrapper import SEARCH_URL, ListingRow
+from listing_page import parse_listing_page, fetch_listing_page
+
+
+class ListingPageTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.html_content = """
+        <html>
+            <body>
+                <table>
+                    <tr>
+                        <td class="nowrap"><a href="/udl?uri=TED:NOTICE:1-2023:TEXT:EN:HTML&src=0">1-2023</a></td>
+                        <td>Title</td>
+                        <td>DE</td>
+                        <td>06/10/2023</td>
+                        <td>-</td>
+                    </tr>
+                </table>
+                <div class="page-icon pagelast">
+                    <a href="/TED/search/searchResult.do?page=42">Last</a>
+                </div>
+            </body>
+        </html>
+        """
+
+    # parse_listing_page
+
+    def test_parse_listing_page(self):
+        listing_page = parse_listing_page(3, self.html_content)
+
+        self.assertEqual(listing_page.page, 3)
+        self.assertEqual(listing_page.rows, [ListingRow('/udl?uri=TED:NOTICE:1-2023:TEXT:EN:HTML&src=0', '1-2023',
+                                                        'Title', 'DE', '06/10/2023', '-')])
+        self.assertEqual(listing_page.last_page_number, 42)
+        self.assertEqual(listing_page.hrefs, ['/udl?uri=TED:NOTICE:1-2023:TEXT:EN:HTML&src=0'])
+
+    def test_parse_listing_page_without_pager(self):
+        listing_page = parse_listing_page(1, '<html><body></body></html>')
+
+        self.assertEqual(listing_page.rows, [])
+        self.assertEqual(listing_page.last_page_number, 0)
+
+    # fetch_listing_page
+
+    def test_fetch_listing_page_with_successful_request(self):
+        with requests_mock.Mocker() as m:
+            m.get(SEARCH_URL, text=self.html_content)
+
+            with requests.Session() as session:
+                listing_page = fetch_listing_page(session, {}, 2)
+
+            self.assertEqual(m.call_count, 1)
+            self.assertEqual(m.last_request.qs, {'page': ['2']})
+
+        self.assertEqual(listing_page.page, 2)
+        self.assertEqual(listing_page.last_page_number, 42)
+
+    def test_fetch_listing_page_with_unsuccessful_request(self):
+        with requests_mock.Mocker() as m:
+            m.get(SEARCH_URL, status_code=302)
+
+            with requests.Session() as session:
+                self.assertIsNone(fetch_listing_page(session, {}, 2))
@@ -0,0 +1,258 @@
+import contextlib
+import gc
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+from typing import Optional
+from unittest.mock import patch
+
+import requests
+
+from data_handling import JsonLinesStore, iter_records
+from failure_queue import FailureQueue, STATUS_REQUEST_FAILED
+from helpers import DOCUMENT_PAGE, LISTING_ROW, MockResponse, NullLogger
+from listing_page import ListingPage, parse_listing_page
+from main import ScrapeRun, load_store, main, parse_arguments
+from user_interface import MessageProvider
+from utils import TextFormatter
+
+DOCUMENTS_PER_PAGE = 25
+
+
+def listing_page_html(page: int, last_page_number: int = 0) -> str:
+    first_number = page * DOCUMENTS_PER_PAGE
+    rows = ''.join(LISTING_ROW.format(number=number)
+                   for number in range(first_number, first_number + DOCUMENTS_PER_PAGE))
+    pager = f'<div class="page-icon pagelast"><a href="?page={last_page_number}">last</a></div>' \
+        if last_page_number else ''
+
+    return f'<html><body><table>{rows}</table>{pager}</body></html>'
+
+
+class MockSession:
+    """
+        Serves generated listing and document pages without recording the requests, so the test measures the
+        memory of the scraper only. last_page_number, if set, is advertised in the pager of every listing page.
+    """
+
+    def __init__(self, last_page_number: int = 0):
+        self.last_page_number = last_page_number
+        self.listing_requests = []
+
+    def get(self, url, cookies=None, allow_redirects=True, params=None):
+        if params:
+            self.listing_requests.append(params['page'])
+            return MockResponse(listing_page_html(params['page'], self.last_page_number))
+
+        number = re.search(r'NOTICE:(\d+)-2023', url).group(1)
+        return MockResponse(DOCUMENT_PAGE.format(number=number))
+
+
+class FailingDocumentSession(MockSession):
+    """
+        Fails the request of one document, with a 500 response or by raising error if it is given.
+    """
+
+    def __init__(self, failing_number: int, error: Optional[Exception] = None):
+        super().__init__()
+        self.failing_number = failing_number
+        self.error = error
+
+    def get(self, url, cookies=None, allow_redirects=True, params=None):
+        if not params and f'NOTICE:{self.failing_number}-' in url:
+            if self.error is not None:
+                raise self.error
+
+            response = MockResponse('')
+            response.status_code = 500
+            return response
+
+        return super().get(url, cookies, allow_redirects, params)
+
+
+class MainTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.output_file = os.path.join(self.directory, 'output.jsonl')
+        self.state_file = os.path.join(self.directory, 'state.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def create_scrape_run(self, store, action='1', session=None, existing_notices=None) -> ScrapeRun:
+        if existing_notices is None:
+            existing_notices = store.keys()
+
+        return ScrapeRun(session or MockSession(), {}, store, existing_notices, {}, action, NullLogger(),
+                         MessageProvider(), TextFormatter(), state_file=self.state_file, request_delay=0)
+
+    def run_quietly(self, scrape_run: ScrapeRun, first_page: int, last_page_number: int,
+                    first_listing_page: ListingPage = None) -> None:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            scrape_run.run(first_page, last_page_number, first_listing_page)
+
+    def run_main_with_failing_store(self, argv: list) -> str:
+        output = io.StringIO()
+
+        with patch('main.load_store', side_effect=ValueError('torn output file')), \
+                patch('main.fetch_listing_page', return_value=ListingPage(1, [], 3)), \
+                patch('main.load_state', return_value={}), patch('main.Logger', NullLogger), \
+                patch('main.create_session'), contextlib.redirect_stdout(output):
+            main(argv + ['--output', self.output_file, '--sessions', self.state_file])
+
+        return output.getvalue()
+
+    # main
+
+    def test_main_reports_store_that_fails_to_load(self):
+        self.assertIn('torn output file', self.run_main_with_failing_store(['--action', 'update']))
+
+    def test_main_reports_store_that_fails_to_load_before_menu(self):
+        self.assertIn('torn output file', self.run_main_with_failing_store([]))
+
+    # parse_arguments
+
+    def test_parse_arguments_default(self):
+        self.assertFalse(parse_arguments([]).stream)
+
+    def test_parse_arguments_stream(self):
+        self.assertTrue(parse_arguments(['--stream']).stream)
+
+    def test_parse_arguments_retry_failed(self):
+        self.assertEqual(parse_arguments(['retry-failed']).command, 'retry-failed')
+        self.assertEqual(parse_arguments([]).command, 'scrape')
+
+    # ScrapeRun
+
+    def test_scrape_run_writes_documents_to_store(self):
+        store = JsonLinesStore(self.output_file)
+
+        self.run_quietly(self.create_scrape_run(store), 1, 2)
+        store.close()
+
+        numbers = [record['Notice publication number'] for record in iter_records(self.output_file)]
+
+        self.assertEqual(numbers, [f'{number}-2023' for number in range(25, 75)])
+
+        with open(self.state_file, 'r', encoding='utf-8') as state_file:
+            state = json.load(state_file)
+
+        self.assertEqual(state['last_processed_page'], 2)
+        self.assertEqual(state['anchor_notices'], [f'{number}-2023' for number in range(50, 75)])
+
+    def test_scrape_run_queues_failed_documents(self):
+        store = JsonLinesStore(self.output_file)
+        failure_queue = FailureQueue(os.path.join(self.directory, 'failed.json'))
+        scrape_run = ScrapeRun(FailingDocumentSession(30), {}, store, set(), {}, '1', NullLogger(), MessageProvider(),
+                               TextFormatter(), state_file=self.state_file, request_delay=0,
+                               failure_queue=failure_queue)
+
+        self.run_quietly(scrape_run, 1, 1)
+        store.close()
+
+        entry, = failure_queue.entries.values()
+
+        self.assertIn('NOTICE:30-2023', entry['url'])
+        self.assertEqual((entry['page'], entry['status'], entry['attempts']), (1, STATUS_REQUEST_FAILED, 1))
+        self.assertEqual(len(list(iter_records(self.output_file))), 24)
+
+    def test_scrape_run_queues_document_whose_request_raises(self):
+        store = JsonLinesStore(self.output_file)
+        failure_queue = FailureQueue(os.path.join(self.directory, 'failed.json'))
+        scrape_run = ScrapeRun(FailingDocumentSession(30, requests.ConnectionError('reset')), {}, store, set(), {},
+                               '1', NullLogger(), MessageProvider(), TextFormatter(), state_file=self.state_file,
+                               request_delay=0, failure_queue=failure_queue)
+
+        self.run_quietly(scrape_run, 1, 1)
+        store.close()
+
+        entry, = failure_queue.entries.values()
+
+        self.assertEqual(entry['status'], STATUS_REQUEST_FAILED)
+        self.assertEqual(len(list(iter_records(self.output_file))), 24)
+
+    def test_scrape_run_continues_after_empty_first_page(self):
+        store = JsonLinesStore(self.output_file)
+
+        self.run_quietly(self.create_scrape_run(store), 1, 2, ListingPage(1, [], 0))
+        store.close()
+
+        self.assertEqual(len(list(iter_records(self.output_file))), 25)
+
+    def test_scrape_run_skips_scrapped_documents(self):
+        store = JsonLinesStore(self.output_file)
+        self.run_quietly(self.create_scrape_run(store), 1, 1)
+        store.close()
+
+        store = JsonLinesStore(self.output_file)
+        self.run_quietly(self.create_scrape_run(store), 1, 2)
+        store.close()
+
+        self.assertEqual(len(list(iter_records(self.output_file))), 50)
+
+    def test_scrape_run_update_stops_at_scrapped_document(self):
+        store = JsonLinesStore(self.output_file)
+        self.run_quietly(self.create_scrape_run(store), 2, 2)
+        store.close()
+
+        store = JsonLinesStore(self.output_file)
+        self.run_quietly(self.create_scrape_run(store, action='2'), 1, 2)
+        store.close()
+
+        self.assertEqual(len(list(iter_records(self.output_file))), 50)
+
+    def test_scrape_run_reuses_first_listing_page_and_refreshes_last_page(self):
+        session = MockSession(last_page_number=3)
+        store = JsonLinesStore(self.output_file)
+        first_listing_page = parse_listing_page(1, listing_page_html(1, last_page_number=2))
+
+        self.run_quietly(self.create_scrape_run(store, session=session), 1, 2, first_listing_page)
+        store.close()
+
+        self.assertEqual(session.listing_requests, [2, 3])
+        self.assertEqual(len(list(iter_records(self.output_file))), 75)
+
+    def test_stream_mode_memory_stays_flat(self):
+        """
+            Scrape 2,000 documents in two runs through the store main opens, and check that the peak traced memory
+            of the second run, which loads the output of the first, does not grow with the amount already scraped,
+            apart from the notice number and content hash indexes.
+        """
+        pages_per_half = 40
+        index_budget_per_document = 512
+
+        # Leave the test runner's objects out of the collector's bookkeeping, so the parsed pages are collected at
+        # the same pace in both runs.
+        gc.collect()
+        gc.freeze()
+        tracemalloc.start()
+
+        try:
+            store, existing_notices = load_store(self.output_file)
+            scrape_run = self.create_scrape_run(store, existing_notices=existing_notices)
+            self.run_quietly(scrape_run, 1, pages_per_half)
+            store.close()
+            first_half_peak = tracemalloc.get_traced_memory()[1]
+
+            del scrape_run, store, existing_notices
+            gc.collect()
+            tracemalloc.reset_peak()
+
+            store, existing_notices = load_store(self.output_file)
+            scrape_run = self.create_scrape_run(store, existing_notices=existing_notices)
+            self.run_quietly(scrape_run, 1 + pages_per_half, 2 * pages_per_half)
+            store.close()
+            second_half_peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+            gc.unfreeze()
+
+        documents_per_half = pages_per_half * DOCUMENTS_PER_PAGE
+
+        self.assertEqual(len(scrape_run.existing_notices), 2 * documents_per_half)
+        self.assertLess(second_half_peak, first_half_peak + documents_per_half * index_budget_per_document)
@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+import main
+
+# Wall time of a fresh interpreter importing main and parsing the arguments of a cron run, before any network
+# activity, with room for slow CI machines.
+STARTUP_BUDGET = 0.5
+
+HEAVY_MODULES = ('bs4', 'requests', 'prettytable', 'dotenv', 'zstandard')
+
+
+class StartupTests(unittest.TestCase):
+    def run_python(self, code: str) -> str:
+        result = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(main.__file__)),
+                                capture_output=True, text=True, check=True)
+
+        return result.stdout.strip()
+
+    def test_heavy_modules_are_not_imported_at_startup(self):
+        loaded = self.run_python('import sys, main; main.parse_arguments(["--action", "update"]); '
+                                 f'print([name for name in {HEAVY_MODULES!r} if name in sys.modules])')
+
+        self.assertEqual(loaded, '[]')
+
+    def test_startup_within_budget(self):
+        timings = []
+
+        for _ in range(3):
+            start = time.perf_counter()
+            self.run_python('import main; main.parse_arguments(["--action", "update"])')
+            timings.append(time.perf_counter() - start)
+
+        self.assertLess(min(timings), STARTUP_BUDGET)
@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from data_handling import save_data, iter_records, JsonLinesStore
+from merge_data import merge, publication_date_key, RULE_LAST, RULE_NEWEST
+
+
+class MergeDataTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.first_file = os.path.join(self.directory, 'first.json')
+        self.second_file = os.path.join(self.directory, 'second.jsonl')
+        self.output_file = os.path.join(self.directory, 'merged.jsonl')
+
+        save_data([
+            {'Notice publication number': '1-2023', 'Publication date': '06/10/2023', 'Title': 'first A'},
+            {'Notice publication number': '2-2023', 'Publication date': '07/10/2023', 'Title': 'first B'},
+            {'Notice publication number': '2-2023', 'Publication date': '07/10/2023', 'Title': 'first B again'}
+        ], self.first_file)
+
+        store = JsonLinesStore(self.second_file)
+        store.write_many([
+            {'Notice publication number': '1-2023', 'Publication date': '05/10/2023', 'Title': 'second A'},
+            {'Notice publication number': '3-2023', 'Publication date': '08/10/2023', 'Title': 'second C'}
+        ])
+        store.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def merged_titles(self, filename: str) -> dict:
+        return {record['Notice publication number']: record['Title'] for record in iter_records(filename)}
+
+    # publication_date_key
+
+    def test_publication_date_key(self):
+        self.assertEqual(publication_date_key({'Publication date': '6/1/2023'}), ('2023', '01', '06'))
+        self.assertEqual(publication_date_key({}), ('', '', ''))
+
+    # merge
+
+    def test_merge_last_writer_wins(self):
+        read, written = merge([self.first_file, self.second_file], self.output_file, RULE_LAST, partitions=4)
+
+        self.assertEqual((read, written), (5, 3))
+        self.assertEqual(self.merged_titles(self.output_file),
+                         {'1-2023': 'second A', '2-2023': 'first B again', '3-2023': 'second C'})
+
+    def test_merge_newest_publication_wins(self):
+        merge([self.first_file, self.second_file], self.output_file, RULE_NEWEST, partitions=4)
+
+        self.assertEqual(self.merged_titles(self.output_file),
+                         {'1-2023': 'first A', '2-2023': 'first B again', '3-2023': 'second C'})
+
+    def test_merge_into_json_array(self):
+        output_file = os.path.join(self.directory, 'merged.json')
+
+        merge([self.second_file, self.first_file], output_file, partitions=1)
+
+        self.assertEqual(self.merged_titles(output_file),
+                         {'1-2023': 'first A', '2-2023': 'first B again', '3-2023': 'second C'})
+
+    def test_merge_can_overwrite_an_input(self):
+        merge([self.first_file, self.second_file], self.first_file)
+
+        self.assertEqual(len(list(iter_records(self.first_file))), 3)
+
+    def test_merge_with_unknown_rule(self):
+        with self.assertRaises(ValueError):
+            merge([self.first_file], self.output_file, 'oldest')
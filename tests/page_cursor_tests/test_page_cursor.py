@@ -0,0 +1,104 @@
+import unittest
+
+from data_scrapper import ListingRow
+from listing_page import ListingPage
+from page_cursor import notice_order, checkpoint, resume_page
+
+DOCUMENTS_PER_PAGE = 25
+
+
+class SearchResults:
+    """
+        A result list ordered from the newest to the oldest notice, served in pages of 25 like TED does.
+    """
+
+    def __init__(self, total: int):
+        self.notices = [f'{number}-2023' for number in range(total, 0, -1)]
+        self.requested_pages = []
+
+    def publish(self, count: int) -> None:
+        newest = notice_order(self.notices[0])[1]
+        self.notices = [f'{number}-2023' for number in range(newest + count, newest, -1)] + self.notices
+
+    def last_page_number(self) -> int:
+        return (len(self.notices) + DOCUMENTS_PER_PAGE - 1) // DOCUMENTS_PER_PAGE
+
+    def fetch_page(self, page: int) -> ListingPage:
+        self.requested_pages.append(page)
+        start = (page - 1) * DOCUMENTS_PER_PAGE
+        rows = [ListingRow(f'/{notice}', notice) for notice in self.notices[start:start + DOCUMENTS_PER_PAGE]]
+
+        return ListingPage(page, rows, self.last_page_number())
+
+    def page_of(self, notice_number: str) -> int:
+        return self.notices.index(notice_number) // DOCUMENTS_PER_PAGE + 1
+
+
+class PageCursorTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.results = SearchResults(100000)
+        self.state = {}
+
+        checkpoint(self.state, self.results.fetch_page(1000))
+        self.first_anchor = self.state['anchor_notices'][0]
+        self.results.requested_pages = []
+
+    # notice_order
+
+    def test_notice_order(self):
+        self.assertGreater(notice_order('2-2024'), notice_order('578920-2023'))
+        self.assertEqual(notice_order('invalid'), (0, 0))
+
+    # checkpoint
+
+    def test_checkpoint(self):
+        self.assertEqual(self.state['last_processed_page'], 1000)
+        self.assertEqual(len(self.state['anchor_notices']), DOCUMENTS_PER_PAGE)
+        self.assertEqual(self.state['last_page_number'], 4000)
+
+    # resume_page
+
+    def test_resume_page_without_anchors(self):
+        self.assertEqual(resume_page({'last_processed_page': 7}, self.results.fetch_page), (7, None))
+        self.assertEqual(self.results.requested_pages, [])
+
+    def test_resume_page_without_drift(self):
+        page, listing_page = resume_page(self.state, self.results.fetch_page)
+
+        self.assertEqual(page, 1000)
+        self.assertEqual(listing_page.page, 1000)
+        self.assertEqual(self.results.requested_pages, [1000])
+
+    def test_resume_page_with_whole_pages_of_new_notices(self):
+        self.results.publish(50 * DOCUMENTS_PER_PAGE)
+
+        page, listing_page = resume_page(self.state, self.results.fetch_page)
+
+        self.assertEqual(page, 1050)
+        self.assertEqual(listing_page.page, 1050)
+        self.assertEqual(self.results.requested_pages, [1000, 1050])
+
+    def test_resume_page_with_partial_page_drift(self):
+        self.results.publish(1234)
+
+        page, _ = resume_page(self.state, self.results.fetch_page)
+
+        self.assertEqual(page, self.results.page_of(self.first_anchor))
+        self.assertLessEqual(len(self.results.requested_pages), 4)
+
+    def test_resume_page_when_notices_were_removed(self):
+        del self.results.notices[:300]
+
+        page, _ = resume_page(self.state, self.results.fetch_page)
+
+        self.assertEqual(page, self.results.page_of(self.first_anchor))
+
+    def test_resume_page_when_fetch_fails(self):
+        self.assertEqual(resume_page(self.state, lambda page: None), (1000, None))
+
+    def test_resume_page_never_skips_past_anchors(self):
+        self.results.publish(777)
+
+        page, _ = resume_page(self.state, self.results.fetch_page, max_probes=2)
+
+        self.assertLessEqual(page, self.results.page_of(self.first_anchor))
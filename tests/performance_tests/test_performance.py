@@ -0,0 +1,372 @@
+import contextlib
+import gc
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+import unittest
+from typing import Callable, List, Optional
+
+from data_handling import open_store, write_records
+from data_scrapper import extract_data_from_table, parse_html, scrape_ted_data
+from helpers import MockResponse, NullLogger
+from listing_page import parse_listing_page
+from main import ScrapeRun, load_store
+from user_interface import MessageProvider
+from utils import TextFormatter
+
+FIXTURES_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Number of records of the synthetic corpora. The default keeps the suite quick; set PERFORMANCE_SCALES to e.g.
+# "1000,100000,1000000" to also run the larger ones.
+DEFAULT_SCALES = '1000'
+
+# When PERFORMANCE_RESULTS names a file, every measurement is appended to it as a JSON line, and a throughput more
+# than REGRESSION_TOLERANCE below the median of the last BASELINE_RUNS recorded runs fails the test. Fewer than
+# MINIMUM_BASELINE_RUNS runs are too noisy to compare with.
+REGRESSION_TOLERANCE = 0.3
+BASELINE_RUNS = 5
+MINIMUM_BASELINE_RUNS = 3
+
+DOCUMENTS_PER_PAGE = 25
+
+# Output files the persistence benchmarks run against: the default array, the stream mode file and a compressed one.
+OUTPUT_FILES = ('output.json', 'output.jsonl', 'output.jsonl.gz')
+
+# A compressed store holds up to a block of documents in memory before it writes them.
+BLOCK_ALLOWANCE = 8 * 1024 * 1024
+
+# Budgets, with several times the headroom of a typical laptop so that only real regressions fail.
+BUDGETS = {
+    'parse_listing_page': {'min_throughput': 25, 'max_p95': 0.05},
+    'extract_data_from_table': {'min_throughput': 500, 'max_p95': 0.01},
+    'scrape_ted_data': {'min_throughput': 75, 'max_p95': 0.03},
+    'write_records output.json': {'min_throughput': 1000, 'max_peak_per_record': 1024},
+    'write_records output.jsonl': {'min_throughput': 2000, 'max_peak_per_record': 1024},
+    'write_records output.jsonl.gz': {'min_throughput': 2000, 'max_peak_per_record': 1024,
+                                      'peak_allowance': BLOCK_ALLOWANCE},
+    # The array is rewritten at every checkpoint, so writing to it slows down as it grows.
+    'store_write output.json': {'min_throughput': 50, 'max_peak_per_record': 4096},
+    'store_write output.jsonl': {'min_throughput': 500, 'max_peak_per_record': 1024},
+    'store_write output.jsonl.gz': {'min_throughput': 400, 'max_peak_per_record': 2048,
+                                    'peak_allowance': BLOCK_ALLOWANCE},
+    # The array store keeps the documents in memory; the others only their keys.
+    'load_store output.json': {'min_throughput': 4000, 'max_peak_per_record': 16 * 1024},
+    'load_store output.jsonl': {'min_throughput': 3000, 'max_peak_per_record': 1024},
+    'load_store output.jsonl.gz': {'min_throughput': 3000, 'max_peak_per_record': 2048},
+    'page_loop': {'min_throughput': 50, 'max_p95': 0.75},
+    'page_loop_memory': {'min_throughput': 4, 'max_peak': 16 * 1024 * 1024}
+}
+
+# Pages walked under tracemalloc, which slows parsing down several times, to measure the peak memory of the loop, on
+# top of an output file that already holds MEMORY_EXISTING_RECORDS documents.
+MEMORY_PAGES = 4
+MEMORY_EXISTING_RECORDS = 10000
+
+
+def read_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIRECTORY, name), 'r', encoding='utf-8') as fixture:
+        return fixture.read()
+
+
+def scales() -> List[int]:
+    return [int(scale) for scale in os.getenv('PERFORMANCE_SCALES', DEFAULT_SCALES).split(',') if scale.strip()]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def synthetic_record(number: int) -> dict:
+    return {
+        'URL': f'https://ted.europa.eu/udl?uri=TED:NOTICE:{number}-2023:TEXT:EN:HTML&src=0',
+        'Title': 'Germany-Munich: Construction work',
+        'Notice publication number': f'{number}-2023',
+        'Publication date': f'{1 + number % 28:02d}/10/2023',
+        'OJ S issue number': '193/2023',
+        'Town/city of the buyer': 'Munich',
+        'Official name of the buyer': f'Buyer {number % 1000}',
+        'Original language': 'German',
+        'Country of the buyer': ('DE', 'PL', 'FR', 'ES', 'IT')[number % 5],
+        'Type of buyer': '3 - Regional or local authority',
+        'EU institution/agency': '-',
+        'Document sent': '04/10/2023',
+        'Type of contract': '1 - Works',
+        'Type of procedure': '1 - Open procedure',
+        'Notice type': '3 - Contract notice',
+        'Regulation': '5 - European Union',
+        'Type of bid': '9 - Not applicable',
+        'Award criteria': '2 - The most economic tender',
+        'Common procurement vocabulary (CPV)': f'{45000000 + number % 1000 * 1000} - Construction work',
+        'Place of performance (NUTS)': 'DE212 - München, Kreisfreie Stadt',
+        'Internet address (URL)': 'https://www.muenchen.de',
+        'Legal basis': '32014L0024 - Directive 2014/24/EU'
+    }
+
+
+class FixtureSession:
+    """
+        Serves the stored listing and document fixtures, with the notice numbers of each listing page shifted so
+        that every page lists different documents.
+    """
+
+    def __init__(self, listing_html: str, document_html: str, last_page_number: int):
+        self.listing_html = listing_html
+        self.document_html = document_html
+        self.last_page_number = last_page_number
+
+    def get(self, url, cookies=None, allow_redirects=True, params=None):
+        if params:
+            page = params['page']
+            html = re.sub(r'(\d+)-2023', lambda match: f'{int(match.group(1)) + page * 100}-2023', self.listing_html)
+            return MockResponse(html.replace('page=200', f'page={self.last_page_number}'))
+
+        return MockResponse(self.document_html)
+
+
+class TimedScrapeRun(ScrapeRun):
+    """
+        Records how long every listing page takes, documents included.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies: List[float] = []
+
+    def process_page(self, listing_page) -> bool:
+        start = time.perf_counter()
+
+        try:
+            return super().process_page(listing_page)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+
+class Measurement:
+    def __init__(self, operations: int, seconds: float, latencies: Optional[List[float]] = None, peak: int = 0):
+        self.operations = operations
+        self.seconds = seconds
+        self.latencies = latencies or []
+        self.peak = peak
+
+    @property
+    def throughput(self) -> float:
+        return self.operations / self.seconds if self.seconds else float('inf')
+
+    @property
+    def p95(self) -> float:
+        return percentile(self.latencies, 0.95) if self.latencies else 0.0
+
+
+def measure_latencies(operation: Callable[[], object], repeat: int) -> Measurement:
+    latencies = []
+    start = time.perf_counter()
+
+    for _ in range(repeat):
+        operation_start = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - operation_start)
+
+    return Measurement(repeat, time.perf_counter() - start, latencies)
+
+
+def measure_peak_memory(operation: Callable[[], object], operations: int) -> Measurement:
+    gc.collect()
+    tracemalloc.start()
+
+    try:
+        start = time.perf_counter()
+        operation()
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return Measurement(operations, seconds, peak=peak)
+
+
+class PerformanceTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.listing_html = read_fixture('listing_page.html')
+        cls.document_html = read_fixture('document_page.html')
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def previous_throughputs(self, results_file: str, name: str, scale: int) -> List[float]:
+        try:
+            with open(results_file, 'r', encoding='utf-8') as results:
+                entries = [json.loads(line) for line in results if line.strip()]
+        except FileNotFoundError:
+            return []
+
+        return [entry['throughput'] for entry in entries if entry['name'] == name and entry['scale'] == scale]
+
+    def check(self, name: str, scale: int, measurement: Measurement) -> None:
+        """
+            Assert the budgets of a benchmark and, if results are recorded, compare with the previous runs.
+        """
+        budget = BUDGETS[name]
+
+        self.assertGreaterEqual(measurement.throughput, budget['min_throughput'], f'{name} throughput at {scale}')
+
+        if 'max_p95' in budget:
+            self.assertLessEqual(measurement.p95, budget['max_p95'], f'{name} p95 latency at {scale}')
+
+        if 'max_peak' in budget:
+            self.assertLessEqual(measurement.peak, budget['max_peak'], f'{name} peak memory at {scale}')
+
+        if 'max_peak_per_record' in budget:
+            self.assertLessEqual(max(0, measurement.peak - budget.get('peak_allowance', 0)) / scale,
+                                 budget['max_peak_per_record'], f'{name} peak memory per record at {scale}')
+
+        results_file = os.getenv('PERFORMANCE_RESULTS')
+
+        if not results_file:
+            return
+
+        baseline = self.previous_throughputs(results_file, name, scale)[-BASELINE_RUNS:]
+
+        with open(results_file, 'a', encoding='utf-8') as results:
+            results.write(json.dumps({
+                'time': int(time.time()),
+                'name': name,
+                'scale': scale,
+                'throughput': measurement.throughput,
+                'p95': measurement.p95,
+                'peak': measurement.peak,
+                'python': platform.python_version()
+            }) + '\n')
+
+        if len(baseline) >= MINIMUM_BASELINE_RUNS:
+            self.assertGreaterEqual(measurement.throughput, statistics.median(baseline) * (1 - REGRESSION_TOLERANCE),
+                                    f'{name} throughput at {scale} regressed against the recorded runs')
+
+    # Parsing
+
+    def test_parse_listing_page(self):
+        for scale in scales():
+            with self.subTest(scale=scale):
+                measurement = measure_latencies(lambda: parse_listing_page(1, self.listing_html),
+                                                max(1, scale // DOCUMENTS_PER_PAGE))
+
+                self.check('parse_listing_page', scale, measurement)
+
+    def test_extract_data_from_table(self):
+        soup = parse_html(self.document_html)
+
+        for scale in scales():
+            with self.subTest(scale=scale):
+                measurement = measure_latencies(lambda: extract_data_from_table(soup), scale)
+
+                self.check('extract_data_from_table', scale, measurement)
+
+        soup.decompose()
+
+    def test_scrape_ted_data(self):
+        for scale in scales():
+            with self.subTest(scale=scale):
+                measurement = measure_latencies(lambda: scrape_ted_data(self.document_html, 'url'), scale)
+
+                self.check('scrape_ted_data', scale, measurement)
+
+    # Persistence
+
+    def write_through_store(self, filename: str, scale: int) -> None:
+        """
+            Write the records through the store stack the scraper uses: journal, query index and change tracking.
+        """
+        store = open_store(filename, index=True, journal=True)
+
+        try:
+            for number in range(scale):
+                store.write(synthetic_record(number))
+        finally:
+            store.close()
+
+    def test_write_records(self):
+        for name in OUTPUT_FILES:
+            for scale in scales():
+                with self.subTest(output=name, scale=scale):
+                    output_file = os.path.join(self.directory, f'{scale}-{name}')
+                    records = (synthetic_record(number) for number in range(scale))
+
+                    measurement = measure_peak_memory(lambda: write_records(records, output_file), scale)
+                    self.check(f'write_records {name}', scale, measurement)
+
+    def test_store_write_and_load(self):
+        for name in OUTPUT_FILES:
+            for scale in scales():
+                with self.subTest(output=name, scale=scale):
+                    output_file = os.path.join(self.directory, f'{scale}-{name}')
+
+                    measurement = measure_peak_memory(lambda: self.write_through_store(output_file, scale), scale)
+                    self.check(f'store_write {name}', scale, measurement)
+
+                    def load() -> None:
+                        store, existing_notices = load_store(output_file)
+                        store.close()
+
+                        self.assertEqual(len(existing_notices), scale)
+
+                    measurement = measure_peak_memory(load, scale)
+                    self.check(f'load_store {name}', scale, measurement)
+
+    # Page loop
+
+    def scrape_run(self, pages: int, output_file: str) -> TimedScrapeRun:
+        """
+            A run on the store main opens for the output file, as the scraper itself would start it.
+        """
+        session = FixtureSession(self.listing_html, self.document_html, pages)
+        store, existing_notices = load_store(output_file)
+
+        return TimedScrapeRun(session, {}, store, existing_notices, {}, '1', NullLogger(), MessageProvider(),
+                              TextFormatter(), state_file=os.path.join(self.directory, 'state.json'), request_delay=0)
+
+    def run_pages(self, scrape_run: TimedScrapeRun, pages: int, existing: int = 0) -> None:
+        try:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                scrape_run.run(1, pages)
+        finally:
+            scrape_run.store.close()
+
+        self.assertEqual(len(scrape_run.existing_notices), existing + pages * DOCUMENTS_PER_PAGE)
+
+    def test_page_loop(self):
+        for scale in scales():
+            with self.subTest(scale=scale):
+                pages = max(1, scale // DOCUMENTS_PER_PAGE)
+                scrape_run = self.scrape_run(pages, os.path.join(self.directory, f'output-{scale}.json'))
+
+                start = time.perf_counter()
+                self.run_pages(scrape_run, pages)
+                seconds = time.perf_counter() - start
+
+                self.check('page_loop', scale, Measurement(pages * DOCUMENTS_PER_PAGE, seconds, scrape_run.latencies))
+
+    def test_page_loop_memory(self):
+        """
+            A stream mode run on top of existing documents. Opening the store is measured too: its keys and query
+            index must not grow with the existing documents beyond the set of notice numbers.
+        """
+        output_file = os.path.join(self.directory, 'output.jsonl')
+        write_records((synthetic_record(number) for number in range(MEMORY_EXISTING_RECORDS)), output_file)
+
+        def run() -> None:
+            self.run_pages(self.scrape_run(MEMORY_PAGES, output_file), MEMORY_PAGES, MEMORY_EXISTING_RECORDS)
+
+        measurement = measure_peak_memory(run, MEMORY_PAGES * DOCUMENTS_PER_PAGE)
+
+        self.check('page_loop_memory', MEMORY_PAGES * DOCUMENTS_PER_PAGE, measurement)
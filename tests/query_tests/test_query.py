@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from data_handling import open_store, save_data, corpus_index_filename
+from query import query
+
+RECORDS = [
+    {'URL': 'https://ted.europa.eu/udl?uri=TED:NOTICE:1-2023:TEXT:EN:HTML', 'Country of the buyer': 'DE',
+     'Common procurement vocabulary (CPV)': '45000000 - Construction work', 'Publication date': '06/10/2023'},
+    {'URL': 'https://ted.europa.eu/udl?uri=TED:NOTICE:2-2023:TEXT:EN:HTML', 'Country of the buyer': 'PL',
+     'Common procurement vocabulary (CPV)': '45210000 - Building construction work', 'Publication date': '07/10/2023'},
+    {'URL': 'https://ted.europa.eu/udl?uri=TED:NOTICE:3-2023:TEXT:EN:HTML', 'Country of the buyer': 'DE',
+     'Common procurement vocabulary (CPV)': '33600000 - Pharmaceutical products', 'Publication date': '08/10/2023'}
+]
+
+
+class QueryTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_store(self, filename: str) -> str:
+        path = os.path.join(self.directory, filename)
+        store = open_store(path, index=True)
+        store.write_many(RECORDS)
+        store.close()
+
+        return path
+
+    def queried_dates(self, path: str, **criteria) -> list:
+        return [record['Publication date'] for record in query(path, **criteria)]
+
+    def test_query_json_lines_store_by_offset(self):
+        path = self.write_store('output.jsonl')
+
+        self.assertTrue(os.path.exists(corpus_index_filename(path)))
+        self.assertEqual(self.queried_dates(path, country='DE', cpv='45'), ['06/10/2023'])
+        self.assertEqual(self.queried_dates(path, cpv='45'), ['07/10/2023', '06/10/2023'])
+
+    def test_query_json_array_store_in_file_order(self):
+        path = self.write_store('output.json')
+
+        self.assertEqual(self.queried_dates(path, country='DE'), ['06/10/2023', '08/10/2023'])
+
+    def test_query_compressed_store(self):
+        path = self.write_store('output.jsonl.gz')
+
+        self.assertEqual(self.queried_dates(path, date_from='07/10/2023', limit=1), ['08/10/2023'])
+
+    def test_query_rebuilds_stale_index(self):
+        path = os.path.join(self.directory, 'output.json')
+        save_data(RECORDS, path)
+
+        self.assertEqual(self.queried_dates(path, cpv='452'), ['07/10/2023'])
+        self.assertTrue(os.path.exists(corpus_index_filename(path)))
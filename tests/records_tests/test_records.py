@@ -0,0 +1,84 @@
+import json
+import pickle
+import sys
+import unittest
+
+from records import Record, FIELDS, encode_record
+
+
+class RecordsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pairs = [
+            ('URL', 'url1'),
+            ('Country of the buyer', 'DE'),
+            ('Common procurement vocabulary (CPV)', '45000000 - Construction work'),
+            ('Custom key', 'Custom value')
+        ]
+
+    # from_pairs
+
+    def test_from_pairs_behaves_like_dict(self):
+        record = Record.from_pairs(self.pairs)
+
+        self.assertEqual(record, dict(self.pairs))
+        self.assertEqual(record['URL'], 'url1')
+        self.assertEqual(record.get('Title'), None)
+        self.assertIn('Custom key', record)
+        self.assertNotIn('Title', record)
+        self.assertEqual(len(record), 4)
+
+    def test_iteration_follows_field_registry(self):
+        record = Record.from_pairs(reversed(self.pairs))
+
+        self.assertEqual(list(record), ['URL', 'Country of the buyer', 'Common procurement vocabulary (CPV)',
+                                        'Custom key'])
+
+    def test_missing_key_raises_key_error(self):
+        record = Record.from_pairs(self.pairs)
+
+        with self.assertRaises(KeyError):
+            record['Title']
+
+        with self.assertRaises(KeyError):
+            record['Unknown key']
+
+    def test_repetitive_values_are_interned(self):
+        first = Record.from_pairs([('Country of the buyer', ''.join(['D', 'E']))])
+        second = Record.from_pairs([('Country of the buyer', ''.join(['D', 'E']))])
+
+        self.assertIs(first['Country of the buyer'], second['Country of the buyer'])
+
+    def test_record_is_smaller_than_dict(self):
+        data = {field: 'value' for field in FIELDS}
+        record = Record.from_pairs(data.items())
+
+        record_size = sys.getsizeof(record) + sys.getsizeof(record._values)
+
+        self.assertLess(record_size * 2, sys.getsizeof(data))
+
+    # updated
+
+    def test_updated_returns_new_record(self):
+        record = Record.from_pairs(self.pairs)
+
+        updated = record.updated([('URL', 'url2'), ('Title', 'Title')])
+
+        self.assertEqual(record['URL'], 'url1')
+        self.assertEqual(updated['URL'], 'url2')
+        self.assertEqual(updated['Title'], 'Title')
+
+    # serialization
+
+    def test_encode_record_with_json(self):
+        record = Record.from_pairs(self.pairs)
+
+        self.assertEqual(json.loads(json.dumps([record], default=encode_record)), [dict(self.pairs)])
+
+    def test_encode_record_with_unsupported_type(self):
+        with self.assertRaises(TypeError):
+            encode_record(object())
+
+    def test_pickle_round_trip(self):
+        record = Record.from_pairs(self.pairs)
+
+        self.assertEqual(pickle.loads(pickle.dumps(record)), record)
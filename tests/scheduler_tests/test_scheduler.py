@@ -0,0 +1,207 @@
+import contextlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+
+from data_handling import JsonLinesStore, iter_records
+from helpers import DOCUMENT_PAGE, LISTING_ROW, MockResponse, NullLogger
+from scheduler import Scheduler, Search, RateLimiter, search_priority
+from user_interface import MessageProvider
+from utils import TextFormatter
+
+DOCUMENTS_PER_PAGE = 25
+
+
+class SearchSession:
+    """
+        Serves a single listing page per search (selected by the "q" parameter) with the given notice numbers,
+        newest first, and records which documents were requested.
+    """
+
+    def __init__(self, listings: dict):
+        self.listings = listings
+        self.document_requests = []
+        self.lock = threading.Lock()
+
+    def get(self, url, cookies=None, allow_redirects=True, params=None):
+        if params:
+            rows = ''.join(LISTING_ROW.format(number=number) for number in self.listings[params['q']])
+            return MockResponse(f'<html><body><table>{rows}</table></body></html>')
+
+        number = re.search(r'NOTICE:(\d+)-2023', url).group(1)
+
+        with self.lock:
+            self.document_requests.append(int(number))
+
+        return MockResponse(DOCUMENT_PAGE.format(number=number))
+
+    def close(self):
+        pass
+
+
+class PagedSearchSession(SearchSession):
+    """
+        Serves the notices of every search over listing pages of DOCUMENTS_PER_PAGE rows, with a pager.
+    """
+
+    def get(self, url, cookies=None, allow_redirects=True, params=None):
+        if not params:
+            return super().get(url, cookies, allow_redirects, params)
+
+        notices = self.listings[params['q']]
+        first = (params['page'] - 1) * DOCUMENTS_PER_PAGE
+        rows = ''.join(LISTING_ROW.format(number=number) for number in notices[first:first + DOCUMENTS_PER_PAGE])
+        last_page_number = -(-len(notices) // DOCUMENTS_PER_PAGE)
+        pager = f'<div class="page-icon pagelast"><a href="?page={last_page_number}">last</a></div>'
+
+        return MockResponse(f'<html><body><table>{rows}</table>{pager}</body></html>')
+
+
+class FailingSearchSession(SearchSession):
+    """
+        Raises a ConnectionError for the listing pages of the given search.
+    """
+
+    def __init__(self, listings: dict, failing: str):
+        super().__init__(listings)
+        self.failing = failing
+
+    def get(self, url, cookies=None, allow_redirects=True, params=None):
+        if params and params['q'] == self.failing:
+            raise ConnectionError('Connection reset by peer')
+
+        return super().get(url, cookies, allow_redirects, params)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class SchedulerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.output_file = os.path.join(self.directory, 'output.jsonl')
+        self.state_file = os.path.join(self.directory, 'search_state.json')
+        self.clock = FakeClock()
+        self.searches = [Search('a', {'q': 'a'}, interval=60), Search('b', {'q': 'b'}, interval=60)]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def create_scheduler(self, session, workers=1) -> Scheduler:
+        return Scheduler(self.searches, session, {}, JsonLinesStore(self.output_file), NullLogger(),
+                         MessageProvider(), TextFormatter(), RateLimiter(1000), workers, self.state_file,
+                         clock=self.clock)
+
+    def run_once(self, scheduler: Scheduler) -> dict:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            return scheduler.run_once()
+
+    def stored_notices(self) -> list:
+        return sorted(record['Notice publication number'] for record in iter_records(self.output_file))
+
+    # search_priority
+
+    def test_search_priority(self):
+        search = Search('a', {}, interval=60)
+
+        self.assertEqual(search_priority(search, {}, 1000), float('inf'))
+        self.assertIsNone(search_priority(search, {'last_run': 970}, 1000))
+        self.assertLess(search_priority(search, {'last_run': 880, 'volume': 0}, 1000),
+                        search_priority(search, {'last_run': 880, 'volume': 5}, 1000))
+        self.assertLess(search_priority(search, {'last_run': 930, 'volume': 1}, 1000),
+                        search_priority(search, {'last_run': 880, 'volume': 1}, 1000))
+
+    # RateLimiter
+
+    def test_rate_limiter_spaces_requests(self):
+        rate_limiter = RateLimiter(2, self.clock, self.clock.sleep)
+
+        for _ in range(3):
+            rate_limiter.wait()
+
+        self.assertEqual(self.clock.now, 1001.0)
+
+    # Scheduler
+
+    def test_overlapping_searches_fetch_each_notice_once(self):
+        session = SearchSession({'a': [5, 4, 3], 'b': [4, 2]})
+
+        new_documents = self.run_once(self.create_scheduler(session))
+
+        self.assertEqual(new_documents, {'a': 3, 'b': 1})
+        self.assertEqual(sorted(session.document_requests), [2, 3, 4, 5])
+        self.assertEqual(self.stored_notices(), ['2-2023', '3-2023', '4-2023', '5-2023'])
+
+    def test_concurrent_searches_share_the_dedupe_index(self):
+        session = SearchSession({'a': list(range(40, 0, -1)), 'b': list(range(45, 5, -2))})
+
+        new_documents = self.run_once(self.create_scheduler(session, workers=2))
+
+        self.assertEqual(sum(new_documents.values()), 43)
+        self.assertEqual(len(session.document_requests), 43)
+        self.assertEqual(len(self.stored_notices()), 43)
+
+    def test_refresh_stops_at_the_newest_notice_of_the_previous_run(self):
+        session = SearchSession({'a': [5, 4, 3], 'b': [2]})
+        self.run_once(self.create_scheduler(session))
+
+        session.listings['a'] = [7, 6, 5, 4, 3]
+        session.document_requests.clear()
+        self.clock.now += 30
+
+        self.assertEqual(self.run_once(self.create_scheduler(session)), {})
+
+        self.clock.now += 60
+
+        self.assertEqual(self.run_once(self.create_scheduler(session)), {'a': 2, 'b': 0})
+        self.assertEqual(sorted(session.document_requests), [6, 7])
+
+    def test_failing_search_does_not_stop_the_others(self):
+        session = FailingSearchSession({'a': [5, 4], 'b': [3]}, 'a')
+        scheduler = self.create_scheduler(session, workers=2)
+
+        self.assertEqual(self.run_once(scheduler), {'b': 1})
+        self.assertNotIn('last_run', scheduler.search_state(self.searches[0]))
+        self.assertEqual(self.stored_notices(), ['3-2023'])
+
+        self.assertEqual(scheduler.due_searches(), [])
+        self.assertEqual(min(scheduler.seconds_until_due(), key=lambda entry: entry[0])[0], 60)
+
+        session.failing = None
+        self.clock.now += 60
+
+        self.assertEqual(self.run_once(scheduler), {'a': 2, 'b': 0})
+
+    def test_refresh_cut_short_by_max_pages_resumes_its_backlog(self):
+        self.searches = [Search('a', {'q': 'a'}, interval=60, max_pages=2)]
+        session = PagedSearchSession({'a': list(range(100, 0, -1))})
+
+        self.assertEqual(self.run_once(self.create_scheduler(session)), {'a': 50})
+
+        session.listings['a'] = list(range(110, 0, -1))
+        self.clock.now += 60
+
+        self.assertEqual(self.run_once(self.create_scheduler(session)), {'a': 25})
+
+        self.clock.now += 60
+
+        self.assertEqual(self.run_once(self.create_scheduler(session)), {'a': 35})
+        self.assertEqual(len(self.stored_notices()), 110)
+        self.assertEqual(sorted(session.document_requests), list(range(1, 111)))
+
+        session.listings['a'] = list(range(115, 0, -1))
+        self.clock.now += 60
+
+        self.assertEqual(self.run_once(self.create_scheduler(session)), {'a': 5})
+        self.assertEqual(len(session.document_requests), 115)
@@ -0,0 +1,206 @@
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch, Mock
+
+import requests_mock
+
+from data_scrapper import SEARCH_URL
+from listing_page import fetch_listing_page, parse_listing_page
+from main import ScrapeRun
+from scheduler import RateLimitedSession, RateLimiter
+from session_pool import SessionPool, load_cookie_sets, create_session_pool
+from user_interface import MessageProvider
+from utils import fetch_response, TextFormatter
+
+LISTING_HTML = """
+<table>
+    <tr><td class="nowrap"><a href="/udl?uri=TED:NOTICE:1-2023:TEXT:EN:HTML&src=0">1-2023</a></td></tr>
+</table>
+"""
+
+
+class ExpiringServer:
+    """
+        A stand-in for TED that redirects requests of expired sessions to the home page and answers an empty
+        listing for sessions that are "soft" expired.
+    """
+
+    def __init__(self):
+        self.expired = set()
+        self.soft_expired = set()
+        self.requests = []
+
+    def __call__(self, request, context):
+        session_id = request.headers.get('Cookie', '').split('JSESSIONID=')[-1].split(';')[0]
+        self.requests.append(session_id)
+
+        if session_id in self.expired:
+            context.status_code = 302
+            context.headers['Location'] = '/TED/main/HomePage.do'
+            return ''
+
+        if session_id in self.soft_expired:
+            return '<html><body></body></html>'
+
+        return LISTING_HTML
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class SessionPoolTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cookie_sets = [{'JSESSIONID': 'first', 'ln_pref': 'en'}, {'JSESSIONID': 'second', 'ln_pref': 'en'}]
+        self.clock = FakeClock()
+        self.pool = SessionPool(self.cookie_sets, quarantine_seconds=60, clock=self.clock)
+        self.server = ExpiringServer()
+
+    # load_cookie_sets
+
+    def test_load_cookie_sets(self):
+        directory = tempfile.mkdtemp()
+        filename = os.path.join(directory, 'sessions.json')
+
+        try:
+            with open(filename, 'w', encoding='utf-8') as sessions_file:
+                json.dump(self.cookie_sets, sessions_file)
+
+            self.assertEqual(load_cookie_sets(filename), self.cookie_sets)
+            self.assertEqual(load_cookie_sets(os.path.join(directory, 'missing.json')), [])
+        finally:
+            shutil.rmtree(directory)
+
+    @patch('session_pool.get_cookies')
+    def test_create_session_pool_includes_environment_cookies(self, mock_get_cookies):
+        mock_get_cookies.return_value = {'JSESSIONID': 'from-env', 'ln_pref': 'en'}
+
+        pool = create_session_pool('missing-sessions.json')
+
+        self.assertEqual([pooled.cookies['JSESSIONID'] for pooled in pool.sessions], ['from-env'])
+
+    # acquire
+
+    def test_acquire_spreads_workers_over_sessions(self):
+        first = self.pool.acquire('worker-1')
+        second = self.pool.acquire('worker-2')
+
+        self.assertIsNot(first, second)
+        self.assertIs(self.pool.acquire('worker-1'), first)
+
+    def test_acquire_skips_quarantined_session_until_it_is_released(self):
+        first = self.pool.acquire('worker')
+        self.pool.report_expired(first)
+
+        self.assertIsNot(self.pool.acquire('worker'), first)
+
+        self.pool.report_expired(self.pool.acquire('worker'))
+        self.assertIsNone(self.pool.acquire('worker'))
+
+        self.clock.now = 61
+        self.assertIsNotNone(self.pool.acquire('worker'))
+
+    def test_quarantine_grows_with_every_expiry(self):
+        first = self.pool.sessions[0]
+
+        self.pool.report_expired(first)
+        self.pool.report_expired(first)
+
+        self.assertEqual(first.quarantined_until, 120)
+
+    def test_acquire_asks_provider_when_no_session_is_healthy(self):
+        pool = SessionPool([{'JSESSIONID': 'old'}], provider=lambda: [{'JSESSIONID': 'fresh'}], clock=self.clock)
+        pool.report_expired(pool.acquire('worker'))
+
+        self.assertEqual(pool.acquire('worker').cookies['JSESSIONID'], 'fresh')
+
+    # get
+
+    def test_get_rotates_on_expired_session(self):
+        self.server.expired.add('first')
+
+        with requests_mock.Mocker() as m:
+            m.get(SEARCH_URL, text=self.server)
+
+            response = fetch_response(self.pool, SEARCH_URL, {}, {'page': 1})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.requests, ['first', 'second'])
+        self.assertFalse(self.pool.is_healthy(self.pool.sessions[0]))
+
+    def test_get_without_healthy_sessions(self):
+        self.server.expired.update({'first', 'second'})
+
+        with requests_mock.Mocker() as m:
+            m.get(SEARCH_URL, text=self.server)
+
+            self.assertIsNone(fetch_response(self.pool, SEARCH_URL, {}))
+            self.assertIsNone(fetch_listing_page(self.pool, {}, 1))
+
+    def test_parallel_workers_keep_fetching_while_a_session_expires(self):
+        self.server.expired.add('first')
+        results = []
+
+        def worker():
+            listing_page = fetch_listing_page(self.pool, {}, 1)
+            results.append(listing_page is not None and len(listing_page.rows))
+
+        with requests_mock.Mocker() as m:
+            m.get(SEARCH_URL, text=self.server)
+
+            threads = [threading.Thread(target=worker) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(results, [1, 1, 1, 1])
+
+
+class ScrapeRunSessionPoolTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pool = SessionPool([{'JSESSIONID': 'first'}, {'JSESSIONID': 'second'}])
+        self.server = ExpiringServer()
+
+    def refetch(self, session=None):
+        scrape_run = ScrapeRun(session or self.pool, {}, None, set(), {}, '1', Mock(), MessageProvider(),
+                               TextFormatter())
+        self.pool.acquire()
+
+        with requests_mock.Mocker() as m, open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            m.get(SEARCH_URL, text=self.server)
+
+            return scrape_run.refetch_with_another_session(parse_listing_page(1, ''))
+
+    def test_empty_listing_quarantines_session_when_another_one_gets_documents(self):
+        self.server.soft_expired.add('first')
+
+        listing_page = self.refetch()
+
+        self.assertEqual(len(listing_page.rows), 1)
+        self.assertFalse(self.pool.is_healthy(self.pool.sessions[0]))
+
+    def test_empty_listing_restores_session_when_the_page_is_really_empty(self):
+        self.server.soft_expired.update({'first', 'second'})
+
+        listing_page = self.refetch()
+
+        self.assertEqual(listing_page.rows, [])
+        self.assertTrue(self.pool.is_healthy(self.pool.sessions[0]))
+
+    def test_empty_listing_rotates_session_behind_rate_limiter(self):
+        self.server.soft_expired.add('first')
+
+        listing_page = self.refetch(RateLimitedSession(self.pool, RateLimiter(1000)))
+
+        self.assertEqual(len(listing_page.rows), 1)
+        self.assertFalse(self.pool.is_healthy(self.pool.sessions[0]))
@@ -5,7 +5,7 @@ import requests_mock
 
 from utils import action_is_update, update_has_reach_last_scrapped_url, url_is_scrapped, state_file_exists, \
     time_left_until_all_data_is_fetched, get_current_time, fetch_response, get_cookies, create_session, Logger, \
-    TextFormatter
+    TextFormatter, action_is_listing_only, notice_number_from_href
 
 
 class UtilsTests(unittest.TestCase):
@@ -217,3 +217,21 @@ class UtilsTests(unittest.TestCase):
         self.assertFalse(action_is_update('1'))
         self.assertFalse(action_is_update('3'))
         self.assertFalse(action_is_update('update'))
+
+    # action_is_listing_only
+
+    def test_action_is_listing_only_with_matching_action(self):
+        self.assertTrue(action_is_listing_only('3'))
+
+    def test_action_is_listing_only_with_non_matching_action(self):
+        self.assertFalse(action_is_listing_only('1'))
+        self.assertFalse(action_is_listing_only('2'))
+
+    # notice_number_from_href
+
+    def test_notice_number_from_href_with_notice_uri(self):
+        href = '/udl?uri=TED:NOTICE:578920-2023:TEXT:EN:HTML&src=0'
+        self.assertEqual(notice_number_from_href(href), '578920-2023')
+
+    def test_notice_number_from_href_without_notice_number(self):
+        self.assertIsNone(notice_number_from_href('link1'))
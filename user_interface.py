@@ -1,5 +1,9 @@
-from prettytable import PrettyTable
-from utils import state_file_exists, time_left_until_all_data_is_fetched, get_current_time, TextFormatter
+from typing import TYPE_CHECKING
+
+from utils import time_left_until_all_data_is_fetched, get_current_time, TextFormatter
+
+if TYPE_CHECKING:
+    from prettytable import PrettyTable
 
 
 class MessageProvider:
@@ -26,14 +30,39 @@ class MessageProvider:
     def message_successful_data_save(filename: str) -> str:
         return f'Data saved successfully to {filename}!'
 
+    @staticmethod
+    def message_listing_page_saved(page: int, new_rows: int, filename: str) -> str:
+        return f'Saved {new_rows} new listing rows from page {page} to {filename}'
+
     @staticmethod
     def message_url_is_scrapped(page: int, document_main_url: str) -> str:
         return f'Continuing to next URL on page {page}, because this one is already scrapped: {document_main_url}'
 
+    @staticmethod
+    def message_recovered_failed_document(data_url: str) -> str:
+        return f'Recovered previously failed document {data_url}'
+
+    @staticmethod
+    def message_retried_failed_documents(recovered: int, remaining: int) -> str:
+        return f'Recovered {recovered} failed documents, {remaining} left to retry'
+
+    @staticmethod
+    def message_no_failed_documents() -> str:
+        return 'There are no failed documents to retry.'
+
+    @staticmethod
+    def message_search_finished(name: str, new_documents: int) -> str:
+        return f'Search "{name}" is up to date, {new_documents} new documents'
+
     # Fail
     @staticmethod
     def message_no_data_page(page: int, document_main_url: str) -> str:
-        return f'Impossible to fetch data from URL: {document_main_url} on page {page} because it does not have a data page'
+        return f'Impossible to fetch data from URL: {document_main_url} on page {page} because it does not have a ' \
+               f'data page'
+
+    @staticmethod
+    def message_session_expired(session_name: str) -> str:
+        return f'Session {session_name}... expired, switched to another session'
 
     @staticmethod
     def message_failed_to_retrieve_last_page() -> str:
@@ -47,6 +76,10 @@ class MessageProvider:
     def message_failed_to_retrieve_url(search_url: str) -> str:
         return f'Failed to retrieve the URL "{search_url}".'
 
+    @staticmethod
+    def message_search_failed(name: str, exception: Exception) -> str:
+        return f'Search "{name}" failed, retrying later - {str(exception)}'
+
     @staticmethod
     def message_unexpected_error_occurred(exception: Exception) -> str:
         return f"An unexpected error occurred - {str(exception)}"
@@ -60,6 +93,19 @@ class MessageProvider:
     def message_eta(documents_left: int) -> str:
         return f'Time left until all data is fetched: ~{time_left_until_all_data_is_fetched(documents_left)}'
 
+    @staticmethod
+    def message_resume_page_moved(saved_page: int, resume_page: int) -> str:
+        return f'The search results moved since the last session, resuming from page {resume_page} ' \
+               f'instead of page {saved_page}'
+
+    @staticmethod
+    def message_next_search_due(name: str, seconds: float) -> str:
+        return f'Next search "{name}" is due in {int(seconds)}s'
+
+    @staticmethod
+    def message_no_searches(filename: str) -> str:
+        return f'No searches defined in {filename}'
+
     @staticmethod
     def construct_message_with_time_stamp(message: str) -> str:
         return f'[{get_current_time()}] - {message}'
@@ -71,9 +117,7 @@ class MessageProvider:
                             output_status: bool,
                             state_status: bool) -> None:
         print(return_default_message_table(text_formatter, entries, last_processed_page, output_status, state_status))
-
-        if state_file_exists():
-            print(return_action_message_table())
+        print(return_action_message_table())
 
 
 def get_user_choice_for_action() -> str:
@@ -81,10 +125,12 @@ def get_user_choice_for_action() -> str:
 
 
 def return_default_message_table(text_formatter: TextFormatter, entries: int, last_processed_page: int,
-                                 output_status: bool, state_status: bool) -> PrettyTable:
+                                 output_status: bool, state_status: bool) -> 'PrettyTable':
     """
         Returns a PrettyTable object with information about data files and their existence.
     """
+    from prettytable import PrettyTable
+
     table = PrettyTable()
 
     table.title = "Welcome to Ted-Europa data scrapper!"
@@ -104,10 +150,12 @@ def return_default_message_table(text_formatter: TextFormatter, entries: int, la
     return table
 
 
-def return_action_message_table() -> PrettyTable:
+def return_action_message_table() -> 'PrettyTable':
     """
-        Returns a PrettyTable object with available actions.
+        Returns a PrettyTable object with available actions. prettytable is only imported when the menu is shown.
     """
+    from prettytable import PrettyTable
+
     table = PrettyTable()
 
     table.title = "Actions (type 1,2..etc):"
@@ -121,4 +169,8 @@ def return_action_message_table() -> PrettyTable:
     table.add_row(['2. Update',
                    'Updates the already existing data with newest if possible\nuntil it meets an already existing '
                    'data in output.json'])
+
+    table.add_row(separator)
+    table.add_row(['3. Listing only',
+                   'Harvests the summary columns of the search results to listing.json\nwithout opening each document'])
     return table
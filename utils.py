@@ -1,11 +1,12 @@
+import functools
 import os
+import re
 import time
 import logging
-import requests
-from dotenv import load_dotenv
-from typing import Set, Optional
+from typing import Set, Optional, TYPE_CHECKING
 
-load_dotenv()
+if TYPE_CHECKING:
+    import requests
 
 
 class TextFormatter:
@@ -78,13 +79,28 @@ class Logger:
         self.logger.warning(message)
 
 
-def create_session() -> requests.Session:
+@functools.lru_cache(maxsize=None)
+def load_dotenv() -> bool:
+    """
+        Load .env into the environment. python-dotenv is imported and the file read the first time the configuration
+        is needed, not when utils is imported.
+    """
+    import dotenv
+
+    return dotenv.load_dotenv()
+
+
+def create_session() -> 'requests.Session':
+    import requests
+
     session = requests.Session()
 
     return session
 
 
 def get_cookies() -> dict:
+    load_dotenv()
+
     cookies = {
         'JSESSIONID': os.getenv('JSESSIONID'),
         'ln_pref': os.getenv('LG_PREF')
@@ -93,13 +109,13 @@ def get_cookies() -> dict:
     return cookies
 
 
-def fetch_response(session: requests.Session,
+def fetch_response(session: 'requests.Session',
                    url: str,
                    cookies: dict,
-                   params: dict = None) -> Optional[requests.Response]:
+                   params: dict = None) -> Optional['requests.Response']:
     response = session.get(url, cookies=cookies, allow_redirects=False, params=params)
 
-    if response.status_code == 200:
+    if response is not None and response.status_code == 200:
         return response
 
     return None
@@ -137,3 +153,16 @@ def update_has_reach_last_scrapped_url(document_main_url: str,
 
 def action_is_update(action: str) -> bool:
     return action == '2'
+
+
+def action_is_listing_only(action: str) -> bool:
+    return action == '3'
+
+
+def notice_number_from_href(href: str) -> Optional[str]:
+    """
+        Extract the notice publication number (e.g. 578920-2023) from a document URL.
+    """
+    match = re.search(r'(\d+-\d{4})', href)
+
+    return match.group(1) if match else None